@@ -0,0 +1,143 @@
+"""
+Load test: QPS and p50/p99 latency vs concurrency for the sync (one thread
+per request), async and async + micro-batched retrieval paths.
+
+Retrieval runs against the real saved index; the LLM is a local fake that
+answers after a fixed delay, so no API calls are made. Retrieval caches are
+disabled so every request searches.
+
+Usage:
+    python benchmarks/bench_concurrency.py --concurrency 1,4,16,64 --requests 400 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from batcher import QueryBatcher
+from embedding import EmbeddingPipeline
+from search import SearchEngine
+from vector_store import VectorStore
+
+
+MODES = ("sync", "async", "batched")
+
+
+class FakeLatencyLLM(FakeListChatModel):
+    """
+    Answers after `latency` seconds, blocking in invoke and awaiting in ainvoke.
+    """
+
+    latency: float = 0.2
+
+    def invoke(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await super().ainvoke(*args, **kwargs)
+
+
+def parse_ints(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def sample_questions(vector_store: VectorStore, count: int, seed: int = 0):
+    """
+    Chunk openings from the index, which retrieve like real questions.
+    """
+    store = vector_store.vector_store
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(store.index.ntotal, min(count, store.index.ntotal), replace=False)
+    return [store.docstore.search(store.index_to_docstore_id[int(row)]).page_content[:200] for row in rows]
+
+
+def run_sync(engine: SearchEngine, questions, concurrency: int):
+    def timed(question):
+        start = time.perf_counter()
+        engine.ask(question)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, questions))
+
+
+async def run_async(engine: SearchEngine, questions, concurrency: int):
+    latencies = []
+    queue = iter(questions)
+
+    async def worker():
+        for question in queue:
+            start = time.perf_counter()
+            await engine.aask(question)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--index-path", default=os.path.join(os.path.dirname(__file__), "..", "faiss_index"))
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM delay in seconds")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    vector_store = VectorStore(
+        embedding_model=EmbeddingPipeline().embedding_model,
+        index_path=args.index_path,
+        storage=os.getenv("RAG_INDEX_STORAGE", "pickle"),
+        query_cache_size=0,
+        result_cache_size=0
+    )
+    vector_store.load_index()
+
+    distinct = sample_questions(vector_store, args.requests)
+    questions = [distinct[i % len(distinct)] for i in range(args.requests)]
+
+    llm = FakeLatencyLLM(responses=["ok"], latency=args.llm_latency)
+    engine = SearchEngine(vector_store, llm=llm)
+
+    print(f"{args.requests} requests, fake LLM latency {args.llm_latency * 1000:.0f} ms\n")
+    print(f"{'mode':<8} {'conc':>5} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>9}")
+
+    for concurrency in parse_ints(args.concurrency):
+        for mode in MODES:
+            # A batcher is bound to one event loop, so each run gets its own
+            engine.batcher = None
+            if mode == "batched":
+                engine.batcher = QueryBatcher(
+                    vector_store, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms
+                )
+
+            start = time.perf_counter()
+            if mode == "sync":
+                latencies = run_sync(engine, questions, concurrency)
+            else:
+                latencies = asyncio.run(run_async(engine, questions, concurrency))
+            elapsed = time.perf_counter() - start
+
+            batch = f"{engine.batcher.stats()['avg_batch_size']:.1f}" if engine.batcher else "-"
+            print(
+                f"{mode:<8} {concurrency:>5} {len(latencies) / elapsed:>8.1f} "
+                f"{np.percentile(latencies, 50) * 1000:>8.1f} {np.percentile(latencies, 99) * 1000:>8.1f} {batch:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Embedding throughput benchmark: chunks/sec vs batch size and thread count.
+
+Usage:
+    python benchmarks/bench_embedding.py --batch-sizes 32,128,512 --threads 1,2,4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from data_loader import DataLoader
+from embedding import EmbeddingEngine, set_torch_threads
+
+
+def parse_ints(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def load_texts(data_dir: str, limit: int):
+    """
+    Uses real chunks from the data directory, repeated up to `limit`.
+    """
+    texts = [doc.page_content for doc in DataLoader(data_dir).load_and_split_documents()]
+    if not texts:
+        raise SystemExit(f"No documents found in {data_dir}")
+
+    while len(texts) < limit:
+        texts.extend(texts[:limit - len(texts)])
+    return texts[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(__file__), "..", "data"))
+    parser.add_argument("--num-chunks", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=parse_ints, default=[32, 64, 128, 256, 512])
+    parser.add_argument("--threads", type=parse_ints, default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--normalize", action="store_true")
+    args = parser.parse_args()
+
+    texts = load_texts(args.data_dir, args.num_chunks)
+    engine = EmbeddingEngine(normalize=args.normalize)
+
+    # Warm-up so model initialisation is not counted
+    engine.encode(texts[:32])
+
+    print(f"{len(texts)} chunks, model={engine.model_name}, normalize={args.normalize}")
+    print(f"{'threads':>8} {'batch':>6} {'seconds':>9} {'chunks/sec':>11}")
+
+    for threads in sorted(set(args.threads)):
+        set_torch_threads(threads)
+        for batch_size in args.batch_sizes:
+            engine.batch_size = batch_size
+
+            start = time.perf_counter()
+            vectors = engine.encode(texts)
+            elapsed = time.perf_counter() - start
+
+            assert vectors.dtype == "float32" and vectors.flags["C_CONTIGUOUS"]
+            print(f"{threads:>8} {batch_size:>6} {elapsed:>9.2f} {len(texts) / elapsed:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
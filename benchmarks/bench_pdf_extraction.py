@@ -0,0 +1,87 @@
+"""
+PDF extraction benchmark: pages/sec of LangChain's PyMuPDFLoader against the
+native block extractor, cold (extracting) and warm (served from the page
+cache), plus how much text each keeps.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py --data-dir data --repeat 3
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from langchain_community.document_loaders import PyMuPDFLoader
+
+from data_loader import DataLoader
+
+
+def timed(fn, repeat: int):
+    """
+    Best-of-`repeat` wall time of fn(), and its last result.
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction.")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant (best is reported)")
+    args = parser.parse_args()
+
+    pdfs = sorted(Path(args.data_dir).glob("*.pdf"))
+    if not pdfs:
+        raise SystemExit(f"No PDFs in {args.data_dir}")
+
+    cache_dir = tempfile.mkdtemp(prefix="page_cache_")
+    try:
+        def langchain():
+            return [doc for pdf in pdfs for doc in PyMuPDFLoader(str(pdf)).load()]
+
+        def native_cold():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            loader = DataLoader(args.data_dir, page_cache_dir=cache_dir)
+            return [doc for pdf in pdfs for doc in loader._load_native_pdf(pdf, None)]
+
+        def native_warm():
+            # A fresh loader, as after a restart; the cache is already filled
+            loader = DataLoader(args.data_dir, page_cache_dir=cache_dir)
+            return [doc for pdf in pdfs for doc in loader._load_native_pdf(pdf, None)]
+
+        baseline_seconds, baseline_docs = timed(langchain, args.repeat)
+        pages = len(baseline_docs)
+        baseline_chars = sum(len(doc.page_content) for doc in baseline_docs)
+
+        print(f"{len(pdfs)} PDFs, {pages} pages\n")
+        print(f"{'extractor':<16} {'seconds':>8} {'pages/s':>9} {'speedup':>8} {'pages kept':>11} {'chars kept':>11}")
+
+        for name, fn in (("langchain", langchain), ("native (cold)", native_cold), ("native (warm)", native_warm)):
+            # The cold runs leave the cache filled for the warm ones
+            if name == "langchain":
+                seconds, docs = baseline_seconds, baseline_docs
+            else:
+                seconds, docs = timed(fn, args.repeat)
+
+            chars = sum(len(doc.page_content) for doc in docs)
+            print(
+                f"{name:<16} {seconds:>8.3f} {pages / seconds:>9.1f} {baseline_seconds / seconds:>7.1f}x "
+                f"{len(docs):>11} {chars / max(baseline_chars, 1):>10.1%}"
+            )
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("\nNative skips empty/image-only pages and repeated headers/footers, so it keeps fewer pages and chars.")
+
+
+if __name__ == "__main__":
+    main()
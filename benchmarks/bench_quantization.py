@@ -0,0 +1,113 @@
+"""
+Quantized storage benchmark: memory, latency and recall@k of the float16,
+int8 and binary flat indexes against the float32 flat index, with and
+without exact rescoring from the memory-mapped float32 vectors.
+
+Every variant is built the way the app builds it (file by file through
+sync_index, with repeated embeddings served from the embedding cache), then
+loaded back the way it is served (vectors.npy memory-mapped).
+
+Usage:
+    python benchmarks/bench_quantization.py --k 10 --rescore 4,8
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np
+from dotenv import load_dotenv
+
+import index_versions
+from data_loader import DataLoader
+from embedding import EmbeddingPipeline
+from index_factory import QUANTIZED_TYPES, index_memory_bytes
+from index_tool import load_queries, recall_at_k
+from vector_store import FULL_VECTORS_FILE, VectorStore
+
+
+def search_all(vector_store: VectorStore, queries: np.ndarray, k: int):
+    """
+    Runs queries one at a time through the store's search path (including
+    rescoring), returning row ids and latencies.
+    """
+    store, full_vectors = vector_store._snapshot()
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids[i] = vector_store._index_search(store, full_vectors, query.reshape(1, -1), k)
+        latencies[i] = time.perf_counter() - start
+
+    return ids, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized vector storage.")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--out-dir", default="faiss_index_quantized")
+    parser.add_argument("--types", default=",".join(QUANTIZED_TYPES))
+    parser.add_argument("--queries", help="JSONL file with a 'question' field per line")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", default="4,8", help="Comma-separated rescore factors to try")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    loader = DataLoader(args.data_dir)
+    documents = loader.load_and_split_documents()
+    embedder = EmbeddingPipeline()
+
+    queries = np.asarray(
+        embedder.embedding_model.embed_documents(load_queries(args.queries, documents, args.num_queries)),
+        dtype=np.float32
+    )
+    k = min(args.k, len(documents))
+    factors = [int(f) for f in args.rescore.split(",") if f]
+
+    truth = None
+    print(
+        f"\n{'type':<10} {'rescore':>7} {'index MB':>9} {'vectors MB':>11} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {f'recall@{k}':>10}"
+    )
+
+    for index_type in ["flat"] + [t for t in args.types.split(",") if t and t != "flat"]:
+        index_path = os.path.join(args.out_dir, index_type)
+        shutil.rmtree(index_path, ignore_errors=True)
+        builder = VectorStore(embedding_model=embedder.embedding_model, index_path=index_path, index_type=index_type)
+        builder.sync_index(loader)
+
+        vectors_file = os.path.join(index_versions.resolve(index_path), FULL_VECTORS_FILE)
+        vectors_mb = os.path.getsize(vectors_file) / 1e6 if os.path.exists(vectors_file) else 0.0
+
+        for factor in [0] + (factors if index_type != "flat" else []):
+            vector_store = VectorStore(
+                embedding_model=embedder.embedding_model, index_path=index_path, rescore=factor
+            )
+            vector_store.load_index()
+
+            ids, latencies = search_all(vector_store, queries, k)
+            if truth is None:
+                truth = ids
+
+            print(
+                f"{index_type:<10} {factor or '-':>7} "
+                f"{index_memory_bytes(vector_store.vector_store.index) / 1e6:>9.2f} "
+                f"{vectors_mb if factor else 0.0:>11.2f} "
+                f"{np.percentile(latencies, 50) * 1000:>8.3f} {np.percentile(latencies, 99) * 1000:>8.3f} "
+                f"{recall_at_k(ids, truth):>10.3f}"
+            )
+
+    print(
+        "\nindex MB is resident per process; the vectors file is memory-mapped and only "
+        "the rescored candidates' pages are read."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Retrieval benchmark: latency and hit quality of dense vs hybrid (dense + BM25)
+retrieval on a labelled query set.
+
+Each line of the query file is a JSON object with a "question" and at least
+one label: "pages" (page numbers that answer it) and/or "contains" (a string
+that an answering chunk contains, e.g. an assessment code).
+
+Usage:
+    python benchmarks/bench_retrieval.py --queries queries.jsonl --k 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding import EmbeddingPipeline
+from search import RETRIEVAL_MODES
+from vector_store import VectorStore
+
+
+def load_labelled_queries(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+
+    unlabelled = [q["question"] for q in queries if not (q.get("pages") or q.get("contains"))]
+    if unlabelled:
+        raise SystemExit(f"{len(unlabelled)} queries have no 'pages' or 'contains' label")
+    return queries
+
+
+def is_relevant(doc, query: dict) -> bool:
+    if doc.metadata.get("page") in query.get("pages", []):
+        return True
+    needle = query.get("contains")
+    return bool(needle) and needle.lower() in doc.page_content.lower()
+
+
+def run(vector_store: VectorStore, mode: str, queries, k: int, fetch_k: int):
+    """
+    Returns hit@k, MRR@k and per-query latencies for one retrieval mode.
+    """
+    hits, reciprocal_ranks, latencies = 0, 0.0, []
+
+    for query in queries:
+        # Bypass the result cache so every query is actually searched
+        vector_store.result_cache.clear()
+
+        start = time.perf_counter()
+        if mode == "hybrid":
+            documents = vector_store.hybrid_search(query["question"], k=k, fetch_k=fetch_k)
+        else:
+            documents = vector_store.similarity_search(query["question"], k=k)
+        latencies.append(time.perf_counter() - start)
+
+        rank = next((i for i, doc in enumerate(documents, start=1) if is_relevant(doc, query)), None)
+        if rank is not None:
+            hits += 1
+            reciprocal_ranks += 1.0 / rank
+
+    return hits / len(queries), reciprocal_ranks / len(queries), np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", required=True, help="Labelled JSONL query file")
+    parser.add_argument("--index-path", default=os.path.join(os.path.dirname(__file__), "..", "faiss_index"))
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    queries = load_labelled_queries(args.queries)
+
+    vector_store = VectorStore(
+        embedding_model=EmbeddingPipeline().embedding_model,
+        index_path=args.index_path,
+        storage=os.getenv("RAG_INDEX_STORAGE", "pickle"),
+        lexical=True
+    )
+    vector_store.load_index()
+
+    # Warm the query-embedding cache so both modes are timed on retrieval only
+    for query in queries:
+        vector_store.embed_query(query["question"])
+
+    print(f"{len(queries)} queries, {vector_store.vector_store.index.ntotal} chunks, k={args.k}\n")
+    print(f"{'mode':<8} {f'hit@{args.k}':>7} {f'MRR@{args.k}':>7} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for mode in RETRIEVAL_MODES:
+        hit_rate, mrr, latencies = run(vector_store, mode, queries, args.k, args.fetch_k)
+        print(
+            f"{mode:<8} {hit_rate:>7.3f} {mrr:>7.3f} "
+            f"{np.percentile(latencies, 50) * 1000:>8.3f} {np.percentile(latencies, 99) * 1000:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
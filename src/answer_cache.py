@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def chunk_key(doc: Document) -> str:
+    """
+    Stable identity of a retrieved chunk: its content-hashed chunk_id, or
+    a hash of its text for indexes built before chunk IDs existed.
+    """
+    chunk_id = doc.metadata.get("chunk_id")
+    if chunk_id:
+        return chunk_id
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Caches LLM answers by (question embedding, retrieved chunk set).
+
+    A new question reuses a cached answer when its embedding is within
+    `threshold` cosine similarity of a cached question AND it retrieved
+    exactly the same chunks, so the LLM would see the same context.
+    Entries are evicted least-recently-used and persisted to `path`.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.95, max_entries: int = 1000):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries: List[dict] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._clock = 0
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _embeddings(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.stack([entry["embedding"] for entry in self._entries])
+        return self._matrix
+
+    def lookup(self, embedding, chunk_ids: Iterable[str]) -> Optional[str]:
+        """
+        Returns the cached answer for a near-duplicate question that
+        retrieved the same chunks, or None.
+        """
+        query = self._normalize(embedding)
+        chunk_set = frozenset(chunk_ids)
+
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            scores = self._embeddings() @ query
+            near_duplicate = False
+
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+
+                near_duplicate = True
+                entry = self._entries[i]
+                if entry["chunks"] == chunk_set:
+                    self._clock += 1
+                    entry["last_used"] = self._clock
+                    self.hits += 1
+                    return entry["answer"]
+
+            self.misses += 1
+            if near_duplicate:
+                self.near_misses += 1
+            return None
+
+    def add(self, question: str, embedding, chunk_ids: Iterable[str], answer: str, persist: bool = True):
+        """
+        Stores an answer, evicting the least recently used entry when full.
+        Pass persist=False to defer the save when adding many answers.
+        """
+        with self._lock:
+            self._clock += 1
+            self._entries.append({
+                "question": question,
+                "embedding": self._normalize(embedding),
+                "chunks": frozenset(chunk_ids),
+                "answer": answer,
+                "last_used": self._clock,
+            })
+
+            while len(self._entries) > self.max_entries:
+                oldest = min(range(len(self._entries)), key=lambda i: self._entries[i]["last_used"])
+                del self._entries[oldest]
+                self.evictions += 1
+
+            self._matrix = None
+
+        if persist and self.path:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = []
+            self._matrix = None
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self._entries = [
+            {
+                "question": entry["question"],
+                "embedding": np.asarray(entry["embedding"], dtype=np.float32),
+                "chunks": frozenset(entry["chunks"]),
+                "answer": entry["answer"],
+                "last_used": entry["last_used"],
+            }
+            for entry in data.get("entries", [])
+        ]
+        self._clock = max((entry["last_used"] for entry in self._entries), default=0)
+        self._matrix = None
+
+    def save(self):
+        """
+        Atomically persists the cache so answers survive restarts.
+        """
+        with self._lock:
+            data = {
+                "threshold": self.threshold,
+                "entries": [
+                    {
+                        "question": entry["question"],
+                        "embedding": entry["embedding"].tolist(),
+                        "chunks": sorted(entry["chunks"]),
+                        "answer": entry["answer"],
+                        "last_used": entry["last_used"],
+                    }
+                    for entry in self._entries
+                ],
+            }
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "near_misses": self.near_misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
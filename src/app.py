@@ -1,42 +1,38 @@
-import os
+from time import perf_counter
+
+_IMPORT_START = perf_counter()
+
 from dotenv import load_dotenv
 
-from data_loader import DataLoader
-from embedding import EmbeddingPipeline
-from vector_store import VectorStore
-from search import SearchEngine
+from pipeline import build_pipeline
+from timing import StartupTimer
+
+_IMPORT_SECONDS = perf_counter() - _IMPORT_START
 
 
 def main():
+    timer = StartupTimer()
+    timer.record("imports", _IMPORT_SECONDS)
+
     # Load environment variables
     load_dotenv()
 
-    # 1. Load & chunk documents
-    loader = DataLoader("data")
-    documents = loader.load_and_split_documents()
-
-    # 2. Initialize embedding pipeline
-    embedder = EmbeddingPipeline()
+    # Load the embedding model and the persisted FAISS index; documents are
+    # only parsed when the index is missing or a refresh is requested
+    pipeline = build_pipeline("data", "faiss_index", timer=timer)
+    search_engine, stats = pipeline.search_engine, pipeline.stats
 
-    # 3. Initialize vector store
-    vector_store = VectorStore(
-        embedding_model=embedder.embedding_model,
-        index_path="faiss_index"
-    )
-
-    # 4. Build or load FAISS index
-    if os.path.exists("faiss_index"):
-        print("Loading existing FAISS index...")
-        vector_store.load_index()
+    if stats is None:
+        print("Loaded existing FAISS index.")
     else:
-        print("Building FAISS index...")
-        vector_store.build_index(documents)
-        vector_store.save_index()
-
-    # 5. Initialize search engine (RAG)
-    search_engine = SearchEngine(vector_store)
-
-    # 6. Ask questions in a loop
+        print(
+            f"{stats['files_modified']} file(s) ingested, {stats['files_removed']} removed "
+            f"({stats['chunks_added']} chunks added, {stats['chunks_deleted']} deleted)"
+        )
+        for error in pipeline.loader.errors:
+            print(f"  ⚠️ Failed to ingest {error.source}: {error.error}")
+
+    # Ask questions in a loop
     print("\nRAG system ready. Ask questions (type 'exit' to quit).\n")
 
     while True:
@@ -45,11 +41,23 @@ def main():
         if question.lower() in ["exit", "quit"]:
             break
 
-        answer = search_engine.ask(question)
+        first_query = not timer.has("first query")
+        metrics = {}
+
         print("\nAnswer:")
-        print(answer)
+        for token in search_engine.ask_stream(question, metrics=metrics):
+            print(token, end="", flush=True)
+        print()
+        print(
+            f"[first token {metrics['time_to_first_token']:.2f}s, total {metrics['total']:.2f}s"
+            f"{', cached' if metrics['cached'] else ''}]"
+        )
         print("-" * 60)
 
+        if first_query:
+            timer.record("first query", metrics["total"])
+            print(timer.report())
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,87 @@
+"""
+Offline bulk question answering: reads questions from JSONL and streams
+answers to JSONL as they complete.
+
+Each input line is {"question": ...} with an optional "id"; each output
+line repeats both and adds "answer" (or "error" if every retry failed).
+
+Usage (from the project root):
+    python src/batch_app.py questions.jsonl -o answers.jsonl --concurrency 8
+"""
+import argparse
+import json
+import sys
+
+from dotenv import load_dotenv
+
+from pipeline import build_pipeline
+from search import RETRIEVAL_MODES
+
+
+def read_questions(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                record = json.loads(line)
+                record.setdefault("id", line_number)
+                yield record
+
+
+def chunked(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer questions from a JSONL file in bulk.")
+    parser.add_argument("input", help="JSONL file with a 'question' field per line")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--mode", choices=RETRIEVAL_MODES)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent LLM calls")
+    parser.add_argument("--retries", type=int, default=3, help="Attempts per LLM call")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Questions retrieved per batch")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    search_engine = build_pipeline("data", "faiss_index", retrieval_mode=args.mode).search_engine
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    answered = failed = 0
+
+    try:
+        for records in chunked(read_questions(args.input), args.chunk_size):
+            results = search_engine.iter_answers(
+                [record["question"] for record in records],
+                k=args.k,
+                max_concurrency=args.concurrency,
+                max_retries=args.retries
+            )
+
+            for i, answer in results:
+                record = {"id": records[i]["id"], "question": records[i]["question"]}
+                if isinstance(answer, Exception):
+                    record["error"] = str(answer)
+                    failed += 1
+                else:
+                    record["answer"] = answer
+                    answered += 1
+
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{answered} answered, {failed} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import List, Optional, Set
+
+from langchain_core.documents import Document
+
+
+class QueryBatcher:
+    """
+    Async micro-batcher for retrieval.
+
+    Queries that arrive within `max_wait_ms` of each other (or until
+    `max_batch_size` are waiting) are embedded and searched together with
+    one `VectorStore.similarity_search_batch` call, run in an executor so
+    the event loop is never blocked. Bound to the event loop that first
+    uses it.
+    """
+
+    def __init__(self, vector_store, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 executor: Optional[Executor] = None):
+        self.vector_store = vector_store
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor
+
+        self.batches = 0
+        self.queries = 0
+
+        self._pending: List[tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def search(self, query: str, k: int = 3) -> List[Document]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, k, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference so the task is not garbage collected mid-run
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]):
+        queries = [query for query, _, _ in batch]
+        k = max(k for _, k, _ in batch)
+
+        self.batches += 1
+        self.queries += len(batch)
+
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.vector_store.similarity_search_batch, queries, k
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, query_k, future), documents in zip(batch, results):
+            if not future.done():
+                future.set_result(documents[:query_k])
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+        }
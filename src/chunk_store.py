@@ -0,0 +1,258 @@
+import json
+import mmap
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+
+class RowIdMap(Mapping):
+    """
+    Lazy stand-in for FAISS' `index_to_docstore_id` dict: maps a vector's
+    row number to its chunk ID by reading the chunk store on demand.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, row: int) -> str:
+        if not 0 <= row < len(self.store):
+            raise KeyError(row)
+        return self.store.id_at(row)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __iter__(self):
+        return iter(range(len(self.store)))
+
+
+class MmapChunkStore(Docstore):
+    """
+    Read-only, memory-mapped chunk store (a drop-in FAISS docstore).
+
+    Chunks are stored in vector-row order as JSON records in `chunks.bin`,
+    addressed by an int64 offsets array; chunk IDs are kept both in row
+    order and sorted for binary-search lookup. Nothing is deserialized up
+    front, and worker processes share the pages through the OS cache.
+    """
+
+    DATA = "chunks.bin"
+    OFFSETS = "chunks.offsets.npy"
+    IDS = "chunks.ids.npy"
+    SORTED_IDS = "chunks.sorted_ids.npy"
+    SORTED_ROWS = "chunks.sorted_rows.npy"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+        self._offsets = np.load(os.path.join(directory, self.OFFSETS), mmap_mode="r")
+        self._ids = np.load(os.path.join(directory, self.IDS), mmap_mode="r")
+        self._sorted_ids = np.load(os.path.join(directory, self.SORTED_IDS), mmap_mode="r")
+        self._sorted_rows = np.load(os.path.join(directory, self.SORTED_ROWS), mmap_mode="r")
+
+        self._file = open(os.path.join(directory, self.DATA), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, cls.OFFSETS))
+
+    @classmethod
+    def write(cls, directory: str, rows: Iterable[Tuple[str, Document]]):
+        """
+        Writes (chunk_id, document) pairs in vector-row order. Files are
+        written to temporaries and renamed, so processes that still map the
+        previous version keep reading it safely.
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        ids = []
+        offsets = [0]
+        data_path = os.path.join(directory, cls.DATA)
+
+        with open(f"{data_path}.tmp", "wb") as f:
+            for chunk_id, doc in rows:
+                record = json.dumps(
+                    {"text": doc.page_content, "metadata": doc.metadata},
+                    ensure_ascii=False,
+                    default=str
+                ).encode("utf-8")
+                f.write(record)
+                offsets.append(offsets[-1] + len(record))
+                ids.append(chunk_id.encode("utf-8"))
+
+        id_array = np.array(ids, dtype=f"S{max((len(i) for i in ids), default=1)}")
+        order = np.argsort(id_array, kind="stable")
+
+        arrays = {
+            cls.OFFSETS: np.array(offsets, dtype=np.int64),
+            cls.IDS: id_array,
+            cls.SORTED_IDS: id_array[order],
+            cls.SORTED_ROWS: order.astype(np.int64),
+        }
+        for name, array in arrays.items():
+            path = os.path.join(directory, name)
+            with open(f"{path}.tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(f"{path}.tmp", path)
+
+        os.replace(f"{data_path}.tmp", data_path)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def id_at(self, row: int) -> str:
+        return self._ids[row].decode("utf-8")
+
+    def ids_at(self, rows) -> List[str]:
+        return [chunk_id.decode("utf-8") for chunk_id in self._ids[np.asarray(rows, dtype=np.int64)]]
+
+    def row_of(self, chunk_id: str) -> Optional[int]:
+        key = chunk_id.encode("utf-8")
+        position = int(np.searchsorted(self._sorted_ids, key))
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == key:
+            return int(self._sorted_rows[position])
+        return None
+
+    def document_at(self, row: int) -> Document:
+        record = json.loads(self._data[self._offsets[row]:self._offsets[row + 1]])
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def documents_at(self, rows: List[int]) -> List[Document]:
+        return [self.document_at(row) for row in rows]
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self.row_of(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self.document_at(row)
+
+    def iter_documents(self) -> Iterator[Tuple[str, Document]]:
+        for row in range(len(self)):
+            yield self.id_at(row), self.document_at(row)
+
+
+class SQLiteChunkStore(Docstore):
+    """
+    Read-only SQLite chunk store (a drop-in FAISS docstore).
+
+    One row per vector, keyed by vector row number with a unique index on
+    the chunk ID. Chunk text and metadata are only fetched for the top-k
+    hits, so resident memory does not grow with the corpus text, and no
+    pickle is involved in loading.
+    """
+
+    FILENAME = "chunks.sqlite"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        path = os.path.join(directory, self.FILENAME)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False
+        )
+        self._length = self._connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, cls.FILENAME))
+
+    @classmethod
+    def write(cls, directory: str, rows: Iterable[Tuple[str, Document]], batch_size: int = 1000):
+        """
+        Writes (chunk_id, document) pairs in vector-row order to a new
+        database, then renames it over the previous one.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, cls.FILENAME)
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        connection = sqlite3.connect(tmp_path)
+        try:
+            connection.execute(
+                "CREATE TABLE chunks ("
+                "position INTEGER PRIMARY KEY, id TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+
+            batch = []
+            for row, (chunk_id, doc) in enumerate(rows):
+                batch.append((row, chunk_id, doc.page_content, json.dumps(doc.metadata, default=str)))
+                if len(batch) >= batch_size:
+                    connection.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", batch)
+                    batch = []
+            if batch:
+                connection.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", batch)
+
+            connection.execute("CREATE UNIQUE INDEX chunks_id ON chunks (id)")
+            connection.commit()
+        finally:
+            connection.close()
+
+        os.replace(tmp_path, path)
+
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def id_at(self, row: int) -> str:
+        return self._query("SELECT id FROM chunks WHERE position = ?", (row,))[0][0]
+
+    def ids_at(self, rows) -> List[str]:
+        """
+        Chunk IDs of many rows in one query, preserving the requested order.
+        The rows are passed as one JSON array, so a filter that selects a
+        large part of the corpus is not limited by SQLite's bound-parameter cap.
+        """
+        rows = [int(row) for row in rows]
+        fetched = dict(self._query(
+            "SELECT position, id FROM chunks WHERE position IN (SELECT value FROM json_each(?))",
+            (json.dumps(rows),)
+        ))
+        return [fetched[row] for row in rows]
+
+    def row_of(self, chunk_id: str) -> Optional[int]:
+        rows = self._query("SELECT position FROM chunks WHERE id = ?", (chunk_id,))
+        return rows[0][0] if rows else None
+
+    def document_at(self, row: int) -> Document:
+        return self.documents_at([row])[0]
+
+    def documents_at(self, rows: List[int]) -> List[Document]:
+        """
+        Fetches several rows in one query, preserving the requested order.
+        """
+        placeholders = ",".join("?" * len(rows))
+        fetched = {
+            row: Document(page_content=text, metadata=json.loads(metadata))
+            for row, text, metadata in self._query(
+                f"SELECT position, text, metadata FROM chunks WHERE position IN ({placeholders})", tuple(rows)
+            )
+        }
+        return [fetched[row] for row in rows]
+
+    def search(self, search: str) -> Union[str, Document]:
+        rows = self._query("SELECT text, metadata FROM chunks WHERE id = ?", (search,))
+        if not rows:
+            return f"ID {search} not found."
+        text, metadata = rows[0]
+        return Document(page_content=text, metadata=json.loads(metadata))
+
+    def iter_documents(self) -> Iterator[Tuple[str, Document]]:
+        for chunk_id, text, metadata in self._query("SELECT id, text, metadata FROM chunks ORDER BY position"):
+            yield chunk_id, Document(page_content=text, metadata=json.loads(metadata))
+
+
+CHUNK_STORES = {"mmap": MmapChunkStore, "sqlite": SQLiteChunkStore}
@@ -0,0 +1,255 @@
+import os
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from embedding import MODEL_MAX_TOKENS, MODEL_NAME
+
+
+# "tokens" sizes chunks with the embedding model's tokenizer, "chars" by length
+CHUNK_UNITS = ("tokens", "chars")
+# "sentence" packs whole sentences and paragraphs, "heading" additionally
+# starts a new chunk at every heading line, "recursive" is LangChain's
+# RecursiveCharacterTextSplitter
+CHUNK_BOUNDARIES = ("sentence", "heading", "recursive")
+
+# Sentence ends (optionally followed by closing quotes/brackets) and blank lines
+SENTENCE_BREAK = re.compile(r"[.!?]+[\"')\]]*\s+|\n\s*\n")
+# Markdown headings, numbered section titles ("2.1 Results") and ALL-CAPS lines
+HEADING_LINE = re.compile(
+    r"^[ \t]*(?:#{1,6}[ \t]+\S[^\n]*|\d+(?:\.\d+)*\.?[ \t]+[A-Z][^\n]{0,80}|[A-Z][A-Z0-9 \t\-:,&/]{3,80})[ \t]*$",
+    re.MULTILINE
+)
+
+
+class ChunkingConfig(NamedTuple):
+    unit: str = "tokens"
+    chunk_size: int = 240
+    chunk_overlap: int = 40
+    boundaries: str = "sentence"
+    tokenizer: str = MODEL_NAME
+
+
+# The splitter used before token-aware chunking
+LEGACY_CHUNKING = ChunkingConfig(unit="chars", chunk_size=1000, chunk_overlap=200, boundaries="recursive")
+
+
+def chunking_from_env() -> ChunkingConfig:
+    """
+    Builds the chunking config from RAG_CHUNK_UNIT, RAG_CHUNK_SIZE,
+    RAG_CHUNK_OVERLAP and RAG_CHUNK_BOUNDARIES (unset ones keep the
+    defaults).
+    """
+    default = ChunkingConfig()
+    return ChunkingConfig(
+        unit=os.getenv("RAG_CHUNK_UNIT") or default.unit,
+        chunk_size=int(os.getenv("RAG_CHUNK_SIZE") or default.chunk_size),
+        chunk_overlap=int(os.getenv("RAG_CHUNK_OVERLAP") or default.chunk_overlap),
+        boundaries=os.getenv("RAG_CHUNK_BOUNDARIES") or default.boundaries,
+    )
+
+
+@lru_cache(maxsize=None)
+def _load_tokenizer(name: str):
+    # Fast (Rust) tokenizers batch-encode in parallel and return offsets
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(name, use_fast=True)
+
+
+def _segments(text: str, headings: bool) -> Tuple[List[Tuple[int, int]], List[bool]]:
+    """
+    Splits text into sentence/paragraph spans (start, end) with surrounding
+    whitespace trimmed, and flags the spans that start a heading section.
+    """
+    breaks = {m.end() for m in SENTENCE_BREAK.finditer(text)}
+    heading_starts = set()
+    if headings:
+        for m in HEADING_LINE.finditer(text):
+            heading_starts.add(m.start())
+            breaks.update((m.start(), m.end()))
+
+    spans, starts_section = [], []
+    previous = 0
+    for position in sorted(breaks) + [len(text)]:
+        if position <= previous:
+            continue
+        segment = text[previous:position]
+        stripped = segment.strip()
+        if stripped:
+            start = previous + segment.index(stripped[0])
+            spans.append((start, start + len(stripped)))
+            starts_section.append(previous in heading_starts)
+        previous = position
+
+    return spans, starts_section
+
+
+def _pack(lengths: np.ndarray, section_starts: np.ndarray, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Greedily packs consecutive segments into [first, last) runs of at most
+    `size` units, carrying up to `overlap` units of trailing segments into
+    the next run. Runs never cross a section start.
+    """
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    # First section start strictly after each segment
+    next_section = np.full(len(lengths) + 1, len(lengths))
+    for i in np.flatnonzero(section_starts)[::-1]:
+        next_section[:i] = i
+
+    runs = []
+    first = 0
+    while first < len(lengths):
+        last = int(np.searchsorted(bounds, bounds[first] + size, side="right")) - 1
+        last = max(first + 1, min(last, int(next_section[first])))
+        runs.append((first, last))
+        if last >= len(lengths):
+            break
+
+        if section_starts[last]:
+            first = last
+        else:
+            # Longest run of trailing segments that fits in the overlap and
+            # still leaves room for the next segment
+            carried = int(np.searchsorted(
+                bounds, max(bounds[last] - overlap, bounds[last + 1] - size), side="left"
+            ))
+            first = min(max(carried, first + 1), last)
+
+    return runs
+
+
+class Chunker:
+    """
+    Splits documents into chunks sized in embedding-model tokens (or
+    characters), cutting at sentence, paragraph and optionally heading
+    boundaries so no chunk is silently truncated by the encoder.
+
+    All segments of a `split_documents` call are tokenized in one batch.
+    Drop-in for a LangChain text splitter: chunks keep their document's
+    metadata plus `start_index`.
+    """
+
+    def __init__(self, config: ChunkingConfig = ChunkingConfig(), tokenizer=None):
+        if config.unit not in CHUNK_UNITS:
+            raise ValueError(f"Unknown chunk unit '{config.unit}'. Choose from {', '.join(CHUNK_UNITS)}.")
+        if config.boundaries not in CHUNK_BOUNDARIES:
+            raise ValueError(
+                f"Unknown chunk boundaries '{config.boundaries}'. Choose from {', '.join(CHUNK_BOUNDARIES)}."
+            )
+        if not 0 <= config.chunk_overlap < config.chunk_size:
+            raise ValueError("chunk_overlap must be at least 0 and smaller than chunk_size")
+        # [CLS] and [SEP] count against the encoder's limit too
+        if config.unit == "tokens" and config.tokenizer == MODEL_NAME and config.chunk_size > MODEL_MAX_TOKENS - 2:
+            raise ValueError(
+                f"chunk_size {config.chunk_size} exceeds the {MODEL_MAX_TOKENS - 2} tokens {MODEL_NAME} "
+                "embeds; longer chunks would be truncated"
+            )
+
+        self.config = config
+        # Unless injected, the tokenizer is loaded lazily once per process, so
+        # the chunker pickles cheaply into ingestion workers
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        return self._tokenizer if self._tokenizer is not None else _load_tokenizer(self.config.tokenizer)
+
+    def _splitter(self) -> RecursiveCharacterTextSplitter:
+        if self.config.unit == "tokens":
+            return RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+                self.tokenizer,
+                chunk_size=self.config.chunk_size,
+                chunk_overlap=self.config.chunk_overlap,
+                add_start_index=True
+            )
+        return RecursiveCharacterTextSplitter(
+            chunk_size=self.config.chunk_size,
+            chunk_overlap=self.config.chunk_overlap,
+            # Lets the context builder put chunks back in reading order
+            add_start_index=True
+        )
+
+    def _measure(self, texts: List[str]) -> Tuple[np.ndarray, List[List[int]]]:
+        """
+        Length of each text in chunk units, and the offsets at which an
+        over-long text may be cut into pieces of at most chunk_size units.
+        """
+        size = self.config.chunk_size
+
+        if self.config.unit == "chars":
+            lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+            cuts = [list(range(size, len(text), size)) for text in texts]
+            return lengths, cuts
+
+        if not texts:
+            return np.zeros(0, dtype=np.int64), []
+
+        encoded = self.tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoded["offset_mapping"]
+        lengths = np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64, count=len(texts))
+        cuts = [
+            [token_offsets[i][0] for i in range(size, len(token_offsets), size)] if length > size else []
+            for token_offsets, length in zip(offsets, lengths)
+        ]
+        return lengths, cuts
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        if self.config.boundaries == "recursive":
+            return self._splitter().split_documents(documents)
+
+        headings = self.config.boundaries == "heading"
+        per_document = [_segments(doc.page_content, headings) for doc in documents]
+
+        texts = [
+            doc.page_content[start:end]
+            for doc, (spans, _) in zip(documents, per_document)
+            for start, end in spans
+        ]
+        lengths, cuts = self._measure(texts)
+
+        chunks = []
+        position = 0
+        for doc, (spans, starts_section) in zip(documents, per_document):
+            n = len(spans)
+            doc_lengths = lengths[position:position + n]
+            doc_cuts = cuts[position:position + n]
+            position += n
+
+            # Segments longer than a chunk are cut into chunk-sized pieces
+            pieces, piece_lengths, piece_starts = [], [], []
+            for (start, end), length, cut, section in zip(spans, doc_lengths, doc_cuts, starts_section):
+                edges = [start] + [start + offset for offset in cut] + [end]
+                for i in range(len(edges) - 1):
+                    pieces.append((edges[i], edges[i + 1]))
+                    piece_starts.append(section and i == 0)
+                piece_lengths.extend(
+                    [self.config.chunk_size] * len(cut) + [int(length) - self.config.chunk_size * len(cut)]
+                )
+
+            piece_lengths = np.asarray(piece_lengths, dtype=np.int64)
+            if self.config.unit == "chars" and pieces:
+                # The whitespace between segments counts towards a chunk's length
+                edges = np.asarray(pieces, dtype=np.int64)
+                piece_lengths = edges[:, 1] - np.concatenate((edges[:1, 0], edges[:-1, 1]))
+
+            runs = _pack(
+                piece_lengths,
+                np.asarray(piece_starts, dtype=bool),
+                self.config.chunk_size,
+                self.config.chunk_overlap
+            )
+            for first, last in runs:
+                start, end = pieces[first][0], pieces[last - 1][1]
+                content = doc.page_content[start:end]
+                chunks.append(Document(
+                    page_content=content.strip(),
+                    # Lets the context builder put chunks back in reading order
+                    metadata={**doc.metadata, "start_index": start + len(content) - len(content.lstrip())}
+                ))
+
+        return chunks
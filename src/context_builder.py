@@ -0,0 +1,122 @@
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+# Matches the tokenizer of the GPT-4 family deployments
+DEFAULT_ENCODING = "cl100k_base"
+
+
+def _load_tokenizer(encoding_name: str):
+    try:
+        import tiktoken
+    except ImportError as e:
+        raise ImportError(
+            "Could not import tiktoken, which is needed to count context tokens. "
+            "Please install it with `pip install tiktoken`."
+        ) from e
+    return tiktoken.get_encoding(encoding_name)
+
+
+def overlap_length(left: str, right: str, max_overlap: int) -> int:
+    """
+    Length of the longest suffix of `left` that is also a prefix of `right`.
+    """
+    for length in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into a prompt context of at most `max_tokens`.
+
+    Chunks from the same source page are put back in reading order and the
+    text repeated by the splitter's chunk overlap is dropped, so adjacent
+    chunks merge into one passage. Passages are emitted in retrieval rank
+    order until the token budget is spent; the last one is truncated to fit.
+    """
+
+    def __init__(self, max_tokens: int = 1500, tokenizer=None,
+                 encoding_name: str = DEFAULT_ENCODING, max_overlap: int = 200,
+                 min_overlap: int = 20, min_tail_tokens: int = 50):
+        self.max_tokens = max_tokens
+        self.tokenizer = tokenizer if tokenizer is not None else _load_tokenizer(encoding_name)
+
+        # Only suffix/prefix matches of at least `min_overlap` characters are
+        # treated as splitter overlap (chunks without a start_index)
+        self.max_overlap = max_overlap
+        self.min_overlap = min_overlap
+
+        # A truncated passage shorter than this is left out instead
+        self.min_tail_tokens = min_tail_tokens
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text))
+
+    def _merge(self, documents: List[Document]) -> List[str]:
+        """
+        Merges chunks of one page into passages, removing repeated overlap.
+        """
+        if all("start_index" in doc.metadata for doc in documents):
+            documents = sorted(documents, key=lambda doc: doc.metadata["start_index"])
+
+        passages: List[Tuple[Optional[int], str]] = []
+        for doc in documents:
+            text = doc.page_content
+            start = doc.metadata.get("start_index")
+
+            if passages:
+                previous_start, previous = passages[-1]
+
+                if start is not None and previous_start is not None:
+                    end = previous_start + len(previous)
+                    if start <= end:
+                        passages[-1] = (previous_start, previous + text[end - start:])
+                        continue
+                elif text in previous:
+                    continue
+                else:
+                    overlap = overlap_length(previous, text, self.max_overlap)
+                    if overlap >= self.min_overlap:
+                        passages[-1] = (previous_start, previous + text[overlap:])
+                        continue
+
+            passages.append((start, text))
+
+        return [text for _, text in passages]
+
+    def build(self, documents: List[Document]) -> str:
+        """
+        Combines retrieved chunks into a context string within the token budget.
+        """
+        # Group by page, keeping the groups in the rank order of their best chunk
+        groups: Dict[tuple, List[Document]] = {}
+        for doc in documents:
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+            groups.setdefault(key, []).append(doc)
+
+        sections = []
+        remaining = self.max_tokens
+        separator_tokens = self.count_tokens("\n\n")
+
+        for (_, page), group in groups.items():
+            label = f"(Page {page if page is not None else 'N/A'}): "
+
+            for passage in self._merge(group):
+                section = label + passage
+                cost = self.count_tokens(section) + (separator_tokens if sections else 0)
+
+                if cost <= remaining:
+                    sections.append(section)
+                    remaining -= cost
+                    continue
+
+                # Truncate the last passage to the tokens that are left
+                budget = remaining - (separator_tokens if sections else 0)
+                if budget >= self.min_tail_tokens:
+                    sections.append(self.tokenizer.decode(self.tokenizer.encode(section)[:budget]))
+                return "\n\n".join(sections)
+
+        return "\n\n".join(sections)
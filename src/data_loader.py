@@ -1,39 +1,412 @@
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import os
+import time
 from pathlib import Path
-from typing import List
+from typing import Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 from langchain_core.documents import Document
 from langchain_community.document_loaders import PyMuPDFLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from chunker import Chunker, ChunkingConfig, chunking_from_env
+from manifest import chunk_sha256, file_sha256
+from metrics import count, recorded, replay, stage
+from pdf_extractor import PageCache, extract_pdf_pages, repeated_margins
+
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+# "native" reads PyMuPDF text blocks directly (see pdf_extractor), dropping
+# running headers/footers and caching page text; "langchain" uses PyMuPDFLoader
+PDF_EXTRACTORS = ("native", "langchain")
+# Page cache directory under the data directory, unless RAG_PAGE_CACHE says otherwise
+PAGE_CACHE_DIRNAME = ".page_cache"
+
+PageRange = Optional[Tuple[int, int]]
+# (file_path, pages, file hash or None, repeated headers/footers or None):
+# what a worker needs beyond the loader's own settings
+Task = Tuple[Path, PageRange, Optional[str], Optional[FrozenSet[str]]]
+
+
+class IngestionError(NamedTuple):
+    source: str
+    error: str
+
+
+def _load_pdf_pages(file_path: Path, start: int, stop: int) -> List[Document]:
+    """
+    Extracts pages [start, stop) of a PDF with the same text and metadata
+    PyMuPDFLoader produces, so a large PDF can be split across workers.
+    """
+    import fitz
+
+    documents = []
+    with fitz.open(str(file_path)) as pdf:
+        file_metadata = {
+            key: value for key, value in pdf.metadata.items()
+            if type(value) in (str, int)
+        }
+        for page_number in range(start, stop):
+            documents.append(Document(
+                page_content=pdf[page_number].get_text(),
+                metadata={
+                    "source": str(file_path),
+                    "file_path": str(file_path),
+                    "page": page_number,
+                    "total_pages": len(pdf),
+                    **file_metadata,
+                }
+            ))
+    return documents
+
+
+def _pdf_page_count(file_path: Path) -> int:
+    import fitz
+
+    with fitz.open(str(file_path)) as pdf:
+        return len(pdf)
+
+
+# The loader of a pool worker, sent once per process by _init_worker
+# rather than with every task
+_worker_loader: Optional["DataLoader"] = None
+
+
+def _init_worker(loader: "DataLoader"):
+    global _worker_loader
+    _worker_loader = loader
+
+
+def _run_task(task: Task, loader: Optional["DataLoader"] = None) -> Tuple[List[Document], Optional[str]]:
+    """
+    Process-pool entry point: loads and chunks one file or page range,
+    returning the error instead of raising so one bad file cannot fail
+    the whole run.
+    """
+    loader = loader or _worker_loader
+    try:
+        return loader._load_task(*task), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
+def _run_recorded_task(task):
+    """
+    _run_task for pool workers: also returns the parse/split stages and
+    counts recorded in the worker, for the parent to replay.
+    """
+    return recorded(_run_task, task)
+
+
+def _replayed(future):
+    result, trace = future.result()
+    replay(trace)
+    return result
+
+
+def _ordered_map(pool, payloads, window: int):
+    """
+    Like pool.map, but keeps at most `window` tasks in flight so results
+    are not buffered for the whole corpus. Metrics recorded by the workers
+    are replayed here as each result is taken.
+    """
+    pending = deque()
+    for payload in payloads:
+        pending.append(pool.submit(_run_recorded_task, payload))
+        if len(pending) >= window:
+            yield _replayed(pending.popleft())
+
+    while pending:
+        yield _replayed(pending.popleft())
 
 
 class DataLoader:
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, workers: int = 1, pages_per_task: int = 64,
+                 pdf_extractor: Optional[str] = None,
+                 page_cache_dir: Optional[str] = None,
+                 chunking: Optional[ChunkingConfig] = None):
         self.data_dir = Path(data_dir)
 
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
+        # Read here rather than at import, so a .env loaded by the caller applies
+        pdf_extractor = pdf_extractor or os.getenv("RAG_PDF_EXTRACTOR") or "native"
+        if pdf_extractor not in PDF_EXTRACTORS:
+            raise ValueError(f"Unknown PDF extractor '{pdf_extractor}'. Choose from {', '.join(PDF_EXTRACTORS)}.")
+        self.pdf_extractor = pdf_extractor
+
+        # None means RAG_PAGE_CACHE, defaulting to <data_dir>/.page_cache; ""
+        # disables the cache. Made absolute, so workers agree on it
+        if page_cache_dir is None:
+            page_cache_dir = os.getenv("RAG_PAGE_CACHE", str(self.data_dir / PAGE_CACHE_DIRNAME))
+        self.page_cache = (
+            PageCache(os.path.abspath(page_cache_dir)) if page_cache_dir and pdf_extractor == "native" else None
         )
+        # (path, size, mtime) -> SHA-256, given by the caller (e.g. from the
+        # manifest diff) or computed once, so no file is hashed twice
+        self._file_hashes: Dict[tuple, str] = {}
+        # (path, size, mtime) -> repeated header/footer keys of PDFs split into
+        # page ranges, found once while planning instead of once per range
+        self._margins: Dict[tuple, FrozenSet[str]] = {}
 
-    def load_and_split_documents(self) -> List[Document]:
-        raw_documents: List[Document] = []
+        # Parallel ingestion: files (and page ranges of PDFs longer than
+        # pages_per_task) are parsed and chunked across a process pool
+        self.workers = max(1, min(workers, os.cpu_count() or 1))
+        self.pages_per_task = pages_per_task
+        self.errors: List[IngestionError] = []
+
+        # Token-aware by default (see chunker); RAG_CHUNK_* when not given
+        self.chunking = chunking or chunking_from_env()
+        self.text_splitter = Chunker(self.chunking)
+
+    def __getstate__(self) -> dict:
+        # Pool workers get each task's file hash and margins with the task,
+        # not these per-corpus caches
+        return {**self.__dict__, "_file_hashes": {}, "_margins": {}}
 
-        for file_path in self.data_dir.iterdir():
-            if file_path.suffix.lower() == ".pdf":
-                loader = PyMuPDFLoader(str(file_path))
-                docs = loader.load()
-                raw_documents.extend(docs)
+    def chunking_config(self) -> dict:
+        """
+        Everything that determines the chunks produced from unchanged files;
+        the index records it and is rebuilt when it changes.
+        """
+        return {**self.chunking._asdict(), "pdf_extractor": self.pdf_extractor}
+
+    def list_files(self) -> List[Path]:
+        """
+        Returns the supported files in the data directory, in a stable order.
+        """
+        return sorted(
+            file_path for file_path in self.data_dir.iterdir()
+            if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+        )
 
-            elif file_path.suffix.lower() == ".txt":
-                loader = TextLoader(str(file_path), encoding="utf-8")
-                docs = loader.load()
-                raw_documents.extend(docs)
+    def source_key(self, file_path: Path) -> str:
+        """
+        Identifies a file independently of how the data directory was spelled.
+        """
+        return file_path.relative_to(self.data_dir).as_posix()
 
+    def _split_and_tag(self, file_path: Path, raw_documents: List[Document], seen: Counter) -> List[Document]:
         # 🔹 Chunking happens here
         split_documents = self.text_splitter.split_documents(raw_documents)
 
+        source_key = self.source_key(file_path)
+        file_type = file_path.suffix.lstrip(".").lower()
+        ingested_at = time.time()
+
         # Add metadata
         for doc in split_documents:
             doc.metadata["source"] = doc.metadata.get("source", "unknown")
+            doc.metadata["source_key"] = source_key
+            doc.metadata["file_type"] = file_type
+            doc.metadata["ingested_at"] = ingested_at
+
+            chunk_id = chunk_sha256(source_key, doc.metadata.get("page"), doc.page_content)
+            seen[chunk_id] += 1
+            if seen[chunk_id] > 1:
+                # Identical chunks on the same page still need distinct IDs
+                chunk_id = f"{chunk_id}-{seen[chunk_id] - 1}"
+            doc.metadata["chunk_id"] = chunk_id
+
+        return split_documents
+
+    def _raw_loader(self, file_path: Path):
+        if file_path.suffix.lower() == ".pdf":
+            return PyMuPDFLoader(str(file_path))
+        return TextLoader(str(file_path), encoding="utf-8")
+
+    def _is_native_pdf(self, file_path: Path) -> bool:
+        return self.pdf_extractor == "native" and file_path.suffix.lower() == ".pdf"
+
+    def _stat_key(self, file_path: Path) -> tuple:
+        stat = file_path.stat()
+        return str(file_path), stat.st_size, stat.st_mtime_ns
+
+    def _file_hash(self, file_path: Path) -> str:
+        key = self._stat_key(file_path)
+        if key not in self._file_hashes:
+            self._file_hashes[key] = file_sha256(file_path)
+        return self._file_hashes[key]
+
+    def _known_hash(self, file_path: Path) -> Optional[str]:
+        return self._file_hashes.get(self._stat_key(file_path))
+
+    def _plan_margins(self, file_path: Path):
+        """
+        Finds the repeated headers/footers of a PDF about to be split into
+        page ranges (from the page cache if possible), so each range task
+        gets them instead of scanning the margins of the whole file itself.
+        """
+        key = self._stat_key(file_path)
+        if key in self._margins:
+            return
+
+        file_hash = self._file_hash(file_path) if self.page_cache is not None else None
+        repeated = self.page_cache.get_margins(file_hash) if file_hash is not None else None
+        if repeated is None:
+            with stage("pdf_margins"):
+                repeated = repeated_margins(file_path)
+            if file_hash is not None:
+                self.page_cache.put_margins(file_hash, repeated)
+        self._margins[key] = repeated
+
+    def _page_count(self, file_path: Path) -> int:
+        # Only a hash already known is worth a cache lookup; opening the PDF
+        # reads far less than hashing it
+        file_hash = self._known_hash(file_path)
+        if self.page_cache is not None and file_hash is not None:
+            total_pages = self.page_cache.page_count(file_hash)
+            if total_pages is not None:
+                return total_pages
+        return _pdf_page_count(file_path)
+
+    def _load_native_pdf(self, file_path: Path, pages: PageRange, file_hash: Optional[str] = None,
+                         repeated: Optional[FrozenSet[str]] = None) -> List[Document]:
+        """
+        Pages of a PDF as Documents, from the page cache when every page of
+        the range is there, otherwise extracted (and cached). Empty and
+        image-only pages are skipped. `file_hash` and `repeated` are taken
+        from the loader's caches when not given.
+        """
+        start, stop = pages if pages is not None else (0, None)
+        texts, total_pages = None, None
+
+        if self.page_cache is not None:
+            file_hash = file_hash or self._file_hash(file_path)
+            total_pages = self.page_cache.page_count(file_hash)
+            if total_pages is not None:
+                texts = self.page_cache.get(file_hash, start, min(stop or total_pages, total_pages))
+
+        if texts is None:
+            if repeated is None:
+                # Precomputed for PDFs that _plan_tasks split into ranges
+                repeated = self._margins.get(self._stat_key(file_path))
+            total_pages, texts = extract_pdf_pages(file_path, start, stop, repeated=repeated)
+            count("pdf_pages_extracted", len(texts))
+            if self.page_cache is not None:
+                self.page_cache.put(file_hash, total_pages, texts)
+        else:
+            count("pdf_pages_cached", len(texts))
+
+        return [
+            Document(
+                page_content=text,
+                metadata={"source": str(file_path), "file_path": str(file_path), "page": page, "total_pages": total_pages}
+            )
+            for page, text in sorted(texts.items()) if text
+        ]
+
+    def _load_task(self, file_path: Path, pages: PageRange, file_hash: Optional[str] = None,
+                   repeated: Optional[FrozenSet[str]] = None) -> List[Document]:
+        # In a pool worker these are sent back with the result (see _ordered_map)
+        with stage("parse"):
+            if self._is_native_pdf(file_path):
+                raw_documents = self._load_native_pdf(file_path, pages, file_hash, repeated)
+            elif pages is not None:
+                raw_documents = _load_pdf_pages(file_path, *pages)
+            else:
+                raw_documents = self._raw_loader(file_path).load()
+
+        with stage("split"):
+            return self._split_and_tag(file_path, raw_documents, Counter())
+
+    def _plan_tasks(self, file_paths: Iterable[Path]) -> List[Tuple[Path, PageRange]]:
+        tasks = []
+
+        for file_path in file_paths:
+            if self.workers > 1 and file_path.suffix.lower() == ".pdf":
+                try:
+                    page_count = self._page_count(file_path)
+                except Exception:
+                    # Let the worker hit (and report) the same error
+                    page_count = 0
+
+                if page_count > self.pages_per_task:
+                    if self._is_native_pdf(file_path):
+                        try:
+                            self._plan_margins(file_path)
+                        except Exception:
+                            # Each range task then scans the margins itself
+                            pass
+                    for start in range(0, page_count, self.pages_per_task):
+                        stop = min(start + self.pages_per_task, page_count)
+                        tasks.append((file_path, (start, stop)))
+                    continue
+
+            tasks.append((file_path, None))
+
+        return tasks
+
+    def _payloads(self, tasks: List[Tuple[Path, PageRange]]) -> List[Task]:
+        return [
+            (file_path, pages, self._known_hash(file_path), self._margins.get(self._stat_key(file_path)))
+            for file_path, pages in tasks
+        ]
+
+    def _pool(self, max_workers: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(self,))
+
+    def remember_hashes(self, file_hashes: Dict[Path, str]):
+        """
+        Records SHA-256 digests the caller already computed (e.g. the
+        manifest diff), so loading does not hash those files again.
+        """
+        for file_path, file_hash in file_hashes.items():
+            self._file_hashes[self._stat_key(file_path)] = file_hash
+
+    def load_file(self, file_path: Path) -> List[Document]:
+        """
+        Loads and chunks a single file, tagging every chunk with a
+        content-hashed `chunk_id`.
+        """
+        return self._load_task(file_path, None)
+
+    def load_files(self, file_paths: Iterable[Path]) -> Iterator[Tuple[Path, List[Document]]]:
+        """
+        Loads and chunks files, yielding (file_path, chunks) in input order.
+
+        With workers > 1 the work runs in a process pool. Files that fail
+        to load are skipped and recorded in `self.errors`.
+        """
+        self.errors = []
+        tasks = self._plan_tasks(file_paths)
+        payloads = self._payloads(tasks)
+
+        if self.workers > 1 and len(tasks) > 1:
+            with self._pool(min(self.workers, len(tasks))) as pool:
+                yield from self._collect(tasks, _ordered_map(pool, payloads, 2 * self.workers))
+        else:
+            yield from self._collect(tasks, map(partial(_run_task, loader=self), payloads))
+
+    def _task_label(self, file_path: Path, pages: PageRange) -> str:
+        source = self.source_key(file_path)
+        if pages is not None:
+            source = f"{source} (pages {pages[0]}-{pages[1] - 1})"
+        return source
+
+    def _collect(self, tasks, results) -> Iterator[Tuple[Path, List[Document]]]:
+        current, chunks, failed = None, [], False
+
+        for (file_path, pages), (documents, error) in zip(tasks, results):
+            if file_path != current:
+                if current is not None and not failed:
+                    yield current, chunks
+                current, chunks, failed = file_path, [], False
+
+            if error is not None:
+                self.errors.append(IngestionError(self._task_label(file_path, pages), error))
+                count("ingest_errors")
+                failed = True
+
+            count("chunks_loaded", len(documents))
+            chunks.extend(documents)
+
+        if current is not None and not failed:
+            yield current, chunks
+
+    def load_and_split_documents(self) -> List[Document]:
+        split_documents: List[Document] = []
+
+        for _, documents in self.load_files(self.list_files()):
+            split_documents.extend(documents)
 
         return split_documents
@@ -1,15 +1,154 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import os
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from metrics import count, stage
+
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Its max_seq_length: longer inputs are truncated when encoded
+MODEL_MAX_TOKENS = 256
+# Default of `cache_dir` arguments: RAG_EMBEDDING_CACHE, read when the
+# pipeline is built (after the entry point's load_dotenv), not at import
+CACHE_DIR_FROM_ENV = object()
+
+
+def resolve_cache_dir(cache_dir) -> Optional[str]:
+    """
+    The embedding cache directory to use, None when caching is disabled.
+    """
+    if cache_dir is CACHE_DIR_FROM_ENV:
+        return os.getenv("RAG_EMBEDDING_CACHE", ".embedding_cache") or None
+    return cache_dir
+
+
+def set_torch_threads(num_threads: int):
+    """
+    Sets the number of CPU threads torch encodes with. This is process-wide,
+    so only code that owns the process (a benchmark, a shard ingestion
+    worker) should call it; building an engine leaves it alone.
+    """
+    import torch
+
+    torch.set_num_threads(num_threads)
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Batched sentence-transformers encoder.
+
+    Encodes in large configurable batches (across torch's CPU threads, see
+    `set_torch_threads`) and returns contiguous float32 NumPy arrays (no
+    per-vector Python list conversion). Being a LangChain `Embeddings`, it
+    can be handed to FAISS directly, which accepts the arrays as-is.
+    """
+
+    def __init__(
+        self,
+        model_name: str = MODEL_NAME,
+        batch_size: int = 256,
+        normalize: bool = False,
+        device: str = "cpu",
+        model=None
+    ):
+        # `model` is anything with SentenceTransformer's encode(); loaded from `model_name` if not given
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name, device=device)
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.model = model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encodes texts into an (n, dim) C-contiguous float32 array,
+        L2-normalized in place when `normalize` is set.
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        # Same preprocessing as HuggingFaceEmbeddings, so existing indexes stay valid
+        texts = [text.replace("\n", " ") for text in texts]
+
+        with stage("encode"):
+            vectors = self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=False,
+                show_progress_bar=False
+            )
+        count("texts_encoded", len(texts))
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            np.maximum(norms, 1e-12, out=norms)
+            vectors /= norms
+
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self.encode(list(texts))
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.encode([text])[0]
+
+
+def embedder_kwargs_of(embedding_model) -> Optional[dict]:
+    """
+    EmbeddingPipeline kwargs that rebuild `embedding_model` in another
+    process (model, batch size, normalization), or None when it is not an
+    EmbeddingEngine or a cache over one.
+    """
+    engine = getattr(embedding_model, "engine", embedding_model)
+    if not isinstance(engine, EmbeddingEngine):
+        return None
+    return {"model_name": engine.model_name, "batch_size": engine.batch_size, "normalize": engine.normalize}
 
 
 class EmbeddingPipeline:
     """
     Handles text-to-vector embedding using a local open-source model.
+
+    Unless `cache_dir` (RAG_EMBEDDING_CACHE by default) is None or empty,
+    vectors are served from a persistent on-disk EmbeddingCache so
+    byte-identical chunks are only embedded once.
     """
 
-    def __init__(self):
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+    def __init__(
+        self,
+        batch_size: int = 256,
+        normalize: bool = False,
+        cache_dir=CACHE_DIR_FROM_ENV,
+        cache_size: int = 100_000,
+        model_name: str = MODEL_NAME
+    ):
+        self.engine = EmbeddingEngine(
+            model_name=model_name,
+            batch_size=batch_size,
+            normalize=normalize
         )
+        self.cache = None
+        self.embedding_model = self.engine
+
+        cache_dir = resolve_cache_dir(cache_dir)
+        if cache_dir:
+            self.cache = EmbeddingCache(cache_dir, self.engine.dimension, max_entries=cache_size)
+            self.embedding_model = CachedEmbeddings(self.engine, self.cache)
+
+    def cache_stats(self) -> Optional[dict]:
+        return self.cache.stats() if self.cache else None
 
     def embed_documents(self, documents):
         """
@@ -0,0 +1,297 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process per cache directory
+    fcntl = None
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text the way the tokenizer would see it, so texts that only
+    differ in unicode form or whitespace share a cache entry.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Persistent, size-bounded LRU cache of embedding vectors keyed by
+    (model name, normalized text hash).
+
+    Vectors live in a fixed-size memory-mapped float32 file (`vectors.f32`,
+    one slot per entry); `index.json` maps keys to slots in LRU order. Each
+    slot also records its key (`keys.bin`), so an index that is older than
+    the vector file can never serve another text's vector.
+
+    Several processes may share a directory: slots are read and written
+    under an advisory file lock (`lock`), and a flush keeps the entries
+    other processes flushed in the meantime.
+    """
+
+    def __init__(self, cache_dir: str, dimension: int, max_entries: int = 100_000,
+                 flush_interval: float = 30.0):
+        self.cache_dir = cache_dir
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, "index.json")
+        vectors_path = os.path.join(cache_dir, "vectors.f32")
+        keys_path = os.path.join(cache_dir, "keys.bin")
+        self._lock_fd = os.open(os.path.join(cache_dir, "lock"), os.O_RDWR | os.O_CREAT)
+
+        with self._locked():
+            saved = self._read_index()
+            if saved is None:
+                # No index: files of the right size are reused, their slots
+                # recovered from the keys they record
+                fits = (
+                    os.path.exists(vectors_path) and os.path.getsize(vectors_path) == max_entries * dimension * 4
+                    and os.path.exists(keys_path) and os.path.getsize(keys_path) == max_entries * 32
+                )
+            else:
+                fits = saved["dimension"] == dimension and saved["max_entries"] == max_entries
+
+            if fits:
+                self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(max_entries, dimension))
+                self._keys = np.memmap(keys_path, dtype="S32", mode="r+", shape=(max_entries,))
+                if saved is None:
+                    saved = {"entries": [(key.decode("ascii"), slot) for slot, key in enumerate(self._keys) if key]}
+                self._slots = OrderedDict((key, slot) for key, slot in saved["entries"])
+            else:
+                self._vectors = self._create(vectors_path, np.float32, (max_entries, dimension))
+                self._keys = self._create(keys_path, "S32", (max_entries,))
+
+        used = set(self._slots.values())
+        self._free = [slot for slot in range(max_entries - 1, -1, -1) if slot not in used]
+
+        atexit.register(self.flush)
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        digest = hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    @staticmethod
+    def _create(path: str, dtype, shape) -> np.memmap:
+        # Created aside and renamed into place: a process still mapping the
+        # old file keeps it instead of seeing it truncated
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        array = np.memmap(tmp_path, dtype=dtype, mode="w+", shape=shape)
+        os.replace(tmp_path, path)
+        return array
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True):
+        """
+        Holds the thread lock and the file lock shared with other processes.
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _read_index(self) -> Optional[dict]:
+        if not os.path.exists(self._index_path):
+            return None
+
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Returns a copy of the cached vector, or None on a miss.
+        """
+        with self._locked(exclusive=False):
+            slot = self._slots.get(key)
+            if slot is not None and self._keys[slot] != key.encode("ascii"):
+                # Slot was reused (here or by another process) since the index was flushed
+                del self._slots[key]
+                slot = None
+
+            if slot is None:
+                self.misses += 1
+                return None
+
+            self._slots.move_to_end(key)
+            self.hits += 1
+            return np.array(self._vectors[slot])
+
+    def put(self, keys: List[str], vectors: np.ndarray):
+        """
+        Stores vectors, evicting least-recently-used entries when full.
+        """
+        with self._locked():
+            for key, vector in zip(keys, vectors):
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._take_slot(key)
+                    self._slots[key] = slot
+                else:
+                    self._slots.move_to_end(key)
+                self._vectors[slot] = vector
+                self._keys[slot] = key.encode("ascii")
+
+            self._dirty = True
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def _take_slot(self, key: str) -> int:
+        while self._free:
+            slot = self._free.pop()
+            # Skipped if another process has filled it since
+            if not self._keys[slot]:
+                return slot
+
+        if self._slots:
+            _, slot = self._slots.popitem(last=False)
+            self.evictions += 1
+            return slot
+
+        # Every slot holds another process's entries: overwrite one
+        self.evictions += 1
+        return int(key[:8], 16) % self.max_entries
+
+    def _merge_saved_entries(self):
+        """
+        Adopts entries another process flushed since this one loaded, as the
+        least recently used, where their slot still holds their key.
+        """
+        saved = self._read_index()
+        if saved is None or saved["dimension"] != self.dimension or saved["max_entries"] != self.max_entries:
+            return
+
+        used = set(self._slots.values())
+        adopted = OrderedDict()
+        for key, slot in saved["entries"]:
+            if key not in self._slots and slot not in used and self._keys[slot] == key.encode("ascii"):
+                adopted[key] = slot
+                used.add(slot)
+
+        if adopted:
+            adopted.update(self._slots)
+            self._slots = adopted
+            self._free = [slot for slot in self._free if slot not in used]
+
+    def flush(self):
+        """
+        Writes the vector file and the LRU index to disk.
+        """
+        with self._locked():
+            if not self._dirty:
+                return
+
+            self._merge_saved_entries()
+            self._vectors.flush()
+            self._keys.flush()
+            tmp_path = f"{self._index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "dimension": self.dimension,
+                    "max_entries": self.max_entries,
+                    "entries": list(self._slots.items()),
+                }, f, separators=(",", ":"))
+            os.replace(tmp_path, self._index_path)
+
+            self._dirty = False
+            self._last_flush = time.monotonic()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain `Embeddings` that serves vectors from an EmbeddingCache and
+    only sends cache misses (deduplicated) to the underlying engine.
+    """
+
+    def __init__(self, engine, cache: EmbeddingCache):
+        self.engine = engine
+        self.cache = cache
+
+    @property
+    def model_name(self) -> str:
+        return self.engine.model_name
+
+    @property
+    def cache_namespace(self) -> str:
+        # Normalized and raw vectors of the same model must not be mixed
+        return f"{self.engine.model_name}:{'l2' if self.engine.normalize else 'raw'}"
+
+    @property
+    def dimension(self) -> int:
+        return self.engine.dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        keys = [EmbeddingCache.key(self.cache_namespace, text) for text in texts]
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        missing = {}
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                vectors[i] = cached
+
+        if missing:
+            missing_keys = list(missing)
+            computed = self.engine.encode([texts[missing[key][0]] for key in missing_keys])
+            for key, vector in zip(missing_keys, computed):
+                vectors[missing[key]] = vector
+            self.cache.put(missing_keys, computed)
+
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        # Persisted by the cache's periodic flush, and by `flush` once a
+        # sync is done, rather than rewriting the index after every file
+        return self.encode(list(texts))
+
+    def flush(self):
+        self.cache.flush()
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.encode([text])[0]
@@ -0,0 +1,275 @@
+import math
+import os
+from typing import Optional
+
+import numpy as np
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "flat_fp16", "flat_int8", "binary")
+
+# Flat indexes over compressed codes; a float32 copy of the vectors can be
+# kept next to them for exact rescoring
+QUANTIZED_TYPES = ("flat_fp16", "flat_int8", "binary")
+# ...of which these encode with trained statistics (int8 per-dimension
+# ranges, binary per-dimension medians)
+TRAINED_QUANTIZED_TYPES = ("flat_int8", "binary")
+
+# A trained int8/binary index is retrained (and re-encoded) once rows added
+# since its training exceed this share of the rows it was trained on...
+RETRAIN_GROWTH = 0.25
+# ...or once rows added by a sync drift this far from its statistics (see
+# quantizer_drift); otherwise they are encoded with the trained quantizer
+RETRAIN_DRIFT = 0.01
+
+# A filter selecting at most this share of an HNSW index is scored exactly:
+# the filtered graph walk rarely reaches that few rows
+EXACT_SELECTION_FRACTION = 0.05
+
+
+def default_nlist(n_vectors: int) -> int:
+    """
+    ~4*sqrt(n) inverted lists, capped so every list gets ~39 training
+    points (FAISS' recommended minimum).
+    """
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def create_index(index_type: str, dimension: int, n_vectors: int,
+                 nlist: Optional[int] = None, pq_m: int = 48, pq_nbits: int = 8,
+                 hnsw_m: int = 32, ef_construction: int = 200):
+    """
+    Creates an empty (untrained) FAISS index of the requested type.
+
+    - flat:     exact L2 search (the default, same as FAISS.from_documents)
+    - ivf_flat: inverted lists over full vectors, searched `nprobe` lists deep
+    - ivf_pq:   inverted lists over product-quantized codes (pq_m sub-vectors)
+    - hnsw:     graph index, searched `efSearch` candidates wide
+    - flat_fp16: exact search over float16 codes (half the memory)
+    - flat_int8: exact search over 8-bit scalar-quantized codes (a quarter)
+    - binary:   one bit per dimension (above/below its median), searched by
+                Hamming distance (1/32 of the memory); meant to be rescored
+    """
+    faiss = dependable_faiss_import()
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = nlist or default_nlist(n_vectors)
+        quantizer = faiss.IndexFlatL2(dimension)
+
+        if index_type == "ivf_flat":
+            return faiss.IndexIVFFlat(quantizer, dimension, nlist)
+
+        if dimension % pq_m != 0:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dimension}.")
+        # PQ codebooks need at least 2**nbits training points
+        pq_nbits = min(pq_nbits, max(1, int(math.log2(max(n_vectors, 2)))))
+        return faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    if index_type == "flat_fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+
+    if index_type == "flat_int8":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+
+    if index_type == "binary":
+        # nbits=dimension, no random rotation, per-dimension median thresholds
+        return faiss.IndexLSH(dimension, dimension, False, True)
+
+    raise ValueError(f"Unknown index type '{index_type}'. Choose from {', '.join(INDEX_TYPES)}.")
+
+
+def train_index(index, vectors: np.ndarray, sample_size: int = 50_000, seed: int = 0):
+    """
+    Trains the index on a random sample of the vectors, if it needs training.
+    """
+    if index.is_trained:
+        return
+
+    if len(vectors) > sample_size:
+        rng = np.random.default_rng(seed)
+        vectors = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+
+def set_search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """
+    Applies query-time knobs: `nprobe` for IVF indexes, `efSearch` for HNSW.
+    Knobs that don't apply to the index type are ignored.
+    """
+    faiss = dependable_faiss_import()
+
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
+def selector_search_params(index, rows: np.ndarray):
+    """
+    Search parameters restricting a search to the given rows (IDSelector).
+
+    The index's nprobe / efSearch are scaled by the inverse of the share of
+    rows selected, so a selective filter still reaches k matching rows
+    (a filter matching 1/nprobe of the rows or less probes every IVF list).
+    """
+    faiss = dependable_faiss_import()
+    rows = np.ascontiguousarray(rows, dtype=np.int64)
+    selector = faiss.IDSelectorBatch(len(rows), faiss.swig_ptr(rows))
+    scale = index.ntotal / max(len(rows), 1)
+
+    if hasattr(index, "hnsw"):
+        ef_search = min(max(index.ntotal, index.hnsw.efSearch), math.ceil(index.hnsw.efSearch * scale))
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return faiss.SearchParameters(sel=selector)
+    return faiss.SearchParametersIVF(sel=selector, nprobe=min(ivf.nlist, math.ceil(ivf.nprobe * scale)))
+
+
+def search_rows_exact(index, queries: np.ndarray, rows: np.ndarray, k: int):
+    """
+    Exact search over just `rows` of an index that can reconstruct them
+    (HNSW stores full vectors). Returns (distances, rows) like index.search.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    vectors = index.reconstruct_batch(rows)
+    positions = np.tile(np.arange(len(rows)), (len(queries), 1))
+    distances, found = rescore_exact(vectors, queries, positions, k)
+    return distances, np.where(found >= 0, rows[found], -1)
+
+
+def rescore_exact(vectors: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int):
+    """
+    Re-ranks candidate rows (-1 for none) of each query by exact squared L2
+    distance against `vectors` (typically memory-mapped, so only the
+    candidates' rows are read). Returns (distances, rows) like index.search.
+    """
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    rows = np.full((len(queries), k), -1, dtype=np.int64)
+
+    for i, (query, candidate_rows) in enumerate(zip(queries, candidates)):
+        # Sorted, de-duplicated reads are sequential on the mapped file
+        candidate_rows = np.unique(candidate_rows[candidate_rows != -1])
+        exact = ((np.asarray(vectors[candidate_rows], dtype=np.float32) - query) ** 2).sum(axis=1)
+        order = np.argsort(exact)[:k]
+
+        distances[i, :len(order)] = exact[order]
+        rows[i, :len(order)] = candidate_rows[order]
+
+    return distances, rows
+
+
+def quantizer_drift(index, vectors: np.ndarray) -> float:
+    """
+    How far rows added to a trained int8/binary index fall from the
+    statistics it was trained on (0 when they match them):
+
+    - flat_int8: mean clipping of their values outside the trained
+      per-dimension ranges, as a share of the range (0.01 is ~2.5 of the
+      255 quantization steps)
+    - binary: mean distance of the per-dimension thresholds from the
+      medians of the whole index, as a share of its rows
+
+    The statistics are read back through the index's codec (sa_decode /
+    sa_encode) rather than its trained arrays.
+    """
+    faiss = dependable_faiss_import()
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if not len(vectors):
+        return 0.0
+
+    if isinstance(index, faiss.IndexLSH):
+        # One bit per dimension, set above the threshold (LSB first)
+        bits = np.unpackbits(index.sa_encode(vectors), axis=1, bitorder="little")[:, :index.d]
+        # The trained rows split evenly around the thresholds, so only the new ones tip the balance
+        above = bits.sum(axis=0)
+        return float(np.mean(np.abs(above - len(vectors) / 2)) / max(index.ntotal, len(vectors)))
+
+    # SQ8 decodes code c to low + (c + 0.5) / 255 * width
+    first, last = index.sa_decode(np.array([[0] * index.d, [255] * index.d], dtype=np.uint8))
+    width = np.maximum(last - first, 1e-12)
+    low = first - 0.5 / 255 * width
+    clipped = np.maximum(np.maximum(low - vectors, vectors - (low + width)), 0.0)
+    return float(np.mean(clipped / width))
+
+
+def supports_remove(index) -> bool:
+    """
+    Whether FAISS.delete can be used: only flat-code indexes renumber the
+    remaining vectors after remove_ids. HNSW cannot remove at all, and IVF
+    keeps the old ids, which would desync LangChain's id mapping.
+    """
+    faiss = dependable_faiss_import()
+    return isinstance(index, faiss.IndexFlatCodes)
+
+
+def reconstruct_all(index) -> np.ndarray:
+    """
+    Returns all stored vectors (decoded, for quantized indexes) in id order.
+    """
+    faiss = dependable_faiss_import()
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return index.reconstruct_n(0, index.ntotal)
+
+    # IVF lists are not addressable by id without a direct map
+    ivf.make_direct_map(True)
+    try:
+        return index.reconstruct_n(0, index.ntotal)
+    finally:
+        ivf.make_direct_map(False)
+
+
+def index_type_of(index) -> str:
+    faiss = dependable_faiss_import()
+
+    if hasattr(index, "hnsw"):
+        return "hnsw"
+    if isinstance(index, faiss.IndexLSH):
+        return "binary"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "flat_fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "flat_int8"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return "flat"
+
+
+def index_memory_bytes(index) -> int:
+    """
+    Size of the serialized index, a close proxy for its resident memory.
+    """
+    faiss = dependable_faiss_import()
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def search_params_from_env() -> dict:
+    """
+    Query-time knobs from RAG_NPROBE / RAG_EF_SEARCH (unset means FAISS
+    defaults) and RAG_RESCORE (unset or 0 disables rescoring).
+    """
+    nprobe = os.getenv("RAG_NPROBE")
+    ef_search = os.getenv("RAG_EF_SEARCH")
+    return {
+        "nprobe": int(nprobe) if nprobe else None,
+        "ef_search": int(ef_search) if ef_search else None,
+        "rescore": int(os.getenv("RAG_RESCORE", "0") or 0),
+    }
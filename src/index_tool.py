@@ -0,0 +1,128 @@
+"""
+Builds FAISS index variants over the same chunks and compares them against
+the exact flat baseline: build time, memory, p50/p99 latency and recall@k.
+
+Usage (from the project root):
+    python src/index_tool.py --types flat,ivf_flat,ivf_pq,hnsw --nprobe 16 --ef-search 64
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from data_loader import DataLoader
+from embedding import EmbeddingPipeline
+from index_factory import INDEX_TYPES, index_memory_bytes
+from vector_store import VectorStore
+
+
+def load_queries(path, documents, count: int, seed: int = 0):
+    """
+    Questions from a JSONL file ({"question": ...} per line), or chunk
+    openings sampled from the corpus when no file is given.
+    """
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line)["question"] for line in f if line.strip()][:count]
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(documents), min(count, len(documents)), replace=False)
+    return [documents[i].page_content[:200] for i in picks]
+
+
+def search_all(index, queries: np.ndarray, k: int):
+    """
+    Runs queries one at a time (as the app does), returning ids and latencies.
+    """
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids[i] = index.search(query.reshape(1, -1), k)
+        latencies[i] = time.perf_counter() - start
+
+    return ids, latencies
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and benchmark FAISS index variants.")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--out-dir", default="faiss_index_variants")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--queries", help="JSONL file with a 'question' field per line")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--train-size", type=int, default=50_000)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    index_types = [t for t in args.types.split(",") if t]
+    if "flat" not in index_types:
+        index_types.insert(0, "flat")
+
+    documents = DataLoader(args.data_dir).load_and_split_documents()
+    embedder = EmbeddingPipeline()
+
+    print(f"Embedding {len(documents)} chunks...")
+    vectors = embedder.embedding_model.embed_documents([doc.page_content for doc in documents])
+    queries = embedder.embedding_model.embed_documents(
+        load_queries(args.queries, documents, args.num_queries)
+    )
+    k = min(args.k, len(documents))
+
+    index_params = {
+        "ivf_flat": {"nlist": args.nlist},
+        "ivf_pq": {"nlist": args.nlist, "pq_m": args.pq_m},
+        "hnsw": {"hnsw_m": args.hnsw_m},
+    }
+
+    truth = None
+    print(f"\n{'type':<9} {'build s':>8} {'memory MB':>10} {'p50 ms':>8} {'p99 ms':>8} {f'recall@{k}':>10}")
+
+    for index_type in index_types:
+        vector_store = VectorStore(
+            embedding_model=embedder.embedding_model,
+            index_path=os.path.join(args.out_dir, index_type),
+            index_type=index_type,
+            index_params=index_params.get(index_type),
+            train_size=args.train_size,
+            nprobe=args.nprobe,
+            ef_search=args.ef_search
+        )
+
+        start = time.perf_counter()
+        vector_store.build_index_from_vectors(documents, vectors)
+        build_seconds = time.perf_counter() - start
+        vector_store.save_index()
+
+        index = vector_store.vector_store.index
+        ids, latencies = search_all(index, queries, k)
+        if truth is None:
+            truth = ids
+
+        print(
+            f"{index_type:<9} {build_seconds:>8.2f} {index_memory_bytes(index) / 1e6:>10.1f} "
+            f"{np.percentile(latencies, 50) * 1000:>8.3f} {np.percentile(latencies, 99) * 1000:>8.3f} "
+            f"{recall_at_k(ids, truth):>10.3f}"
+        )
+
+    print(f"\nIndexes saved under {args.out_dir}/<type>")
+
+
+if __name__ == "__main__":
+    main()
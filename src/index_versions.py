@@ -0,0 +1,91 @@
+import os
+import shutil
+from typing import List, Optional, Tuple
+
+
+# Layout under the index root:
+#   CURRENT               name of the published version, e.g. "v000003"
+#   file_stats.json       stat fingerprints refreshed since it was published
+#   versions/v000003/     index.faiss, chunks, bm25.json, manifest.json
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+VERSION_PREFIX = "v"
+
+
+def version_path(root: str, version: str) -> str:
+    return os.path.join(root, VERSIONS_DIR, version)
+
+
+def current_version(root: str) -> Optional[str]:
+    """
+    The published version, or None for an unversioned (legacy) root.
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+
+    return version if version and os.path.isdir(version_path(root, version)) else None
+
+
+def resolve(root: str) -> str:
+    """
+    Directory holding the index files to read: the published version, or
+    the root itself for indexes saved before versioning.
+    """
+    version = current_version(root)
+    return version_path(root, version) if version else root
+
+
+def list_versions(root: str) -> List[str]:
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(versions_dir)
+        if name.startswith(VERSION_PREFIX) and name[len(VERSION_PREFIX):].isdigit()
+    )
+
+
+def new_version(root: str) -> Tuple[str, str]:
+    """
+    Creates an empty directory for the next version; returns (version, path).
+    """
+    existing = list_versions(root)
+    number = int(existing[-1][len(VERSION_PREFIX):]) + 1 if existing else 1
+
+    while True:
+        version = f"{VERSION_PREFIX}{number:06d}"
+        path = version_path(root, version)
+        try:
+            os.makedirs(path)
+            return version, path
+        except FileExistsError:
+            # Another writer took this number
+            number += 1
+
+
+def publish(root: str, version: str):
+    """
+    Atomically points CURRENT at `version`: readers see either the old or
+    the new version, never a partially written one.
+    """
+    path = os.path.join(root, CURRENT_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+def prune(root: str, keep: int = 3):
+    """
+    Deletes all but the newest `keep` versions (never the published one).
+    Processes still mapping a deleted version keep a valid view until they
+    swap, as the files are only unlinked.
+    """
+    current = current_version(root)
+    for version in list_versions(root)[:-keep] if keep > 0 else list_versions(root):
+        if version != current:
+            shutil.rmtree(version_path(root, version), ignore_errors=True)
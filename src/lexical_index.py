@@ -0,0 +1,130 @@
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+# Keeps codes such as "AB-12.3" or "ISO_9001" together as one token
+TOKEN_PATTERN = re.compile(r"[0-9A-Za-z]+(?:[-_./][0-9A-Za-z]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Fuses several ranked ID lists: score(id) = sum(1 / (k + rank)).
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+
+    return sorted(scores, key=lambda item: (-scores[item], item))
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over chunk texts, keyed by chunk ID.
+    Supports incremental add/remove and is persisted as `bm25.json`
+    next to the FAISS index.
+    """
+
+    FILENAME = "bm25.json"
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, chunk_ids: Sequence[str], texts: Sequence[str]):
+        for chunk_id, text in zip(chunk_ids, texts):
+            if chunk_id in self.doc_lengths:
+                self.remove([chunk_id])
+
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[chunk_id] = tf
+
+            length = sum(terms.values())
+            self.doc_lengths[chunk_id] = length
+            self.total_length += length
+
+    def remove(self, chunk_ids: Iterable[str]):
+        removed = {chunk_id for chunk_id in chunk_ids if chunk_id in self.doc_lengths}
+        if not removed:
+            return
+
+        for term in list(self.postings):
+            posting = self.postings[term]
+            for chunk_id in removed.intersection(posting):
+                del posting[chunk_id]
+            if not posting:
+                del self.postings[term]
+
+        for chunk_id in removed:
+            self.total_length -= self.doc_lengths.pop(chunk_id)
+
+    def search(self, query: str, k: int, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Returns the top-k (chunk_id, score) pairs for the query, optionally
+        restricted to the `allowed` chunk IDs.
+        """
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+
+        average_length = self.total_length / n_docs
+        scores: Dict[str, float] = {}
+
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_id, tf in posting.items():
+                if allowed is not None and chunk_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, cls.FILENAME))
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.FILENAME)
+
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "doc_lengths": self.doc_lengths,
+                "postings": self.postings,
+            }, f, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index":
+        with open(os.path.join(directory, cls.FILENAME), "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = data["postings"]
+        index.total_length = sum(index.doc_lengths.values())
+        return index
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+# Kept apart from the (large) manifest so startup can check it cheaply
+CHUNKING_FILENAME = "chunking.json"
+# Stat fingerprints refreshed after a version was published (files touched
+# but not modified); kept at the index root, as published versions are immutable
+FILE_STATS_FILENAME = "file_stats.json"
+
+
+def file_sha256(file_path: Path, block_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(source: str, page, content: str) -> str:
+    """
+    Returns the content hash identifying a chunk within its source file.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{source}\0{page}\0".encode("utf-8"))
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _write_json(path: str, data, **kwargs):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_path, path)
+
+
+def saved_chunking(index_dir: str) -> Optional[dict]:
+    """
+    Returns the chunking config an index was built with, or None for
+    indexes built before it was recorded.
+    """
+    path = os.path.join(index_dir, CHUNKING_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class IngestionManifest:
+    """
+    Persists per-file and per-chunk content hashes so ingestion only has to
+    process files that were added, changed or removed since the last run.
+    The chunking config the hashes were produced with is saved alongside.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, dict] = {}
+        self.chunking: Optional[dict] = None
+        # Rows an int8/binary quantizer was trained on and added since
+        # ({"trained_rows", "added_rows"}), or None
+        self.quantizer: Optional[dict] = None
+        # Sources whose stat fingerprint diff() refreshed
+        self.touched: List[str] = []
+
+        if os.path.exists(self.path):
+            self.load()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self):
+        """
+        Loads the manifest from disk.
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.chunking = saved_chunking(os.path.dirname(self.path))
+        if data.get("version") != MANIFEST_VERSION:
+            self.files = {}
+            return
+
+        self.files = data.get("files", {})
+        self.quantizer = data.get("quantizer")
+
+    def save(self, path: Optional[str] = None):
+        """
+        Atomically writes the manifest to disk (to `path`, which becomes
+        the manifest's location, when given).
+        """
+        if path is not None:
+            self.path = path
+
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        manifest = {"version": MANIFEST_VERSION, "files": self.files}
+        if self.quantizer is not None:
+            manifest["quantizer"] = self.quantizer
+
+        for path, data in (
+            (os.path.join(directory, CHUNKING_FILENAME), self.chunking),
+            (self.path, manifest),
+        ):
+            if data is not None:
+                _write_json(path, data, indent=1)
+
+    def load_stats(self, path: str):
+        """
+        Applies stat fingerprints written by `save_stats` to the entries
+        whose content hash they were taken for.
+        """
+        if not os.path.exists(path):
+            return
+
+        with open(path, "r", encoding="utf-8") as f:
+            stats = json.load(f)
+
+        for source, stat in stats.items():
+            entry = self.files.get(source)
+            if entry and entry["sha256"] == stat["sha256"]:
+                entry["size"] = stat["size"]
+                entry["mtime"] = stat["mtime"]
+
+    def save_stats(self, path: str):
+        """
+        Atomically writes the content hash and stat fingerprint of every
+        file, without the chunk lists.
+        """
+        _write_json(path, {
+            source: {"sha256": entry["sha256"], "size": entry["size"], "mtime": entry["mtime"]}
+            for source, entry in self.files.items()
+        }, separators=(",", ":"))
+
+    def reset(self):
+        self.files = {}
+        self.quantizer = None
+
+    def diff(self, files: Dict[str, Path]) -> Tuple[List[Tuple[str, Path, str]], List[str]]:
+        """
+        Compares the files currently on disk against the manifest.
+
+        Returns (modified, removed): modified holds (source, path, sha256) for
+        every added or changed file, removed holds the sources that are gone.
+        Files whose size and mtime are unchanged are not re-hashed.
+        """
+        modified = []
+
+        for source, file_path in sorted(files.items()):
+            stat = file_path.stat()
+            entry = self.files.get(source)
+
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                continue
+
+            file_hash = file_sha256(file_path)
+            if entry and entry["sha256"] == file_hash:
+                # Touched but not modified; just refresh the stat fingerprint
+                entry["size"] = stat.st_size
+                entry["mtime"] = stat.st_mtime
+                self.touched.append(source)
+                continue
+
+            modified.append((source, file_path, file_hash))
+
+        removed = sorted(source for source in self.files if source not in files)
+        return modified, removed
+
+    def chunk_ids(self, source: str) -> List[str]:
+        entry = self.files.get(source)
+        return list(entry["chunks"]) if entry else []
+
+    def record(self, source: str, file_path: Path, file_hash: str, chunk_ids: List[str]):
+        """
+        Records the current hash and chunk IDs of an ingested file.
+        """
+        stat = file_path.stat()
+        self.files[source] = {
+            "sha256": file_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "chunks": list(chunk_ids),
+        }
+
+    def remove(self, source: str):
+        self.files.pop(source, None)
@@ -0,0 +1,224 @@
+import json
+import numbers
+import os
+import posixpath
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+FILTER_KEYS = ("source", "page", "file_type", "ingested_after", "ingested_before")
+
+
+def _as_list(value) -> list:
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+def normalize_source(source: str) -> str:
+    """
+    Spelling-independent form of a source path: forward slashes, no `./`
+    or `..` segments, no trailing slash.
+    """
+    return posixpath.normpath(str(source).replace("\\", "/"))
+
+
+def freeze_filters(filters: Optional[dict]) -> Optional[tuple]:
+    """
+    Hashable form of a filter dict, for use in cache keys.
+    """
+    if not filters:
+        return None
+    return tuple(sorted(
+        (key, tuple(_as_list(value)) if isinstance(value, (list, tuple, set, frozenset)) else value)
+        for key, value in filters.items()
+    ))
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def validate_filters(filters: dict):
+    """
+    Raises ValueError unless `filters` only uses known keys with values of
+    the types MetadataIndex.select accepts (None leaves a key unfiltered).
+    """
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter(s) {', '.join(sorted(unknown))}. Use {', '.join(FILTER_KEYS)}.")
+
+    for key in ("source", "file_type"):
+        value = filters.get(key)
+        if value is not None and not all(isinstance(v, str) for v in _as_list(value)):
+            raise ValueError(f"Filter '{key}' must be a string or a list of strings.")
+
+    page = filters.get("page")
+    if page is not None and not _is_int(page) and not (
+        isinstance(page, (list, tuple)) and len(page) == 2 and all(_is_int(p) for p in page)
+    ):
+        raise ValueError("Filter 'page' must be an integer or [first, last] integers.")
+
+    for key in ("ingested_after", "ingested_before"):
+        value = filters.get(key)
+        if value is not None and not _is_number(value):
+            raise ValueError(f"Filter '{key}' must be a unix timestamp.")
+
+
+class MetadataIndex:
+    """
+    Column arrays of chunk metadata in vector-row order (source, page, file
+    type, ingest time), used to turn a filter into the set of FAISS rows to
+    search. Selecting is a few vectorized comparisons, independent of how
+    many chunks each document has.
+
+    Rows are grouped by source key (the file's path relative to the data
+    directory, as used for chunk IDs), so a source filter matches however
+    the path is spelled: relative, absolute or with a `./` prefix.
+
+    Filters (all optional, combined with AND):
+        source:           a source path or list of them
+        page:             a page number or [first, last] (inclusive)
+        file_type:        e.g. "pdf" or ["pdf", "txt"]
+        ingested_after:   unix timestamp
+        ingested_before:  unix timestamp
+    """
+
+    FILENAME = "metadata.npz"
+
+    def __init__(self, sources: List[str], source_codes: np.ndarray, pages: np.ndarray,
+                 file_types: List[str], type_codes: np.ndarray, ingested_at: np.ndarray,
+                 source_keys: Optional[List[str]] = None):
+        self.sources = sources
+        # Indexes saved before keys were recorded fall back to the normalized source
+        self.source_keys = source_keys if source_keys is not None else [normalize_source(s) for s in sources]
+        self.source_codes = source_codes
+        self.pages = pages
+        self.file_types = file_types
+        self.type_codes = type_codes
+        self.ingested_at = ingested_at
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Document]) -> "MetadataIndex":
+        key_ids: Dict[str, int] = {}
+        sources: List[str] = []
+        type_ids: Dict[str, int] = {}
+        source_codes, pages, type_codes, ingested_at = [], [], [], []
+
+        for doc in documents:
+            metadata = doc.metadata
+            source = str(metadata.get("source", "unknown"))
+            key = metadata.get("source_key") or normalize_source(source)
+            file_type = metadata.get("file_type") or os.path.splitext(source)[1].lstrip(".").lower()
+            page = metadata.get("page")
+
+            if key not in key_ids:
+                key_ids[key] = len(key_ids)
+                sources.append(source)
+            source_codes.append(key_ids[key])
+            type_codes.append(type_ids.setdefault(file_type, len(type_ids)))
+            pages.append(int(page) if page is not None else -1)
+            ingested_at.append(float(metadata.get("ingested_at", np.nan)))
+
+        return cls(
+            sources=sources,
+            source_keys=list(key_ids),
+            source_codes=np.array(source_codes, dtype=np.int32),
+            pages=np.array(pages, dtype=np.int32),
+            file_types=list(type_ids),
+            type_codes=np.array(type_codes, dtype=np.int32),
+            ingested_at=np.array(ingested_at, dtype=np.float64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.source_codes)
+
+    def _codes(self, names: List[str], values) -> np.ndarray:
+        lookup = {name: code for code, name in enumerate(names)}
+        return np.array([lookup[v] for v in _as_list(values) if v in lookup], dtype=np.int32)
+
+    def _source_codes(self, values) -> np.ndarray:
+        """
+        Codes of the sources named by `values`. A value matches a source
+        spelled the same way, or whose key is the longest trailing part of
+        the value's normalized path (so `./data/a.pdf` and `/abs/data/a.pdf`
+        both find the key `a.pdf`).
+        """
+        by_source = {name: code for code, name in enumerate(self.sources)}
+        by_key = {key: code for code, key in enumerate(self.source_keys)}
+
+        codes = []
+        for value in _as_list(values):
+            if value in by_source:
+                codes.append(by_source[value])
+                continue
+            parts = normalize_source(value).split("/")
+            for start in range(len(parts)):
+                code = by_key.get("/".join(parts[start:]))
+                if code is not None:
+                    codes.append(code)
+                    break
+        return np.array(codes, dtype=np.int32)
+
+    def select(self, filters: dict) -> np.ndarray:
+        """
+        Rows (int64, ascending) whose metadata matches every filter.
+        """
+        validate_filters(filters)
+
+        mask = np.ones(len(self), dtype=bool)
+
+        if filters.get("source") is not None:
+            mask &= np.isin(self.source_codes, self._source_codes(filters["source"]))
+
+        if filters.get("file_type") is not None:
+            wanted = [t.lower().lstrip(".") for t in _as_list(filters["file_type"])]
+            mask &= np.isin(self.type_codes, self._codes(self.file_types, wanted))
+
+        if filters.get("page") is not None:
+            page = filters["page"]
+            first, last = (page, page) if _is_int(page) else page
+            mask &= (self.pages >= first) & (self.pages <= last)
+
+        if filters.get("ingested_after") is not None:
+            mask &= self.ingested_at >= float(filters["ingested_after"])
+        if filters.get("ingested_before") is not None:
+            mask &= self.ingested_at < float(filters["ingested_before"])
+
+        return np.flatnonzero(mask).astype(np.int64)
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, cls.FILENAME))
+
+    def save(self, directory: str):
+        path = os.path.join(directory, self.FILENAME)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(
+                f,
+                sources=np.array(json.dumps(self.sources)),
+                source_keys=np.array(json.dumps(self.source_keys)),
+                file_types=np.array(json.dumps(self.file_types)),
+                source_codes=self.source_codes,
+                pages=self.pages,
+                type_codes=self.type_codes,
+                ingested_at=self.ingested_at
+            )
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> "MetadataIndex":
+        with np.load(os.path.join(directory, cls.FILENAME)) as data:
+            return cls(
+                sources=json.loads(str(data["sources"])),
+                source_keys=json.loads(str(data["source_keys"])) if "source_keys" in data else None,
+                source_codes=data["source_codes"],
+                pages=data["pages"],
+                file_types=json.loads(str(data["file_types"])),
+                type_codes=data["type_codes"],
+                ingested_at=data["ingested_at"]
+            )
@@ -0,0 +1,345 @@
+import cProfile
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    """
+    Monotonic counter, optionally split by labels.
+    """
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, optionally split by labels.
+    """
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (bucket counts, sum, count)
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', f'{bound:g}'),))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    Point-in-time value read from a callback at scrape time.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", f"{self.name} {self.callback():g}"]
+
+
+class CallbackCounter(Gauge):
+    """
+    Monotonic total kept elsewhere (e.g. by the worker pool) and read from
+    a callback at scrape time.
+    """
+
+    type = "counter"
+
+
+class MetricsRegistry:
+    """
+    Named metrics rendered together in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, callback: Callable[[], float]) -> Gauge:
+        """
+        Registers (or replaces) a callback gauge.
+        """
+        with self._lock:
+            self._metrics[name] = Gauge(name, help, callback)
+            return self._metrics[name]
+
+    def callback_counter(self, name: str, help: str, callback: Callable[[], float]) -> CallbackCounter:
+        """
+        Registers (or replaces) a counter read from a callback.
+        """
+        with self._lock:
+            self._metrics[name] = CallbackCounter(name, help, callback)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram("rag_stage_seconds", "Duration of RAG pipeline stages in seconds")
+
+
+class Trace:
+    """
+    Per-request record of stage durations (nested in call order) and counts
+    such as chunks retrieved and prompt tokens.
+    """
+
+    def __init__(self, name: str = "request"):
+        self.name = name
+        self.started_at = time.time()
+        self.stages: List[list] = []
+        self.counts: Dict[str, float] = {}
+
+    def begin(self, stage: str, depth: int) -> int:
+        self.stages.append([stage, depth, None])
+        return len(self.stages) - 1
+
+    def end(self, index: int, seconds: float):
+        self.stages[index][2] = seconds
+
+    def add_count(self, name: str, amount: float):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "stages": [{"stage": stage, "depth": depth, "seconds": seconds} for stage, depth, seconds in self.stages],
+            "counts": dict(self.counts),
+        }
+
+    def report(self) -> str:
+        width = max((len(stage) + 2 * depth for stage, depth, _ in self.stages), default=0)
+        lines = [
+            f"{'  ' * depth + stage:<{width}}  {seconds * 1000 if seconds is not None else 0:>9.1f} ms"
+            for stage, depth, seconds in self.stages
+        ]
+        lines.extend(f"{name}: {value:g}" for name, value in sorted(self.counts.items()))
+        return "\n".join(lines)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("rag_trace", default=None)
+_stage_depth: ContextVar[int] = ContextVar("rag_stage_depth", default=0)
+
+
+@contextmanager
+def tracing(trace: Trace):
+    """
+    Makes `trace` collect the stages and counts recorded inside the block.
+    """
+    trace_token = _current_trace.set(trace)
+    depth_token = _stage_depth.set(0)
+    try:
+        yield trace
+    finally:
+        _stage_depth.reset(depth_token)
+        _current_trace.reset(trace_token)
+
+
+def isolated(generator: Iterator) -> Iterator:
+    """
+    Runs every step of `generator` in a private copy of the current context.
+    A tracing()/stage() block held open across its yields then never leaks
+    into the consumer's context, and still resets cleanly when the consumer
+    stops early or the generator is closed from elsewhere.
+    """
+    context = copy_context()
+    try:
+        while True:
+            try:
+                item = context.run(next, generator)
+            except StopIteration:
+                return
+            yield item
+    finally:
+        context.run(generator.close)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times the enclosed block into the rag_stage_seconds histogram and, when
+    tracing, into the current request's trace.
+    """
+    trace = _current_trace.get()
+    depth = _stage_depth.get()
+    index = trace.begin(name, depth) if trace is not None else None
+    depth_token = _stage_depth.set(depth + 1)
+    start = perf_counter()
+
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start
+        _stage_depth.reset(depth_token)
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if index is not None:
+            trace.end(index, seconds)
+
+
+def count(name: str, amount: float = 1):
+    """
+    Adds to the rag_<name>_total counter and the current trace, if any.
+    """
+    REGISTRY.counter(f"rag_{name}_total", f"Total {name.replace('_', ' ')}").inc(amount)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(name, amount)
+
+
+def recorded(fn: Callable, *args):
+    """
+    Runs fn(*args) under a fresh Trace and returns (result, trace). Used in
+    worker processes, whose own REGISTRY is never scraped, to send their
+    stages and counts back to the parent for `replay`.
+    """
+    trace = Trace(getattr(fn, "__name__", "task"))
+    with tracing(trace):
+        return fn(*args), trace
+
+
+def replay(trace: Trace):
+    """
+    Records the stages and counts of a trace collected in another process
+    as if they had run here: into rag_stage_seconds, the counters and,
+    nested under the open stage, the current trace.
+    """
+    current = _current_trace.get()
+    depth = _stage_depth.get()
+
+    for name, stage_depth, seconds in trace.stages:
+        if seconds is None:
+            continue
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if current is not None:
+            current.end(current.begin(name, depth + stage_depth), seconds)
+
+    for name, amount in trace.counts.items():
+        count(name, amount)
+
+
+@contextmanager
+def profiled(name: str):
+    """
+    Opt-in profiling of the enclosed block, selected by RAG_PROFILE:
+
+    - cprofile: writes <RAG_PROFILE_DIR>/<name>-<time>.prof (open with
+      snakeviz or pstats)
+    - py-spy:   attaches `py-spy record` to this process for the duration
+      of the block and writes a flame graph <name>-<time>.svg (py-spy must
+      be installed and allowed to ptrace)
+
+    Unset (the default), the block runs unprofiled at no cost.
+    """
+    profiler = os.getenv("RAG_PROFILE", "").strip().lower()
+    if not profiler:
+        yield
+        return
+
+    out_dir = os.getenv("RAG_PROFILE_DIR", "profiles")
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(f"{base}.prof")
+        return
+
+    if profiler == "py-spy" and shutil.which("py-spy"):
+        recorder = subprocess.Popen(
+            ["py-spy", "record", "--pid", str(os.getpid()), "--output", f"{base}.svg", "--nonblocking"]
+        )
+        try:
+            yield
+        finally:
+            # py-spy writes its output when interrupted
+            recorder.send_signal(signal.SIGINT)
+            recorder.wait()
+        return
+
+    raise ValueError(f"Unknown or unavailable profiler '{profiler}'. Use cprofile or py-spy.")
@@ -0,0 +1,208 @@
+import json
+import math
+import os
+import re
+import sqlite3
+from collections import Counter
+from contextlib import closing
+from pathlib import Path
+from typing import AbstractSet, Dict, FrozenSet, List, Optional, Tuple
+
+
+# Blocks starting in the top or ending in the bottom 8% of a page are
+# header/footer candidates
+MARGIN_FRACTION = 0.08
+# ...and are dropped when the same text is in the margin of at least half the
+# pages of the document (and at least 3 pages)
+REPEAT_FRACTION = 0.5
+MIN_REPEAT_PAGES = 3
+
+# (top, bottom, text) of each text block on a page
+PageBlocks = Tuple[float, List[Tuple[float, float, str]]]
+
+
+def _margin_key(text: str) -> str:
+    # "Page 3 of 12" and "Page 4 of 12" are the same footer
+    return re.sub(r"\d+", "#", " ".join(text.split()).lower())
+
+
+def _page_blocks(page, flags: int) -> PageBlocks:
+    blocks = [
+        (y0, y1, text.strip())
+        for _, y0, _, y1, text, _, block_type in page.get_text("blocks", flags=flags, sort=True)
+        if block_type == 0 and text.strip()
+    ]
+    return page.rect.height, blocks
+
+
+def _margin_blocks(page, flags: int) -> PageBlocks:
+    """
+    Text blocks of just the top and bottom margin bands of a page. Clipped
+    extraction skips the body text, so this is much cheaper than
+    _page_blocks.
+    """
+    import fitz
+
+    width, height = page.rect.width, page.rect.height
+    blocks = []
+    for band in (
+        fitz.Rect(0, 0, width, height * MARGIN_FRACTION),
+        fitz.Rect(0, height * (1 - MARGIN_FRACTION), width, height),
+    ):
+        blocks.extend(
+            (y0, y1, text.strip())
+            for _, y0, _, y1, text, _, block_type in page.get_text("blocks", flags=flags, clip=band, sort=True)
+            if block_type == 0 and text.strip()
+        )
+    return height, blocks
+
+
+def _repeated_margins(pages: Dict[int, PageBlocks]) -> set:
+    """
+    Margin texts that recur across pages: running headers, footers and
+    page numbers. `pages` should cover the whole document.
+    """
+    if len(pages) < MIN_REPEAT_PAGES:
+        return set()
+
+    counts = Counter()
+    for height, blocks in pages.values():
+        counts.update({
+            _margin_key(text) for y0, y1, text in blocks
+            if y0 < height * MARGIN_FRACTION or y1 > height * (1 - MARGIN_FRACTION)
+        })
+
+    threshold = max(MIN_REPEAT_PAGES, math.ceil(REPEAT_FRACTION * len(pages)))
+    return {key for key, n in counts.items() if n >= threshold}
+
+
+def _text_flags() -> int:
+    import fitz
+
+    # Image blocks are neither needed nor decoded
+    return fitz.TEXTFLAGS_BLOCKS & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+def _document_margins(pdf, flags: int) -> FrozenSet[str]:
+    return frozenset(_repeated_margins({number: _margin_blocks(pdf[number], flags) for number in range(len(pdf))}))
+
+
+def repeated_margins(file_path: Path) -> FrozenSet[str]:
+    """
+    Margin keys of the running headers and footers of a whole PDF, to pass
+    to every extract_pdf_pages call when the file is split into ranges.
+    """
+    import fitz
+
+    with fitz.open(str(file_path)) as pdf:
+        return _document_margins(pdf, _text_flags())
+
+
+def extract_pdf_pages(file_path: Path, start: int = 0, stop: Optional[int] = None,
+                      repeated: Optional[AbstractSet[str]] = None) -> Tuple[int, Dict[int, str]]:
+    """
+    Extracts the text of pages [start, stop) from PyMuPDF's text blocks in
+    reading order, one paragraph per block, without running headers and
+    footers. Image-only and empty pages map to "".
+
+    Headers and footers are detected from the margins of every page, not
+    just the range, so any split of a file into ranges gives the same text.
+    That pass reads the whole file, so callers extracting several ranges
+    pass its `repeated_margins` (computed once) as `repeated`.
+
+    Returns (total pages in the file, {page number: text}).
+    """
+    import fitz
+
+    flags = _text_flags()
+
+    with fitz.open(str(file_path)) as pdf:
+        total_pages = len(pdf)
+        stop = total_pages if stop is None else min(stop, total_pages)
+        if repeated is None:
+            repeated = _document_margins(pdf, flags)
+        pages = {number: _page_blocks(pdf[number], flags) for number in range(start, stop)}
+
+    texts = {}
+    for number, (height, blocks) in pages.items():
+        kept = [
+            text for y0, y1, text in blocks
+            if not (
+                (y0 < height * MARGIN_FRACTION or y1 > height * (1 - MARGIN_FRACTION))
+                and _margin_key(text) in repeated
+            )
+        ]
+        texts[number] = "\n\n".join(kept)
+
+    return total_pages, texts
+
+
+class PageCache:
+    """
+    On-disk cache of extracted page text keyed by (file SHA-256, page), so
+    re-chunking an unchanged PDF never reopens it. SQLite in WAL mode, so
+    parallel ingestion workers can read and write it concurrently.
+    """
+
+    # Versioned with the extraction output, so stale page text is never served
+    FILENAME = "pages-v2.sqlite"
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, self.FILENAME)
+
+        # Connections are opened per call, so the cache pickles into workers
+        with closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (file_hash TEXT PRIMARY KEY, total_pages INTEGER NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "file_hash TEXT NOT NULL, page INTEGER NOT NULL, text TEXT NOT NULL, "
+                "PRIMARY KEY (file_hash, page))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS margins (file_hash TEXT PRIMARY KEY, repeated TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def page_count(self, file_hash: str) -> Optional[int]:
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT total_pages FROM files WHERE file_hash = ?", (file_hash,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, file_hash: str, start: int, stop: int) -> Optional[Dict[int, str]]:
+        """
+        Texts of pages [start, stop), or None unless every one is cached.
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT page, text FROM pages WHERE file_hash = ? AND page >= ? AND page < ?",
+                (file_hash, start, stop)
+            ).fetchall()
+        return dict(rows) if len(rows) == stop - start else None
+
+    def get_margins(self, file_hash: str) -> Optional[FrozenSet[str]]:
+        """
+        The file's repeated header/footer keys (see repeated_margins), if cached.
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT repeated FROM margins WHERE file_hash = ?", (file_hash,)).fetchone()
+        return frozenset(json.loads(row[0])) if row else None
+
+    def put_margins(self, file_hash: str, repeated: AbstractSet[str]):
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO margins VALUES (?, ?)", (file_hash, json.dumps(sorted(repeated)))
+            )
+
+    def put(self, file_hash: str, total_pages: int, texts: Dict[int, str]):
+        with closing(self._connect()) as connection, connection:
+            connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?)", (file_hash, total_pages))
+            connection.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+                [(file_hash, page, text) for page, text in texts.items()]
+            )
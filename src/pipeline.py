@@ -0,0 +1,83 @@
+import os
+from contextlib import nullcontext
+from typing import Callable, Dict, NamedTuple, Optional
+
+from data_loader import DataLoader
+from embedding import EmbeddingPipeline
+from vector_store import VectorStore, refresh_requested
+from sharded_store import create_vector_store, shards_from_env
+from search import SearchEngine, retrieval_mode_from_env
+from reranker import reranker_from_env
+from context_builder import ContextBuilder
+from answer_cache import SemanticAnswerCache
+from index_factory import search_params_from_env
+from timing import StartupTimer
+
+
+class Pipeline(NamedTuple):
+    loader: DataLoader
+    vector_store: VectorStore
+    search_engine: SearchEngine
+    # Creates another store with the same settings (the server ingests into one)
+    new_vector_store: Callable[[], VectorStore]
+    # Sync stats if documents were ingested at startup, None if the index was loaded as is
+    stats: Optional[Dict[str, int]]
+
+
+def build_pipeline(data_dir: str = "data", index_path: str = "faiss_index",
+                   retrieval_mode: Optional[str] = None, timer: Optional[StartupTimer] = None,
+                   watch: bool = False) -> Pipeline:
+    """
+    Builds the loader, vector store and search engine shared by the CLI,
+    the Streamlit UI, the batch job and the HTTP server, configured from
+    the RAG_* environment variables. The persisted index is opened (and
+    documents only parsed when it is missing, stale or RAG_REFRESH_INDEX
+    is set); with `watch`, newly published versions are hot-swapped in
+    every RAG_INDEX_WATCH_SECONDS. `timer` records the "model load" and
+    "index load" phases.
+    """
+    def phase(name: str):
+        return timer.phase(name) if timer is not None else nullcontext()
+
+    retrieval_mode = retrieval_mode or retrieval_mode_from_env()
+    loader = DataLoader(data_dir, workers=int(os.getenv("RAG_INGEST_WORKERS", "1")))
+
+    with phase("model load"):
+        embedder = EmbeddingPipeline()
+        reranker = reranker_from_env()
+
+    # Hybrid retrieval also keeps a BM25 index
+    def new_vector_store() -> VectorStore:
+        return create_vector_store(
+            embedder.embedding_model,
+            index_path=index_path,
+            num_shards=shards_from_env(),
+            index_type=os.getenv("RAG_INDEX_TYPE", "flat"),
+            storage=os.getenv("RAG_INDEX_STORAGE", "pickle"),
+            lexical=retrieval_mode == "hybrid",
+            **search_params_from_env()
+        )
+
+    vector_store = new_vector_store()
+    with phase("index load"):
+        stats = vector_store.open_index(loader, refresh=refresh_requested())
+
+    watch_seconds = float(os.getenv("RAG_INDEX_WATCH_SECONDS", "0") or 0)
+    if watch and watch_seconds > 0:
+        vector_store.start_watching(interval=watch_seconds)
+
+    # Answers to near-duplicate questions are reused
+    context_tokens = os.getenv("RAG_CONTEXT_TOKENS", "1500")
+    search_engine = SearchEngine(
+        vector_store,
+        answer_cache=SemanticAnswerCache(
+            path=os.path.join(index_path, "answer_cache.json"),
+            threshold=float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+        ),
+        retrieval_mode=retrieval_mode,
+        reranker=reranker,
+        rerank_candidates=int(os.getenv("RAG_RERANK_CANDIDATES", "20")),
+        context_builder=ContextBuilder(max_tokens=int(context_tokens)) if context_tokens else None
+    )
+
+    return Pipeline(loader, vector_store, search_engine, new_vector_store, stats)
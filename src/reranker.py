@@ -0,0 +1,115 @@
+import os
+import threading
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores retrieved chunks with a small local cross-encoder (CPU).
+
+    Candidates are scored in batches against a latency budget: if the
+    remaining batches would not fit in it, the candidates are returned in
+    their original retrieval order instead, so reranking never makes a
+    query slower than `budget_ms` plus one batch.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANK_MODEL_NAME,
+        batch_size: int = 16,
+        budget_ms: Optional[float] = 300.0,
+        num_threads: Optional[int] = None,
+        device: str = "cpu",
+        model=None
+    ):
+        # `model` is anything with CrossEncoder's predict(); loaded from `model_name` if not given
+        if model is None:
+            import torch
+            from sentence_transformers import CrossEncoder
+
+            if num_threads:
+                torch.set_num_threads(num_threads)
+            model = CrossEncoder(model_name, device=device)
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.model = model
+
+        self._lock = threading.Lock()
+        self._reranked = 0
+        self._fallbacks = 0
+        self._total_ms = 0.0
+
+    def rerank(self, query: str, documents: List[Document], k: int) -> List[Document]:
+        """
+        Returns the k best documents by cross-encoder score, or the first k
+        in retrieval order when the remaining batches would not fit in the
+        latency budget.
+        """
+        if len(documents) <= 1:
+            return documents[:k]
+
+        start = perf_counter()
+        pairs = [(query, doc.page_content) for doc in documents]
+        scores: List[float] = []
+
+        for offset in range(0, len(pairs), self.batch_size):
+            elapsed_ms = (perf_counter() - start) * 1000
+            if scores and self.budget_ms is not None:
+                per_batch_ms = elapsed_ms / (offset // self.batch_size)
+                if elapsed_ms + per_batch_ms > self.budget_ms:
+                    self._record(fallback=True, elapsed_ms=elapsed_ms)
+                    return documents[:k]
+
+            batch_scores = self.model.predict(
+                pairs[offset:offset + self.batch_size],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            scores.extend(float(score) for score in batch_scores)
+
+        # Once every score is computed they are used, even if the last batch ran over
+        elapsed_ms = (perf_counter() - start) * 1000
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])
+        self._record(fallback=False, elapsed_ms=elapsed_ms)
+        return [documents[i] for i in order[:k]]
+
+    def _record(self, fallback: bool, elapsed_ms: float):
+        with self._lock:
+            if fallback:
+                self._fallbacks += 1
+            else:
+                self._reranked += 1
+            self._total_ms += elapsed_ms
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            calls = self._reranked + self._fallbacks
+            return {
+                "reranked": self._reranked,
+                "fallbacks": self._fallbacks,
+                "avg_ms": self._total_ms / calls if calls else 0.0,
+            }
+
+
+def reranker_from_env() -> Optional[CrossEncoderReranker]:
+    """
+    Cross-encoder from RAG_RERANK_MODEL (empty or unset disables reranking),
+    with its latency budget from RAG_RERANK_BUDGET_MS (empty for no budget).
+    """
+    model_name = os.getenv("RAG_RERANK_MODEL", "").strip()
+    if not model_name:
+        return None
+
+    budget_ms = os.getenv("RAG_RERANK_BUDGET_MS", "300")
+    return CrossEncoderReranker(
+        model_name=model_name,
+        budget_ms=float(budget_ms) if budget_ms else None
+    )
@@ -1,10 +1,33 @@
+import asyncio
+import contextvars
 import os
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 
+from answer_cache import SemanticAnswerCache, chunk_key
+from batcher import QueryBatcher
+from context_builder import ContextBuilder
+from metrics import Trace, count, isolated, stage, tracing
+from reranker import CrossEncoderReranker
+
+
+RETRIEVAL_MODES = ("dense", "hybrid")
+
+
+def retrieval_mode_from_env() -> str:
+    """
+    Default retrieval mode from RAG_RETRIEVAL_MODE (dense or hybrid).
+    """
+    mode = os.getenv("RAG_RETRIEVAL_MODE", "dense").strip().lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}'. Choose from {', '.join(RETRIEVAL_MODES)}.")
+    return mode
+
 
 class SearchEngine:
     """
@@ -12,15 +35,36 @@ class SearchEngine:
     FAISS retrieval + Azure OpenAI GPT-4.
     """
 
-    def __init__(self, vector_store):
+    def __init__(self, vector_store, llm=None, answer_cache: Optional[SemanticAnswerCache] = None,
+                 retrieval_mode: str = "dense", reranker: Optional[CrossEncoderReranker] = None,
+                 rerank_candidates: int = 20, context_builder: Optional[ContextBuilder] = None,
+                 batcher: Optional[QueryBatcher] = None):
         self.vector_store = vector_store
+        self.answer_cache = answer_cache
+        self.retrieval_mode = retrieval_mode
+
+        # Optional rerank stage: over-fetch candidates, keep the best k
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+
+        # Token-budgeted context packing (None joins every chunk in full)
+        self.context_builder = context_builder
+
+        # Async path: concurrent dense retrievals are batched (see aask)
+        self.batcher = batcher
+
+        # Stage breakdown of the most recent ask/ask_stream call
+        self.last_trace: Optional[Trace] = None
 
-        self.llm = AzureChatOpenAI(
+        # Any LangChain chat model can be injected (e.g. a fake LLM in tests)
+        self.llm = llm if llm is not None else AzureChatOpenAI(
             azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
             api_key=os.getenv("AZURE_OPENAI_API_KEY"),
             deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
             api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-            temperature=0.2
+            temperature=0.2,
+            # Otherwise streamed responses carry no token usage
+            stream_usage=True
         )
 
         self.prompt = ChatPromptTemplate.from_template(
@@ -38,28 +82,351 @@ Answer concisely and clearly.
 """
         )
 
+    def cache_stats(self) -> dict:
+        """
+        Hit-rate statistics of the query-embedding and retrieval caches.
+        """
+        stats = self.vector_store.cache_stats()
+        if self.answer_cache is not None:
+            stats["answers"] = self.answer_cache.stats()
+        if self.reranker is not None:
+            stats["rerank"] = self.reranker.stats()
+        if self.batcher is not None:
+            stats["batching"] = self.batcher.stats()
+        return stats
+
     def _build_context(self, documents: List[Document]) -> str:
         """
         Combines retrieved document chunks into a single context string.
         """
+        if self.context_builder is not None:
+            return self.context_builder.build(documents)
+
         return "\n\n".join(
             f"(Page {doc.metadata.get('page', 'N/A')}): {doc.page_content}"
             for doc in documents
         )
 
-    def ask(self, question: str, k: int = 3) -> str:
+    def _search(self, question: str, k: int, mode: str, filters: Optional[dict] = None) -> List[Document]:
+        # Stores that predate filtering need not accept the keyword
+        kwargs = {"filters": filters} if filters else {}
+        if mode == "hybrid":
+            return self.vector_store.hybrid_search(question, k=k, **kwargs)
+        if mode == "dense":
+            return self.vector_store.similarity_search(question, k=k, **kwargs)
+        raise ValueError(f"Unknown retrieval mode '{mode}'. Choose from {', '.join(RETRIEVAL_MODES)}.")
+
+    def retrieve(self, question: str, k: int = 3, mode: Optional[str] = None,
+                 filters: Optional[dict] = None) -> List[Document]:
+        """
+        Top-k chunks by dense similarity, or dense + BM25 fused with RRF,
+        optionally reranked by a cross-encoder from a larger candidate set.
+        `filters` limits the search to matching chunks, e.g.
+        {"source": [...], "page": [1, 10], "file_type": "pdf"}.
+        """
+        mode = mode or self.retrieval_mode
+        if self.reranker is None:
+            return self._search(question, k, mode, filters)
+
+        candidates = self._search(question, max(k, self.rerank_candidates), mode, filters)
+        with stage("rerank"):
+            return self.reranker.rerank(question, candidates, k)
+
+    def _lookup_answer(self, question: str, documents: List[Document]):
+        """
+        Returns (cached answer or None, key to store a new answer under).
+        """
+        if self.answer_cache is None:
+            return None, None
+
+        with stage("answer_cache_lookup"):
+            # Served from the query-embedding cache, so this is not a second encode
+            question_embedding = self.vector_store.embed_query(question)
+            chunk_ids = [chunk_key(doc) for doc in documents]
+            return self.answer_cache.lookup(question_embedding, chunk_ids), (question_embedding, chunk_ids)
+
+    def _store_answer(self, question: str, cache_key, answer: str, persist: bool = True):
+        if cache_key is not None:
+            question_embedding, chunk_ids = cache_key
+            self.answer_cache.add(question, question_embedding, chunk_ids, answer, persist=persist)
+
+    def _record_usage(self, message) -> bool:
+        """
+        Counts prompt/completion tokens reported by the LLM, if it reports
+        them. Returns whether it did.
+        """
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            count("prompt_tokens", usage.get("input_tokens", 0))
+            count("completion_tokens", usage.get("output_tokens", 0))
+        return bool(usage)
+
+    def _estimate_usage(self, messages, answer: str):
+        """
+        Counts prompt/completion tokens with the context builder's tokenizer,
+        for LLMs that report no usage on streamed chunks.
+        """
+        if self.context_builder is None:
+            return
+        count("prompt_tokens", sum(self.context_builder.count_tokens(message.content) for message in messages))
+        count("completion_tokens", self.context_builder.count_tokens(answer))
+
+    def _prepare_messages(self, question: str, documents: List[Document]):
+        with stage("context_build"):
+            context = self._build_context(documents)
+
+        with stage("prompt_format"):
+            return self.prompt.format_messages(
+                context=context,
+                question=question
+            )
+
+    def ask(self, question: str, k: int = 3, mode: Optional[str] = None,
+            trace: Optional[Trace] = None, filters: Optional[dict] = None) -> str:
         """
         Executes full RAG pipeline:
         retrieval → augmentation → generation
+
+        Stage timings and counts are recorded in `trace` (also kept as
+        `last_trace`).
         """
-        retrieved_docs = self.vector_store.similarity_search(question, k=k)
+        self.last_trace = trace = trace if trace is not None else Trace("ask")
 
-        context = self._build_context(retrieved_docs)
+        with tracing(trace), stage("ask"):
+            with stage("retrieval"):
+                retrieved_docs = self.retrieve(question, k=k, mode=mode, filters=filters)
+            count("chunks_retrieved", len(retrieved_docs))
 
-        messages = self.prompt.format_messages(
-            context=context,
-            question=question
-        )
+            cached_answer, cache_key = self._lookup_answer(question, retrieved_docs)
+            if cached_answer is not None:
+                count("answer_cache_hits")
+                return cached_answer
+
+            messages = self._prepare_messages(question, retrieved_docs)
+
+            with stage("llm"):
+                response = self.llm.invoke(messages)
+            self._record_usage(response)
+
+            self._store_answer(question, cache_key, response.content)
+
+        return response.content
+
+    def retrieve_many(self, questions: Sequence[str], k: int = 3, mode: Optional[str] = None,
+                      filters: Optional[dict] = None) -> List[List[Document]]:
+        """
+        `retrieve` for many questions. Unfiltered dense retrieval embeds them
+        in one batch and runs one FAISS search over the whole query matrix.
+        """
+        mode = mode or self.retrieval_mode
+        if mode != "dense" or filters:
+            return [self.retrieve(question, k=k, mode=mode, filters=filters) for question in questions]
+
+        fetch_k = k if self.reranker is None else max(k, self.rerank_candidates)
+        results = self.vector_store.similarity_search_batch(list(questions), k=fetch_k)
+
+        if self.reranker is not None:
+            results = [self.reranker.rerank(q, docs, k) for q, docs in zip(questions, results)]
+        return results
+
+    def iter_answers(self, questions: Sequence[str], k: int = 3, mode: Optional[str] = None,
+                     max_concurrency: int = 8, max_retries: int = 3, filters: Optional[dict] = None,
+                     trace: Optional[Trace] = None) -> Iterator[Tuple[int, Union[str, Exception]]]:
+        """
+        Answers many questions, yielding (position, answer) as each completes.
+
+        Retrieval is batched, repeated questions with the same chunks share
+        one LLM call, and LLM calls run `max_concurrency` at a time with up
+        to `max_retries` attempts (exponential backoff with jitter). A
+        question whose calls all fail yields its exception instead.
+
+        Stages and token counts go to `trace` (also kept as `last_trace`).
+        """
+        self.last_trace = trace = trace if trace is not None else Trace("iter_answers")
+        return isolated(self._iter_answers(list(questions), k, mode, max_concurrency, max_retries, filters, trace))
+
+    def _iter_answers(self, questions: List[str], k: int, mode: Optional[str], max_concurrency: int,
+                      max_retries: int, filters: Optional[dict], trace: Trace):
+        with tracing(trace), stage("iter_answers"):
+            with stage("retrieval"):
+                documents = self.retrieve_many(questions, k=k, mode=mode, filters=filters)
+            count("chunks_retrieved", sum(len(docs) for docs in documents))
+
+            # (question, chunk IDs) -> positions waiting on that answer
+            waiting: Dict[tuple, List[int]] = {}
+            prompts: Dict[tuple, tuple] = {}
+
+            for i, (question, docs) in enumerate(zip(questions, documents)):
+                cached_answer, cache_key = self._lookup_answer(question, docs)
+                if cached_answer is not None:
+                    count("answer_cache_hits")
+                    yield i, cached_answer
+                    continue
+
+                key = (question, tuple(chunk_key(doc) for doc in docs))
+                if key not in waiting:
+                    waiting[key] = []
+                    prompts[key] = (docs, cache_key)
+                waiting[key].append(i)
+
+            if not waiting:
+                return
+
+            keys = list(waiting)
+            inputs = [self._prepare_messages(key[0], prompts[key][0]) for key in keys]
+            llm = self.llm.with_retry(stop_after_attempt=max_retries, wait_exponential_jitter=True)
+
+            # RunnableRetry does not wrap batch_as_completed, so each call
+            # goes through its invoke, max_concurrency at a time
+            executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="rag-llm")
+            try:
+                with stage("llm"):
+                    futures = {
+                        executor.submit(contextvars.copy_context().run, llm.invoke, messages): j
+                        for j, messages in enumerate(inputs)
+                    }
+                    for future in as_completed(futures):
+                        key = keys[futures[future]]
+                        try:
+                            response = future.result()
+                        except Exception as e:
+                            result = e
+                        else:
+                            result = response.content
+                            self._record_usage(response)
+                            self._store_answer(key[0], prompts[key][1], result, persist=False)
+
+                        for i in waiting[key]:
+                            yield i, result
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+                if self.answer_cache is not None and self.answer_cache.path:
+                    self.answer_cache.save()
+
+    def ask_many(self, questions: Sequence[str], k: int = 3, mode: Optional[str] = None,
+                 max_concurrency: int = 8, max_retries: int = 3, filters: Optional[dict] = None,
+                 trace: Optional[Trace] = None) -> List[str]:
+        """
+        Answers for `questions`, in order. Raises the first failure once
+        every question has been attempted.
+        """
+        answers: List[Union[str, Exception, None]] = [None] * len(questions)
+        for i, answer in self.iter_answers(questions, k, mode, max_concurrency, max_retries, filters, trace):
+            answers[i] = answer
+
+        for answer in answers:
+            if isinstance(answer, Exception):
+                raise answer
+        return answers
+
+    async def aretrieve(self, question: str, k: int = 3, mode: Optional[str] = None,
+                        filters: Optional[dict] = None) -> List[Document]:
+        """
+        Async `retrieve`: unfiltered dense queries go through the micro-batcher
+        when one is configured, everything else runs in the default executor.
+        """
+        loop = asyncio.get_running_loop()
+        mode = mode or self.retrieval_mode
+
+        # Executor threads don't inherit the context; run in a copy of it so
+        # their stages reach the caller's trace
+        context = contextvars.copy_context()
+
+        if self.batcher is None or mode != "dense" or filters:
+            return await loop.run_in_executor(None, context.run, self.retrieve, question, k, mode, filters)
+
+        if self.reranker is None:
+            return await self.batcher.search(question, k)
+
+        candidates = await self.batcher.search(question, max(k, self.rerank_candidates))
+        with stage("rerank"):
+            return await loop.run_in_executor(None, self.reranker.rerank, question, candidates, k)
+
+    async def aask(self, question: str, k: int = 3, mode: Optional[str] = None,
+                   filters: Optional[dict] = None, trace: Optional[Trace] = None) -> str:
+        """
+        Async `ask`: retrieval off the event loop, then the LLM's async client,
+        so one event loop can serve many questions concurrently. Each call
+        runs in its task's own context, so concurrent calls keep separate
+        traces.
+        """
+        self.last_trace = trace = trace if trace is not None else Trace("aask")
+
+        with tracing(trace), stage("aask"):
+            with stage("retrieval"):
+                retrieved_docs = await self.aretrieve(question, k=k, mode=mode, filters=filters)
+            count("chunks_retrieved", len(retrieved_docs))
+
+            cached_answer, cache_key = self._lookup_answer(question, retrieved_docs)
+            if cached_answer is not None:
+                count("answer_cache_hits")
+                return cached_answer
+
+            messages = self._prepare_messages(question, retrieved_docs)
+
+            with stage("llm"):
+                response = await self.llm.ainvoke(messages)
+            self._record_usage(response)
+
+            # Saving the answer cache writes to disk
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._store_answer, question, cache_key, response.content
+            )
 
-        response = self.llm.invoke(messages)
         return response.content
+
+    def ask_stream(self, question: str, k: int = 3, mode: Optional[str] = None,
+                   metrics: Optional[Dict[str, float]] = None, trace: Optional[Trace] = None,
+                   filters: Optional[dict] = None) -> Iterator[str]:
+        """
+        Same pipeline as `ask`, but yields the answer token by token as the
+        LLM produces it. Timings (seconds) are written to `metrics`:
+        retrieval, time_to_first_token and total; stages go to `trace`.
+
+        The stream records its stages in a context of its own, so nothing
+        the consumer does between tokens ends up in `trace`.
+        """
+        metrics = metrics if metrics is not None else {}
+        self.last_trace = trace = trace if trace is not None else Trace("ask_stream")
+        return isolated(self._ask_stream(question, k, mode, metrics, trace, filters))
+
+    def _ask_stream(self, question: str, k: int, mode: Optional[str], metrics: Dict[str, float],
+                    trace: Trace, filters: Optional[dict]) -> Iterator[str]:
+        start = perf_counter()
+
+        with tracing(trace), stage("ask_stream"):
+            with stage("retrieval"):
+                retrieved_docs = self.retrieve(question, k=k, mode=mode, filters=filters)
+            count("chunks_retrieved", len(retrieved_docs))
+            metrics["retrieval"] = perf_counter() - start
+
+            cached_answer, cache_key = self._lookup_answer(question, retrieved_docs)
+            if cached_answer is not None:
+                count("answer_cache_hits")
+                metrics["time_to_first_token"] = metrics["total"] = perf_counter() - start
+                metrics["cached"] = True
+                yield cached_answer
+                return
+
+            messages = self._prepare_messages(question, retrieved_docs)
+
+            parts = []
+            usage_reported = False
+            with stage("llm"):
+                for chunk in self.llm.stream(messages):
+                    usage_reported = self._record_usage(chunk) or usage_reported
+                    if not chunk.content:
+                        continue
+                    if not parts:
+                        metrics["time_to_first_token"] = perf_counter() - start
+                    parts.append(chunk.content)
+                    yield chunk.content
+
+            metrics["total"] = perf_counter() - start
+            metrics.setdefault("time_to_first_token", metrics["total"])
+            metrics["cached"] = False
+            if not usage_reported:
+                self._estimate_usage(messages, "".join(parts))
+
+            # Only complete answers are cached (not streams abandoned midway)
+            self._store_answer(question, cache_key, "".join(parts))
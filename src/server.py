@@ -0,0 +1,341 @@
+"""
+HTTP API server: loads the embedding model and index once and serves many
+clients from one warm process.
+
+Endpoints (JSON in, JSON out):
+    POST /ask      {"question": ..., "k": 3, "mode": "dense"}  -> {"answer": ...}
+    POST /search   {"query": ..., "k": 3, "mode": "dense"}     -> {"results": [...]}
+                   both accept "filters", e.g. {"source": [...], "page": [1, 5], "file_type": "pdf"}
+    POST /ingest   sync the index with the data directory, then hot-swap it in
+    POST /reload   reload the published index from disk and hot-swap it in
+    GET  /health   liveness and index state
+    GET  /metrics  Prometheus metrics (stage latency histograms, counters, worker pool stats)
+    GET  /stats    worker pool and cache statistics as JSON
+
+Usage (from the project root):
+    python src/server.py --port 8000 --workers 4
+"""
+import argparse
+import json
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from data_loader import DataLoader
+from vector_store import VectorStore
+from search import RETRIEVAL_MODES, SearchEngine
+from pipeline import build_pipeline
+from metadata_index import validate_filters
+from metrics import REGISTRY
+
+
+class PoolFull(Exception):
+    pass
+
+
+class WorkerPool:
+    """
+    Fixed-size thread pool with a bounded queue: at most `workers` requests
+    run and `queue_size` wait; anything beyond that is rejected immediately
+    instead of piling up.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 64):
+        self.workers = workers
+        self.queue_size = queue_size
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-worker")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None):
+        """
+        Runs fn(*args) on the pool and waits for its result.
+
+        Raises PoolFull when the queue is full and TimeoutError when the
+        result takes longer than `timeout` seconds.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolFull()
+
+        with self._lock:
+            self.in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # Drops the job if it has not started; a running one finishes in the background
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class RAGService:
+    """
+    Shared state behind the HTTP handlers: one SearchEngine, a worker pool
+    for queries, and a single background slot for ingest/reload.
+
+    Ingestion runs on a separate VectorStore and publishes a new index
+    version; the serving VectorStore then swaps it in, so requests in
+    flight finish on the index they started with and new requests see the
+    new one.
+    """
+
+    def __init__(self, engine: SearchEngine, new_vector_store: Callable[[], VectorStore],
+                 loader: DataLoader, pool: WorkerPool, timeout: float = 60.0):
+        self.engine = engine
+        self.new_vector_store = new_vector_store
+        self.loader = loader
+        self.pool = pool
+        self.timeout = timeout
+
+        self.update: Dict[str, object] = {"state": "idle"}
+        self._update_lock = threading.Lock()
+
+        REGISTRY.gauge(
+            "rag_server_in_flight", "Worker pool requests in flight", lambda: self.pool.stats()["in_flight"]
+        )
+        # Only ever increase, so exported as counters
+        for name in ("completed", "rejected", "timeouts"):
+            REGISTRY.callback_counter(
+                f"rag_server_{name}_total",
+                f"Worker pool requests {name}",
+                lambda name=name: self.pool.stats()[name]
+            )
+
+    def ask(self, body: dict) -> dict:
+        answer = self.engine.ask(
+            body["question"], k=body["k"], mode=body.get("mode"), filters=body.get("filters")
+        )
+        return {"answer": answer}
+
+    def search(self, body: dict) -> dict:
+        documents = self.engine.retrieve(
+            body["query"], k=body["k"], mode=body.get("mode"), filters=body.get("filters")
+        )
+        return {"results": [{"content": doc.page_content, "metadata": doc.metadata} for doc in documents]}
+
+    def start_update(self, action: str) -> bool:
+        """
+        Starts an ingest or reload in the background; False if one is running.
+        """
+        if not self._update_lock.acquire(blocking=False):
+            return False
+
+        self.update = {"state": "running", "action": action}
+        threading.Thread(target=self._run_update, args=(action,), daemon=True).start()
+        return True
+
+    def _run_update(self, action: str):
+        try:
+            serving = self.engine.vector_store
+            if action == "ingest":
+                builder = self.new_vector_store()
+                try:
+                    stats = builder.sync_index(self.loader)
+                finally:
+                    builder.close()
+                serving.reload_if_changed()
+            else:
+                serving.reload_if_changed(force=True)
+                stats = {}
+
+            self.update = {"state": "done", "action": action, "version": serving.loaded_version, **stats}
+        except Exception as e:
+            self.update = {"state": "failed", "action": action, "error": str(e)}
+        finally:
+            self._update_lock.release()
+
+    def health(self) -> dict:
+        chunks = len(self.engine.vector_store)
+        return {
+            "status": "ok" if chunks else "no index",
+            "chunks": chunks,
+            "index_version": self.engine.vector_store.loaded_version,
+            "update": self.update,
+        }
+
+    def stats(self) -> dict:
+        return {"pool": self.pool.stats(), "caches": self.engine.cache_stats()}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "RAGServer/1.0"
+
+    @property
+    def service(self) -> RAGService:
+        return self.server.service
+
+    def _send(self, status: HTTPStatus, payload: dict):
+        self._send_body(status, json.dumps(payload, ensure_ascii=False, default=str), "application/json")
+
+    def _send_body(self, status: HTTPStatus, text: str, content_type: str):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object.")
+        return body
+
+    def _validated(self, body: dict, required: str) -> dict:
+        """
+        Checks the request fields before anything runs, so only a malformed
+        request is reported as a client error. Returns the body with `k`
+        as an int.
+        """
+        if not isinstance(body.get(required), str) or not body[required].strip():
+            raise ValueError(f"'{required}' must be a non-empty string.")
+        try:
+            k = int(body.get("k", 3))
+        except (TypeError, ValueError):
+            raise ValueError("k must be an integer.") from None
+        if k < 1:
+            raise ValueError("k must be at least 1.")
+        mode = body.get("mode")
+        if mode is not None and mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'.")
+        filters = body.get("filters")
+        if filters is not None:
+            if not isinstance(filters, dict):
+                raise ValueError("filters must be a JSON object.")
+            validate_filters(filters)
+        return {**body, "k": k}
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(HTTPStatus.OK, self.service.health())
+        elif self.path == "/metrics":
+            self._send_body(HTTPStatus.OK, REGISTRY.render(), "text/plain; version=0.0.4")
+        elif self.path == "/stats":
+            self._send(HTTPStatus.OK, self.service.stats())
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        # Path -> (handler, required body field)
+        handlers = {"/ask": (self.service.ask, "question"), "/search": (self.service.search, "query")}
+
+        if self.path in ("/ingest", "/reload"):
+            action = self.path.lstrip("/")
+            if self.service.start_update(action):
+                self._send(HTTPStatus.ACCEPTED, {"status": "started", "action": action})
+            else:
+                self._send(HTTPStatus.CONFLICT, {"error": "An index update is already running."})
+            return
+
+        if self.path not in handlers:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+
+        handler, required = handlers[self.path]
+        try:
+            body = self._validated(self._read_json(), required)
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": f"Bad request: {e}"})
+            return
+
+        # Errors raised by the pipeline itself are server errors
+        try:
+            result = self.service.pool.run(handler, body, timeout=self.service.timeout)
+        except PoolFull:
+            self._send(HTTPStatus.TOO_MANY_REQUESTS, {"error": "Server busy, retry later."})
+        except TimeoutError:
+            self._send(HTTPStatus.GATEWAY_TIMEOUT, {"error": f"Request exceeded {self.service.timeout}s."})
+        except Exception as e:
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+        else:
+            self._send(HTTPStatus.OK, result)
+
+    def log_message(self, format, *args):
+        if os.getenv("RAG_SERVER_ACCESS_LOG", "false").lower() in ("1", "true", "yes"):
+            super().log_message(format, *args)
+
+
+class RAGHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: RAGService):
+        super().__init__(address, RequestHandler)
+        self.service = service
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Serve the RAG pipeline over HTTP.")
+    parser.add_argument("--host", default=os.getenv("RAG_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RAG_SERVER_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("RAG_SERVER_WORKERS", "4")))
+    parser.add_argument("--queue-size", type=int, default=int(os.getenv("RAG_SERVER_QUEUE_SIZE", "64")))
+    parser.add_argument("--timeout", type=float, default=float(os.getenv("RAG_REQUEST_TIMEOUT", "60")))
+    args = parser.parse_args()
+
+    # Also picks up versions published by other processes
+    pipeline = build_pipeline("data", "faiss_index", watch=True)
+    vector_store = pipeline.vector_store
+
+    pool = WorkerPool(workers=args.workers, queue_size=args.queue_size)
+    service = RAGService(
+        pipeline.search_engine, pipeline.new_vector_store, pipeline.loader, pool, timeout=args.timeout
+    )
+    server = RAGHTTPServer((args.host, args.port), service)
+
+    # SIGTERM stops accepting connections; queued requests still complete
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+
+    print(f"Serving on http://{args.host}:{args.port} ({args.workers} workers, queue {args.queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+        vector_store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+import copy
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+import index_versions
+from embedding import (
+    CACHE_DIR_FROM_ENV, EmbeddingPipeline, embedder_kwargs_of, resolve_cache_dir, set_torch_threads
+)
+from lexical_index import reciprocal_rank_fusion
+from lru_cache import LRUCache
+from manifest import saved_chunking
+from metadata_index import freeze_filters
+from metrics import Trace, count, profiled, recorded, replay, stage
+from vector_store import VectorStore
+
+
+SHARDS_FILE = "shards.json"
+
+
+def shards_from_env() -> int:
+    """
+    Number of index shards (RAG_INDEX_SHARDS); 1 keeps a single index.
+    """
+    return max(1, int(os.getenv("RAG_INDEX_SHARDS", "1") or 1))
+
+
+def shard_of(source: str, num_shards: int) -> int:
+    """
+    Stable shard for a source key: every chunk of a file lands in the same
+    shard, in every process and across restarts.
+    """
+    digest = hashlib.sha1(source.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+class ShardLoader:
+    """
+    A DataLoader restricted to the files of one shard.
+    """
+
+    def __init__(self, loader, shard: int, num_shards: int):
+        self.loader = loader
+        self.shard = shard
+        self.num_shards = num_shards
+
+    def list_files(self):
+        return [
+            file_path for file_path in self.loader.list_files()
+            if shard_of(self.loader.source_key(file_path), self.num_shards) == self.shard
+        ]
+
+    def __getattr__(self, name):
+        # Guards against recursion while unpickling, before `loader` is set
+        if name == "loader":
+            raise AttributeError(name)
+        return getattr(self.loader, name)
+
+
+def _sync_shard(task) -> Tuple[Tuple[Dict[str, int], list], Trace]:
+    """
+    Process-pool entry point: loads its own embedding model, syncs one
+    shard and publishes it. Returns ((stats, ingestion errors), trace of
+    the stages and counts recorded in this process, for the parent to
+    replay).
+    """
+    index_path, store_kwargs, loader, embedder_factory, embedder_kwargs, threads = task
+
+    def sync() -> Tuple[Dict[str, int], list]:
+        embedder = embedder_factory(**embedder_kwargs)
+        if "torch" in sys.modules:
+            # The process is ours alone, so the model gets its share of the cores
+            set_torch_threads(threads)
+        shard = VectorStore(embedding_model=embedder.embedding_model, index_path=index_path, **store_kwargs)
+        try:
+            stats = shard._sync_index(loader)
+        finally:
+            # Pool workers exit without running atexit hooks
+            if embedder.cache is not None:
+                embedder.cache.flush()
+        return stats, loader.errors
+
+    return recorded(sync)
+
+
+class ShardedVectorStore:
+    """
+    Partitions chunks across `num_shards` independent VectorStores by a
+    hash of their source file, under <index_path>/shard-NN/ (each with its
+    own versions, manifest and BM25/metadata indexes).
+
+    Ingestion syncs the shards in parallel processes, each with its own
+    embedding model, so ingest throughput scales with cores. A search
+    embeds the query once, fans out to every shard on a thread pool (FAISS
+    releases the GIL while searching) and merges the per-shard top-k lists
+    with a heap.
+
+    Exposes the VectorStore methods SearchEngine, the batcher and the
+    servers use, so it is a drop-in replacement.
+    """
+
+    def __init__(self, embedding_model, index_path: str = "faiss_index", num_shards: int = 4,
+                 ingest_workers: Optional[int] = None, ingest_processes: bool = True,
+                 embedder_kwargs: Optional[dict] = None, embedder_factory=EmbeddingPipeline,
+                 embedding_cache_dir=CACHE_DIR_FROM_ENV,
+                 result_cache_size: int = 256, result_cache_ttl: Optional[float] = 600.0,
+                 **store_kwargs):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1.")
+
+        self.embedding_model = embedding_model
+        self.index_path = index_path
+        self.num_shards = num_shards
+        self.lexical = store_kwargs.get("lexical", False)
+        self.store_kwargs = store_kwargs
+
+        self.shards = [
+            VectorStore(embedding_model=embedding_model, index_path=self.shard_path(i), **store_kwargs)
+            for i in range(num_shards)
+        ]
+
+        # Ingest in worker processes or, with ingest_processes=False, shard by
+        # shard with `embedding_model`. Each worker builds its own model with
+        # embedder_factory(**embedder_kwargs); the kwargs are derived from
+        # `embedding_model` when it is an EmbeddingEngine, so shards are
+        # embedded exactly like the queries
+        self.ingest_workers = max(1, min(ingest_workers or os.cpu_count() or 1, num_shards))
+        self.ingest_processes = ingest_processes
+        derived = embedder_kwargs_of(embedding_model)
+        if ingest_processes and num_shards > 1 and embedder_kwargs is None and derived is None:
+            raise ValueError(
+                "Ingest workers cannot rebuild this embedding model: pass embedder_kwargs "
+                "(and embedder_factory) for it, or ingest_processes=False."
+            )
+        self.embedder_kwargs = {**(derived or {}), **(embedder_kwargs or {})}
+        self.embedder_factory = embedder_factory
+        self.embedding_cache_dir = resolve_cache_dir(embedding_cache_dir)
+
+        self._search_pool = ThreadPoolExecutor(max_workers=num_shards, thread_name_prefix="rag-shard")
+
+        # Keys carry the combined shard version, so a swap in any shard
+        # makes older entries unreachable
+        self.result_cache = LRUCache(maxsize=result_cache_size, ttl=result_cache_ttl)
+
+    def shard_path(self, shard: int) -> str:
+        return os.path.join(self.index_path, f"shard-{shard:02d}")
+
+    def _published(self) -> List[VectorStore]:
+        # Shards that never received a file have nothing on disk
+        return [
+            shard for shard in self.shards
+            if os.path.exists(os.path.join(index_versions.resolve(shard.index_path), "index.faiss"))
+        ]
+
+    @property
+    def version(self) -> int:
+        return sum(shard.version for shard in self.shards)
+
+    @property
+    def loaded_version(self) -> str:
+        return ",".join(shard.loaded_version or "-" for shard in self.shards)
+
+    @property
+    def reload_error(self) -> Optional[str]:
+        return next((shard.reload_error for shard in self.shards if shard.reload_error), None)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def sources(self) -> List[str]:
+        return [source for shard in self.shards for source in shard.sources()]
+
+    def cache_stats(self) -> Dict[str, dict]:
+        return {
+            "query_embeddings": self.shards[0].query_cache.stats(),
+            "results": self.result_cache.stats(),
+        }
+
+    def embed_query(self, query: str):
+        return self.shards[0].embed_query(query)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        return self.shards[0].embed_queries(queries)
+
+    # Persistence and ingestion
+
+    def _read_layout(self) -> Optional[int]:
+        try:
+            with open(os.path.join(self.index_path, SHARDS_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)["num_shards"]
+        except FileNotFoundError:
+            return None
+
+    def _write_layout(self):
+        os.makedirs(self.index_path, exist_ok=True)
+        path = os.path.join(self.index_path, SHARDS_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"num_shards": self.num_shards}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _check_layout(self):
+        saved = self._read_layout()
+        if saved is not None and saved != self.num_shards:
+            raise ValueError(
+                f"Index at {self.index_path} has {saved} shards, not {self.num_shards}. "
+                f"Use RAG_INDEX_SHARDS={saved} or remove the index to re-shard it."
+            )
+
+    def load_index(self):
+        """
+        Loads every published shard; shards that never received a file stay empty.
+        """
+        self._check_layout()
+        if self._read_layout() is None:
+            raise FileNotFoundError("Sharded FAISS index not found on disk.")
+
+        for shard in self._published():
+            shard.load_index()
+
+    def open_index(self, loader, refresh: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Same as VectorStore.open_index, for all shards.
+        """
+        self._check_layout()
+        chunking = loader.chunking_config()
+        if (
+            not refresh
+            and self._read_layout() is not None
+            and all(
+                saved_chunking(index_versions.resolve(shard.index_path)) == chunking
+                for shard in self._published()
+            )
+        ):
+            self.load_index()
+            return None
+
+        return self.sync_index(loader)
+
+    def sync_index(self, loader) -> Dict[str, int]:
+        """
+        Incrementally syncs every shard with its share of the loader's
+        files, in parallel, then swaps the published shards in.
+        """
+        self._check_layout()
+
+        with profiled("ingest"), stage("ingest"):
+            if self.ingest_processes and self.num_shards > 1:
+                results = self._sync_in_processes(loader)
+            else:
+                results = [self._sync_in_process(shard, i, loader) for i, shard in enumerate(self.shards)]
+
+            self._write_layout()
+            for shard in self.shards:
+                shard.reload_if_changed()
+
+        totals: Dict[str, int] = {}
+        loader.errors = []
+        for stats, errors in results:
+            for name, value in stats.items():
+                totals[name] = totals.get(name, 0) + value
+            loader.errors.extend(errors)
+
+        count("chunks_added", totals["chunks_added"])
+        count("chunks_deleted", totals["chunks_deleted"])
+        return totals
+
+    def _shard_loader(self, loader, shard: int, workers: int) -> ShardLoader:
+        # A private copy, so shards synced concurrently keep separate errors
+        shard_loader = copy.copy(loader)
+        shard_loader.workers = workers
+        shard_loader.errors = []
+        return ShardLoader(shard_loader, shard, self.num_shards)
+
+    def _sync_in_process(self, shard: VectorStore, i: int, loader) -> Tuple[Dict[str, int], list]:
+        shard_loader = self._shard_loader(loader, i, loader.workers)
+        return shard._sync_index(shard_loader), shard_loader.errors
+
+    def _sync_in_processes(self, loader) -> List[Tuple[Dict[str, int], list]]:
+        # Split the cores between the embedding models instead of oversubscribing
+        threads = max(1, (os.cpu_count() or 1) // self.ingest_workers)
+
+        tasks = []
+        for i in range(self.num_shards):
+            embedder_kwargs = dict(self.embedder_kwargs)
+            # The embedding cache is single-writer: one directory per shard
+            embedder_kwargs.setdefault(
+                "cache_dir",
+                os.path.join(self.embedding_cache_dir, f"shard-{i:02d}") if self.embedding_cache_dir else None
+            )
+            tasks.append((
+                self.shard_path(i), self.store_kwargs, self._shard_loader(loader, i, 1),
+                self.embedder_factory, embedder_kwargs, threads
+            ))
+
+        # spawn: forking a process that already runs torch threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.ingest_workers, mp_context=context) as pool:
+            results = []
+            for result, trace in pool.map(_sync_shard, tasks):
+                replay(trace)
+                results.append(result)
+            return results
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        swapped = [shard.reload_if_changed(force=force) for shard in self._published()]
+        return any(swapped)
+
+    def start_watching(self, interval: float = 5.0):
+        for shard in self.shards:
+            shard.start_watching(interval=interval)
+
+    def stop_watching(self):
+        for shard in self.shards:
+            shard.stop_watching()
+
+    def close(self):
+        """
+        Stops the watchers and the search thread pool.
+        """
+        self.stop_watching()
+        self._search_pool.shutdown(wait=True)
+
+    # Search
+
+    def _fan_out(self, fn, *args) -> list:
+        return list(self._search_pool.map(lambda shard: fn(shard, *args), self.shards))
+
+    def _merge_dense(self, per_shard: list, k: int) -> List[List[Document]]:
+        """
+        Merges per-shard (store, [[(distance, row)]]) results into the
+        global top-k per query, fetching only the winning chunks.
+        """
+        num_queries = len(per_shard[0][1])
+        results = []
+
+        for q in range(num_queries):
+            # Each shard's list is already sorted, so a k-way heap merge suffices
+            ranked = heapq.merge(
+                *(
+                    [(distance, i, row) for distance, row in hits[q]]
+                    for i, (_, hits) in enumerate(per_shard)
+                )
+            )
+            top = list(islice(ranked, k))
+
+            rows_by_shard: Dict[int, List[int]] = {}
+            for _, i, row in top:
+                rows_by_shard.setdefault(i, []).append(row)
+            fetched = {
+                (i, row): doc
+                for i, rows in rows_by_shard.items()
+                for row, doc in zip(rows, self.shards[i]._documents_at_rows(per_shard[i][0], rows))
+            }
+            results.append([fetched[(i, row)] for _, i, row in top])
+
+        return results
+
+    def similarity_search_batch(self, queries: List[str], k: int = 3) -> List[List[Document]]:
+        """
+        Top-k chunks for several queries: one batched embedding, one FAISS
+        search per shard (in parallel) and a heap merge per query.
+        """
+        version = self.version
+        results: List[Optional[List[Document]]] = [
+            self.result_cache.get((version, query, k, None)) for query in queries
+        ]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if missing:
+            with stage("embed_query"):
+                embeddings = self.embed_queries([queries[i] for i in missing])
+            with stage("faiss_search"):
+                per_shard = self._fan_out(VectorStore.search_vectors, embeddings, k)
+            with stage("chunk_fetch"):
+                merged = self._merge_dense(per_shard, k)
+
+            for i, documents in zip(missing, merged):
+                results[i] = documents
+                self.result_cache.put((version, queries[i], k, None), documents)
+
+        return [list(result) for result in results]
+
+    def similarity_search(self, query: str, k: int = 3, filters: Optional[dict] = None) -> List[Document]:
+        """
+        Top-k chunks across all shards, optionally filtered (see MetadataIndex).
+        """
+        version = self.version
+        key = (version, query, k, freeze_filters(filters))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        embedding = np.asarray([self.embed_query(query)], dtype=np.float32)
+        with stage("faiss_search"):
+            per_shard = self._fan_out(VectorStore.search_vectors, embedding, k, filters)
+        with stage("chunk_fetch"):
+            documents = self._merge_dense(per_shard, k)[0]
+
+        self.result_cache.put(key, documents)
+        return list(documents)
+
+    def hybrid_search(self, query: str, k: int = 3, fetch_k: int = 20, rrf_k: int = 60,
+                      filters: Optional[dict] = None) -> List[Document]:
+        """
+        Merges every shard's dense and BM25 candidates into two global
+        rankings and fuses them with RRF. BM25 scores use per-shard term
+        statistics, which is close enough for ranking once shards hold a
+        few hundred chunks each.
+        """
+        if not self.lexical:
+            raise ValueError("Lexical index not available. Create the store with lexical=True.")
+
+        version = self.version
+        key = (version, "hybrid", query, k, fetch_k, freeze_filters(filters))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        embedding = self.embed_query(query)
+        loaded = [shard for shard in self.shards if shard.vector_store is not None]
+        per_shard = list(self._search_pool.map(
+            lambda shard: shard.hybrid_candidates(query, embedding, fetch_k, filters), loaded
+        ))
+
+        stores = {}
+        dense_lists, lexical_lists = [], []
+        for store, dense, lexical in per_shard:
+            dense_lists.append(dense)
+            lexical_lists.append([(-score, chunk_id) for score, chunk_id in lexical])
+            for _, chunk_id in dense + lexical:
+                stores[chunk_id] = store
+
+        dense_ids = [chunk_id for _, chunk_id in islice(heapq.merge(*dense_lists), fetch_k)]
+        lexical_ids = [chunk_id for _, chunk_id in islice(heapq.merge(*lexical_lists), fetch_k)]
+        fused_ids = reciprocal_rank_fusion([dense_ids, lexical_ids], k=rrf_k)[:k]
+
+        with stage("chunk_fetch"):
+            documents = [stores[chunk_id].docstore.search(chunk_id) for chunk_id in fused_ids]
+
+        self.result_cache.put(key, documents)
+        return list(documents)
+
+
+def create_vector_store(embedding_model, index_path: str = "faiss_index", num_shards: int = 1, **kwargs):
+    """
+    A VectorStore, or a ShardedVectorStore when num_shards > 1.
+    """
+    if num_shards > 1:
+        return ShardedVectorStore(embedding_model, index_path=index_path, num_shards=num_shards, **kwargs)
+    return VectorStore(embedding_model=embedding_model, index_path=index_path, **kwargs)
@@ -0,0 +1,86 @@
+"""
+Semantic answer cache test - runs SearchEngine against a fake local LLM
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from answer_cache import SemanticAnswerCache
+from search import SearchEngine
+
+
+class FakeVectorStore:
+    """
+    Bag-of-letters embeddings over a fixed set of chunks.
+    """
+
+    def __init__(self):
+        self.documents = [
+            Document(page_content="Assessment rules", metadata={"chunk_id": "a", "page": 1}),
+            Document(page_content="Grading policy", metadata={"chunk_id": "b", "page": 2}),
+        ]
+
+    def embed_query(self, query: str):
+        vector = np.zeros(26, dtype=np.float32)
+        for char in query.lower():
+            if "a" <= char <= "z":
+                vector[ord(char) - ord("a")] += 1
+        return vector
+
+    def similarity_search(self, query: str, k: int = 3):
+        return self.documents[:k]
+
+    def cache_stats(self):
+        return {}
+
+
+class CountingLLM(FakeListChatModel):
+    calls: int = 0
+
+    def invoke(self, *args, **kwargs):
+        self.calls += 1
+        return super().invoke(*args, **kwargs)
+
+
+def test_near_duplicate_question_skips_llm(tmp_path):
+    llm = CountingLLM(responses=["first answer", "second answer"])
+    cache = SemanticAnswerCache(path=str(tmp_path / "answers.json"), threshold=0.9)
+    engine = SearchEngine(FakeVectorStore(), llm=llm, answer_cache=cache)
+
+    assert engine.ask("What is this document about?", k=2) == "first answer"
+    assert engine.ask("what is this document about", k=2) == "first answer"
+    assert llm.calls == 1
+    assert cache.stats()["hits"] == 1
+
+    # Same question, different retrieved chunks -> the LLM must be called
+    assert engine.ask("What is this document about?", k=1) == "second answer"
+    assert llm.calls == 2
+    assert cache.stats()["near_misses"] == 1
+
+
+def test_answers_persist_and_evict(tmp_path):
+    path = str(tmp_path / "answers.json")
+    cache = SemanticAnswerCache(path=path, threshold=0.9, max_entries=2)
+    store = FakeVectorStore()
+
+    for question in ["alpha", "bravo", "charlie"]:
+        cache.add(question, store.embed_query(question), ["a"], f"answer {question}")
+
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+
+    reloaded = SemanticAnswerCache(path=path, threshold=0.9)
+    assert reloaded.lookup(store.embed_query("charlie"), ["a"]) == "answer charlie"
+    assert reloaded.lookup(store.embed_query("alpha"), ["a"]) is None
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,48 @@
+"""
+Bulk answering test - batched retrieval, shared LLM calls and retries
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from answer_cache import SemanticAnswerCache
+from search import SearchEngine
+from test_async import BatchingVectorStore
+
+
+class FlakyLLM(FakeListChatModel):
+    calls: int = 0
+
+    def invoke(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("rate limited")
+        return super().invoke(*args, **kwargs)
+
+
+def test_ask_many_batches_dedupes_and_retries(tmp_path):
+    store = BatchingVectorStore()
+    llm = FlakyLLM(responses=["first", "second"])
+    cache = SemanticAnswerCache(path=str(tmp_path / "answers.json"), threshold=0.99)
+    engine = SearchEngine(store, llm=llm, answer_cache=cache)
+
+    answers = engine.ask_many(["grading", "assessment", "grading"], k=2, max_concurrency=1)
+
+    # One retrieval batch; "grading" is asked once and retried once
+    assert store.batch_sizes == [3]
+    assert answers == ["first", "second", "first"]
+    assert llm.calls == 3
+
+    # Answers were persisted once at the end and serve the next run
+    reloaded = SemanticAnswerCache(path=str(tmp_path / "answers.json"), threshold=0.99)
+    assert len(reloaded) == 2
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,78 @@
+"""
+Async path test - concurrent aask calls share one batched retrieval
+"""
+import asyncio
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from batcher import QueryBatcher
+from metrics import Trace
+from search import SearchEngine
+from test_answer_cache import FakeVectorStore
+
+
+class BatchingVectorStore(FakeVectorStore):
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+
+    def similarity_search_batch(self, queries, k: int = 3):
+        self.batch_sizes.append(len(queries))
+        return [self.documents[:k] for _ in queries]
+
+
+def test_concurrent_questions_are_batched():
+    store = BatchingVectorStore()
+    engine = SearchEngine(
+        store,
+        llm=FakeListChatModel(responses=["answer"]),
+        batcher=QueryBatcher(store, max_batch_size=8, max_wait_ms=20)
+    )
+
+    async def ask_all():
+        return await asyncio.gather(*(engine.aask(f"question {i}", k=1 + i % 2) for i in range(5)))
+
+    assert asyncio.run(ask_all()) == ["answer"] * 5
+    assert store.batch_sizes == [5]
+    assert engine.cache_stats()["batching"]["avg_batch_size"] == 5
+
+
+def test_concurrent_questions_keep_separate_traces():
+    engine = SearchEngine(FakeVectorStore(), llm=FakeListChatModel(responses=["answer"]))
+    traces = [Trace("aask") for _ in range(3)]
+
+    async def ask_all():
+        return await asyncio.gather(*(
+            engine.aask(f"question {i}", k=2, trace=trace) for i, trace in enumerate(traces)
+        ))
+
+    assert asyncio.run(ask_all()) == ["answer"] * 3
+    for trace in traces:
+        names = [name for name, _, _ in trace.stages]
+        assert names.count("aask") == names.count("llm") == 1
+        assert trace.counts["chunks_retrieved"] == 2
+
+
+def test_full_batch_flushes_without_waiting():
+    store = BatchingVectorStore()
+    batcher = QueryBatcher(store, max_batch_size=2, max_wait_ms=10_000)
+
+    async def search_all():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.search(f"q{i}", k=2) for i in range(4))), timeout=5
+        )
+
+    results = asyncio.run(search_all())
+    assert [len(documents) for documents in results] == [2, 2, 2, 2]
+    assert store.batch_sizes == [2, 2]
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
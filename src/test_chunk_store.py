@@ -0,0 +1,94 @@
+"""
+Chunk store test - mmap and SQLite storage survive a save/load, and a loaded index can still be modified
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from chunk_store import CHUNK_STORES
+from vector_store import VectorStore
+
+
+def make_document(i):
+    return Document(
+        page_content=f"text of chunk {i}",
+        metadata={"source": f"doc{i % 2}.pdf", "page": i, "chunk_id": f"c{i}"}
+    )
+
+
+def load(tmp_path, storage):
+    store = VectorStore(
+        embedding_model=DeterministicFakeEmbedding(size=16), index_path=str(tmp_path / "index"), storage=storage
+    )
+    store.load_index()
+    return store
+
+
+@pytest.mark.parametrize("storage", ["mmap", "sqlite"])
+def test_saved_chunks_are_read_lazily(tmp_path, storage):
+    documents = [make_document(i) for i in range(6)]
+    store = VectorStore(
+        embedding_model=DeterministicFakeEmbedding(size=16), index_path=str(tmp_path / "index"), storage=storage
+    )
+    store.build_index(documents)
+    store.save_index()
+
+    loaded = load(tmp_path, storage)
+    chunks = loaded.vector_store.docstore
+    assert isinstance(chunks, CHUNK_STORES[storage])
+    assert len(chunks) == len(loaded) == 6
+
+    # Rows follow vector order, and chunk IDs map back to them
+    for row, (chunk_id, doc) in enumerate(chunks.iter_documents()):
+        assert chunks.id_at(row) == chunk_id == doc.metadata["chunk_id"]
+        assert chunks.row_of(chunk_id) == row
+    assert chunks.row_of("missing") is None
+    assert chunks.ids_at([4, 0, 2]) == ["c4", "c0", "c2"]
+    assert isinstance(chunks.search("missing"), str)
+
+    rows = [chunks.row_of(chunk_id) for chunk_id in ("c4", "c0", "c2")]
+    fetched = chunks.documents_at(rows)
+    assert [doc.page_content for doc in fetched] == ["text of chunk 4", "text of chunk 0", "text of chunk 2"]
+    assert fetched[0].metadata == documents[4].metadata
+    assert chunks.search("c3").page_content == "text of chunk 3"
+
+    assert loaded.similarity_search("text of chunk 3", k=1)[0].metadata["chunk_id"] == "c3"
+
+
+@pytest.mark.parametrize("storage", ["mmap", "sqlite"])
+def test_loaded_store_can_be_modified_and_saved(tmp_path, storage):
+    store = VectorStore(
+        embedding_model=DeterministicFakeEmbedding(size=16), index_path=str(tmp_path / "index"), storage=storage
+    )
+    store.build_index([make_document(i) for i in range(6)])
+    store.save_index()
+
+    loaded = load(tmp_path, storage)
+    loaded.add_documents([make_document(6)])
+    # Copied into memory on the first change
+    assert isinstance(loaded.vector_store.docstore, InMemoryDocstore)
+    loaded.delete_documents(["c1"])
+    loaded.save_index()
+
+    reloaded = load(tmp_path, storage)
+    chunks = reloaded.vector_store.docstore
+    assert isinstance(chunks, CHUNK_STORES[storage])
+    assert len(chunks) == 6
+    assert chunks.row_of("c1") is None
+    assert [chunk_id for chunk_id, _ in chunks.iter_documents()] == [
+        reloaded.vector_store.index_to_docstore_id[row] for row in range(len(chunks))
+    ]
+
+    assert reloaded.similarity_search("text of chunk 6", k=1)[0].metadata["chunk_id"] == "c6"
+    assert all(doc.metadata["chunk_id"] != "c1" for doc in reloaded.similarity_search("text of chunk 1", k=6))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,95 @@
+"""
+Chunker test - chunks respect the size limit and boundaries, and a config change rebuilds the index
+"""
+import os
+import re
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from chunker import LEGACY_CHUNKING, Chunker, ChunkingConfig
+from data_loader import DataLoader
+from vector_store import VectorStore
+
+
+TEXT = (
+    "# Intro\nThe first sentence is here. Second one follows! Third?\n\n"
+    "## Methods\nWe did things. " + "x" * 130 + " end.\nMore text here."
+)
+
+
+class WhitespaceTokenizer:
+    """
+    One token per whitespace-separated word, with HF-style offsets.
+    """
+
+    def __call__(self, texts, add_special_tokens=False, return_offsets_mapping=False):
+        offsets = [[m.span() for m in re.finditer(r"\S+", text)] for text in texts]
+        return {"input_ids": [list(range(len(o))) for o in offsets], "offset_mapping": offsets}
+
+
+def test_chunks_fit_and_start_at_headings():
+    chunker = Chunker(ChunkingConfig(unit="chars", chunk_size=60, chunk_overlap=20, boundaries="heading"))
+    chunks = chunker.split_documents([Document(page_content=TEXT, metadata={"page": 3})])
+
+    for chunk in chunks:
+        assert len(chunk.page_content) <= 60
+        assert TEXT[chunk.metadata["start_index"]:].startswith(chunk.page_content)
+        assert chunk.metadata["page"] == 3
+
+    # No chunk straddles a heading, and the over-long run of x's is cut
+    assert not any("Third?" in chunk.page_content and "## Methods" in chunk.page_content for chunk in chunks)
+    assert any(chunk.page_content.startswith("## Methods") for chunk in chunks)
+    assert "".join(chunk.page_content for chunk in chunks).count("x") == TEXT.count("x")
+
+
+def test_token_sizing_with_overlap():
+    chunker = Chunker(ChunkingConfig(chunk_size=5, chunk_overlap=2), tokenizer=WhitespaceTokenizer())
+    text = "a b c. d e. f g. h i j k l m n o p q. r."
+    chunks = chunker.split_documents([Document(page_content=text)])
+
+    assert all(len(chunk.page_content.split()) <= 5 for chunk in chunks)
+    # "d e." is carried into the chunk after the one it ends
+    assert [chunk.page_content for chunk in chunks][:2] == ["a b c. d e.", "d e. f g."]
+    assert "".join(chunk.page_content for chunk in chunks).count("r.") == 1
+
+
+def test_model_limit_is_enforced():
+    try:
+        Chunker(ChunkingConfig(chunk_size=400))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("chunks over the embedding model's limit must be rejected")
+
+
+def test_config_change_rebuilds_index(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for i in range(3):
+        (data_dir / f"doc{i}.txt").write_text(" ".join(f"Sentence {j} of doc {i}." for j in range(60)), encoding="utf-8")
+
+    embedding = DeterministicFakeEmbedding(size=16)
+    store = VectorStore(embedding_model=embedding, index_path=str(tmp_path / "index"))
+    store.sync_index(DataLoader(str(data_dir), chunking=LEGACY_CHUNKING))
+    legacy_size = len(store)
+
+    # Same config: the saved index is reused without parsing anything
+    reopened = VectorStore(embedding_model=embedding, index_path=str(tmp_path / "index"))
+    assert reopened.open_index(DataLoader(str(data_dir), chunking=LEGACY_CHUNKING)) is None
+
+    smaller = ChunkingConfig(unit="chars", chunk_size=200, chunk_overlap=40)
+    stats = reopened.open_index(DataLoader(str(data_dir), chunking=smaller))
+    assert stats["files_modified"] == 3
+    assert stats["chunks_deleted"] == 0
+    assert len(reopened) == stats["chunks_added"] > legacy_size
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,63 @@
+"""
+Context builder test - overlap removal, page merging and the token budget
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from langchain_core.documents import Document
+
+from context_builder import ContextBuilder
+
+
+class CharTokenizer:
+    """
+    One token per character, so budgets are easy to reason about.
+    """
+
+    def encode(self, text: str):
+        return list(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def chunk(text: str, page: int, start=None):
+    metadata = {"source": "doc.pdf", "page": page}
+    if start is not None:
+        metadata["start_index"] = start
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_adjacent_chunks_merge_without_overlap():
+    builder = ContextBuilder(max_tokens=1000, tokenizer=CharTokenizer(), min_overlap=3)
+    page_text = "The exam is worth sixty percent. Coursework is worth forty percent."
+
+    # Retrieved out of reading order, overlapping by "percent."
+    second = chunk(page_text[24:], page=2, start=24)
+    first = chunk(page_text[:32], page=2, start=0)
+    other = chunk("Resits are in August.", page=5)
+
+    context = builder.build([second, other, first])
+    assert context == f"(Page 2): {page_text}\n\n(Page 5): Resits are in August."
+
+    # Without start_index the overlap is found by matching text
+    context = builder.build([chunk(page_text[:32], 2), chunk(page_text[24:], 2)])
+    assert context == f"(Page 2): {page_text}"
+
+
+def test_budget_truncates_and_drops():
+    builder = ContextBuilder(max_tokens=40, tokenizer=CharTokenizer(), min_tail_tokens=5)
+    documents = [chunk("a" * 10, page=1), chunk("b" * 40, page=2), chunk("c" * 10, page=3)]
+
+    context = builder.build(documents)
+    assert context == "(Page 1): aaaaaaaaaa\n\n(Page 2): bbbbbbbb"
+    assert builder.count_tokens(context) == 40
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
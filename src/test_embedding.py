@@ -0,0 +1,73 @@
+"""
+Embedding engine test - batched encoding, normalization and contiguous float32 output
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from embedding import EmbeddingEngine
+
+
+class StubModel:
+    """
+    Encodes like SentenceTransformer.encode, in `batch_size` chunks, but
+    returns float64 in Fortran order so the engine has to convert it.
+    """
+
+    def __init__(self, dimension=3):
+        self.dimension = dimension
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, batch_size, **kwargs):
+        rows = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            self.batches.append(list(batch))
+            rows.extend([len(text), text.count(" "), 0.0] for text in batch)
+        return np.asfortranarray(np.array(rows, dtype=np.float64))
+
+
+def test_encodes_in_batches_as_contiguous_float32():
+    model = StubModel()
+    engine = EmbeddingEngine(batch_size=4, model=model)
+
+    texts = [f"text number {i}\nsecond line" for i in range(10)]
+    vectors = engine.embed_documents(texts)
+
+    # One encode call, split into batches of batch_size
+    assert [len(batch) for batch in model.batches] == [4, 4, 2]
+    # Newlines are replaced as HuggingFaceEmbeddings did
+    assert all("\n" not in text for batch in model.batches for text in batch)
+
+    assert vectors.shape == (10, 3)
+    assert vectors.dtype == np.float32 and vectors.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(vectors[0], [len("text number 0 second line"), 4, 0])
+
+    query = engine.embed_query("one query")
+    assert query.dtype == np.float32 and query.shape == (3,)
+    assert engine.embed_documents([]).shape == (0, 3)
+
+
+def test_normalize_scales_rows_to_unit_length():
+    engine = EmbeddingEngine(normalize=True, model=StubModel())
+
+    vectors = engine.embed_documents(["a b c", "longer text here", ""])
+    np.testing.assert_allclose(np.linalg.norm(vectors[:2], axis=1), 1.0, rtol=1e-6)
+    # Rows keep their direction
+    np.testing.assert_allclose(vectors[0], np.array([5, 2, 0]) / np.sqrt(29), rtol=1e-6)
+    # An all-zero row stays zero instead of turning into NaN
+    np.testing.assert_array_equal(vectors[2], [0, 0, 0])
+    assert vectors.dtype == np.float32 and vectors.flags["C_CONTIGUOUS"]
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
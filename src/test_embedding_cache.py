@@ -0,0 +1,151 @@
+"""
+Embedding cache test - hits and misses, LRU eviction, flushing, reopening from disk and sharing a directory
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+def vector(value, dimension=4):
+    return np.full(dimension, value, dtype=np.float32)
+
+
+class CountingEngine:
+    model_name = "stub"
+    normalize = True
+    dimension = 4
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.stack([vector(len(text)) for text in texts])
+
+
+def test_hits_misses_and_lru_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dimension=4, max_entries=2)
+    a, b, c = (EmbeddingCache.key("stub", text) for text in ("a", "b", "c"))
+
+    assert cache.get(a) is None
+    cache.put([a, b], np.stack([vector(1), vector(2)]))
+    np.testing.assert_array_equal(cache.get(a), vector(1))
+
+    # b is now the least recently used entry and makes room for c
+    cache.put([c], np.stack([vector(3)]))
+    assert cache.get(b) is None
+    np.testing.assert_array_equal(cache.get(a), vector(1))
+    np.testing.assert_array_equal(cache.get(c), vector(3))
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 2, 1)
+    assert stats["hit_rate"] == 3 / 5
+
+
+def test_key_normalizes_whitespace_and_separates_models():
+    assert EmbeddingCache.key("stub", "two  words\n") == EmbeddingCache.key("stub", "two words")
+    assert EmbeddingCache.key("stub", "text") != EmbeddingCache.key("other", "text")
+
+
+def test_flushed_entries_survive_reopening(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dimension=4, max_entries=8)
+    kept, lost = EmbeddingCache.key("stub", "kept"), EmbeddingCache.key("stub", "lost")
+
+    cache.put([kept], np.stack([vector(7)]))
+    cache.flush()
+    # Written after the last flush, so the saved index does not know it
+    cache.put([lost], np.stack([vector(9)]))
+
+    reopened = EmbeddingCache(str(tmp_path), dimension=4, max_entries=8)
+    assert len(reopened) == 1
+    np.testing.assert_array_equal(reopened.get(kept), vector(7))
+    assert reopened.get(lost) is None
+
+    # A different shape cannot reuse the files and starts empty
+    assert len(EmbeddingCache(str(tmp_path), dimension=8, max_entries=8)) == 0
+
+
+def test_reused_slot_is_not_served_for_a_stale_index_entry(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dimension=4, max_entries=1)
+    old, new = EmbeddingCache.key("stub", "old"), EmbeddingCache.key("stub", "new")
+
+    cache.put([old], np.stack([vector(1)]))
+    cache.flush()
+    # Evicts `old` and reuses its slot; only the vector files are flushed
+    cache.put([new], np.stack([vector(2)]))
+    cache._vectors.flush()
+    cache._keys.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), dimension=4, max_entries=1)
+    assert reopened.get(old) is None
+
+
+def test_cached_embeddings_only_encode_unique_misses(tmp_path):
+    engine = CountingEngine()
+    embeddings = CachedEmbeddings(engine, EmbeddingCache(str(tmp_path), dimension=4))
+
+    first = embeddings.embed_documents(["one", "three", "one"])
+    second = embeddings.embed_documents(["three", "seven"])
+
+    assert engine.encoded == ["one", "three", "seven"]
+    np.testing.assert_array_equal(first[2], vector(3))
+    np.testing.assert_array_equal(second[0], vector(5))
+    np.testing.assert_array_equal(embeddings.embed_query("one"), vector(3))
+
+
+def test_embed_documents_leaves_flushing_to_the_caller(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dimension=4)
+    embeddings = CachedEmbeddings(CountingEngine(), cache)
+    index_path = tmp_path / "index.json"
+
+    for text in ("one", "two", "three"):
+        embeddings.embed_documents([text])
+    assert not index_path.exists()
+
+    # Once, e.g. at the end of a sync
+    embeddings.flush()
+    assert len(EmbeddingCache(str(tmp_path), dimension=4)) == 3
+
+
+def test_caches_sharing_a_directory_keep_each_others_entries(tmp_path):
+    # Two processes' views of one directory
+    first = EmbeddingCache(str(tmp_path), dimension=4, max_entries=4)
+    second = EmbeddingCache(str(tmp_path), dimension=4, max_entries=4)
+    a, b = EmbeddingCache.key("stub", "a"), EmbeddingCache.key("stub", "b")
+
+    first.put([a], np.stack([vector(1)]))
+    # The slot `first` filled is skipped, not overwritten
+    second.put([b], np.stack([vector(2)]))
+    first.flush()
+    second.flush()
+
+    np.testing.assert_array_equal(first.get(a), vector(1))
+    np.testing.assert_array_equal(second.get(a), vector(1))
+    reopened = EmbeddingCache(str(tmp_path), dimension=4, max_entries=4)
+    np.testing.assert_array_equal(reopened.get(a), vector(1))
+    np.testing.assert_array_equal(reopened.get(b), vector(2))
+
+
+def test_lost_index_is_recovered_from_the_slot_keys(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dimension=4, max_entries=4)
+    kept = EmbeddingCache.key("stub", "kept")
+    cache.put([kept], np.stack([vector(3)]))
+    cache.flush()
+    os.remove(tmp_path / "index.json")
+
+    # The existing files are reopened, not truncated
+    reopened = EmbeddingCache(str(tmp_path), dimension=4, max_entries=4)
+    np.testing.assert_array_equal(reopened.get(kept), vector(3))
+    np.testing.assert_array_equal(cache.get(kept), vector(3))
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,81 @@
+"""
+Versioned index layout test - publish, resolve and prune
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import index_versions
+import manifest
+from chunker import ChunkingConfig
+from data_loader import DataLoader
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from manifest import FILE_STATS_FILENAME, MANIFEST_FILENAME
+from vector_store import VectorStore
+
+
+def test_publish_flips_current_and_prune_keeps_it(tmp_path):
+    root = str(tmp_path / "faiss_index")
+
+    # Unversioned roots resolve to themselves
+    assert index_versions.current_version(root) is None
+    assert index_versions.resolve(root) == root
+
+    first, first_path = index_versions.new_version(root)
+    # Created but not published yet: readers still see the old layout
+    assert index_versions.resolve(root) == root
+
+    index_versions.publish(root, first)
+    assert index_versions.resolve(root) == first_path
+
+    for _ in range(3):
+        version, _ = index_versions.new_version(root)
+    assert version == "v000004"
+
+    # v000004 is unpublished, so the current v000001 survives pruning
+    index_versions.prune(root, keep=1)
+    assert index_versions.list_versions(root) == ["v000001", "v000004"]
+
+    index_versions.publish(root, version)
+    index_versions.prune(root, keep=1)
+    assert index_versions.list_versions(root) == ["v000004"]
+    assert index_versions.current_version(root) == "v000004"
+
+
+def test_touched_files_leave_the_published_version_alone(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "notes.txt").write_text("Unchanged text of the only document.", encoding="utf-8")
+    root = str(tmp_path / "faiss_index")
+
+    loader = DataLoader(str(data_dir), chunking=ChunkingConfig(unit="chars", chunk_size=300, chunk_overlap=0))
+    store = VectorStore(embedding_model=DeterministicFakeEmbedding(size=16), index_path=root)
+    store.sync_index(loader)
+    manifest_path = os.path.join(index_versions.resolve(root), MANIFEST_FILENAME)
+    with open(manifest_path, "rb") as f:
+        published_manifest = f.read()
+
+    # Touched, not modified: only the stat fingerprint changes
+    stat = os.stat(data_dir / "notes.txt")
+    os.utime(data_dir / "notes.txt", (stat.st_atime, stat.st_mtime + 10))
+    assert store.sync_index(loader)["files_modified"] == 0
+
+    assert index_versions.list_versions(root) == ["v000001"]
+    with open(manifest_path, "rb") as f:
+        assert f.read() == published_manifest
+    assert os.path.exists(os.path.join(root, FILE_STATS_FILENAME))
+
+    # The saved fingerprint spares the next sync from re-hashing the file
+    hashed = []
+    file_sha256 = manifest.file_sha256
+    monkeypatch.setattr(manifest, "file_sha256", lambda path: hashed.append(path) or file_sha256(path))
+    store.sync_index(loader)
+    assert hashed == []
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
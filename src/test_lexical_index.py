@@ -0,0 +1,99 @@
+"""
+Lexical retrieval test - BM25 scoring and removal, rank fusion, and hybrid search finding exact codes
+"""
+import math
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+from vector_store import VectorStore
+
+
+class VocabularyEmbedding(Embeddings):
+    """
+    Counts a few known words, like a dense model that has never seen a
+    product code: "ZX-4411" contributes nothing to the vector.
+    """
+
+    VOCABULARY = ("invoice", "payment", "refund", "shipping")
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(word)) for word in self.VOCABULARY]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def test_tokenize_keeps_codes_together():
+    assert tokenize("See ISO_9001 and AB-12.3, then v2.") == ["see", "iso_9001", "and", "ab-12.3", "then", "v2"]
+
+
+def test_bm25_scores_and_removal(tmp_path):
+    index = BM25Index()
+    index.add(["a", "b", "c"], ["apple banana", "apple apple cherry", "cherry date"])
+
+    # "apple" is in 2 of 3 chunks; the average chunk is 7/3 terms long
+    idf = math.log(1 + (3 - 2 + 0.5) / (2 + 0.5))
+    norm = index.k1 * (1 - index.b + index.b * 3 / (7 / 3))
+    results = index.search("apple", k=5)
+    assert [chunk_id for chunk_id, _ in results] == ["b", "a"]
+    assert math.isclose(results[0][1], idf * 2 * (index.k1 + 1) / (2 + norm))
+
+    assert [chunk_id for chunk_id, _ in index.search("apple", k=5, allowed={"a", "c"})] == ["a"]
+    assert index.search("missing", k=5) == []
+
+    index.remove(["b", "unknown"])
+    assert len(index) == 2 and index.total_length == 4
+    assert {chunk_id for chunk_id, _ in index.search("apple cherry", k=5)} == {"a", "c"}
+    assert "b" not in index.postings["apple"] and index.postings["cherry"] == {"c": 1}
+
+    # Re-adding an ID replaces its terms
+    index.add(["a"], ["date"])
+    assert "apple" not in index.postings and index.total_length == 3
+
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded.search("date", k=5) == index.search("date", k=5)
+
+
+def test_reciprocal_rank_fusion_order():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+    # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62, d: 1/63
+    assert fused == ["a", "c", "b", "d"]
+    # Equal scores fall back to ID order
+    assert reciprocal_rank_fusion([["y"], ["x"]]) == ["x", "y"]
+
+
+def test_hybrid_search_finds_exact_code_that_dense_search_misses(tmp_path):
+    documents = [
+        Document(page_content=text, metadata={"source": "notes.txt", "chunk_id": chunk_id})
+        for chunk_id, text in [
+            ("refund", "refund"),
+            ("refund-shipping", "refund shipping"),
+            ("code", "shipping ZX-4411"),
+            ("invoice", "invoice payment"),
+            ("invoice-shipping", "invoice payment shipping"),
+        ]
+    ]
+    store = VectorStore(embedding_model=VocabularyEmbedding(), index_path=str(tmp_path / "index"), lexical=True)
+    store.build_index(documents)
+
+    query = "refund ZX-4411"
+    dense = store.similarity_search(query, k=2)
+    assert [doc.metadata["chunk_id"] for doc in dense] == ["refund", "refund-shipping"]
+
+    hybrid = store.hybrid_search(query, k=2)
+    assert [doc.metadata["chunk_id"] for doc in hybrid] == ["refund", "code"]
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
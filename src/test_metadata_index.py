@@ -0,0 +1,156 @@
+"""
+Metadata filter test - filters map to the right vector rows and survive a save/load
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from chunker import ChunkingConfig
+from data_loader import DataLoader
+from metadata_index import MetadataIndex, freeze_filters
+from vector_store import VectorStore
+
+
+def make_index():
+    return MetadataIndex.from_documents([
+        Document(page_content="a", metadata={"source": "data/a.pdf", "page": 0, "ingested_at": 100.0}),
+        Document(page_content="b", metadata={"source": "data/a.pdf", "page": 3, "ingested_at": 100.0}),
+        Document(page_content="c", metadata={"source": "data/b.txt", "ingested_at": 200.0}),
+        Document(page_content="d", metadata={"source": "data/c.pdf", "page": 1, "ingested_at": 300.0}),
+    ])
+
+
+def test_select_combines_filters(tmp_path):
+    index = make_index()
+
+    assert index.select({}).tolist() == [0, 1, 2, 3]
+    assert index.select({"source": "data/a.pdf"}).tolist() == [0, 1]
+    assert index.select({"source": ["data/b.txt", "data/c.pdf"]}).tolist() == [2, 3]
+    assert index.select({"file_type": "PDF"}).tolist() == [0, 1, 3]
+    assert index.select({"file_type": "pdf", "page": [1, 5]}).tolist() == [1, 3]
+    assert index.select({"ingested_after": 150, "ingested_before": 300}).tolist() == [2]
+    assert index.select({"source": "data/missing.pdf"}).tolist() == []
+
+    with pytest.raises(ValueError):
+        index.select({"author": "someone"})
+    with pytest.raises(ValueError):
+        index.select({"page": "3"})
+
+    index.save(str(tmp_path))
+    loaded = MetadataIndex.load(str(tmp_path))
+    assert loaded.sources == index.sources
+    assert loaded.select({"file_type": "pdf", "page": 3}).tolist() == [1]
+
+
+def test_source_filter_matches_any_spelling_of_the_path(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ("a.txt", "b.txt"):
+        (data_dir / name).write_text(" ".join(f"Sentence {j} of {name}." for j in range(20)), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    # Ingested through a relative data directory
+    loader = DataLoader("./data", chunking=ChunkingConfig(unit="chars", chunk_size=200, chunk_overlap=0))
+    store = VectorStore(
+        embedding_model=DeterministicFakeEmbedding(size=16), index_path=str(tmp_path / "index"),
+        storage="sqlite", lexical=True
+    )
+    store.sync_index(loader)
+    expected = sorted(
+        doc.metadata["chunk_id"] for _, doc in store._iter_stored_chunks() if doc.metadata["source_key"] == "a.txt"
+    )
+
+    index = store.metadata_index()
+    for spelling in ("data/a.txt", "./data/a.txt", "a.txt", str(data_dir / "a.txt"), "data/sub/../a.txt"):
+        assert len(index.select({"source": spelling})) == len(expected), spelling
+    assert index.select({"source": "other/data/c.txt"}).tolist() == []
+
+    # Both rankings of a hybrid search see the filter, on the lazily read store too
+    store.load_index()
+    assert hasattr(store.vector_store.docstore, "ids_at")
+    _, dense, lexical = store.hybrid_candidates(
+        "Sentence 3", store.embedding_model.embed_query("Sentence 3"), fetch_k=50,
+        filters={"source": str(data_dir / "a.txt")}
+    )
+    assert sorted(chunk_id for _, chunk_id in dense) == expected
+    assert lexical and {chunk_id for _, chunk_id in lexical} <= set(expected)
+
+
+def test_freeze_filters_is_order_independent():
+    assert freeze_filters(None) is None
+    assert freeze_filters({"page": [1, 2], "source": "a"}) == freeze_filters({"source": "a", "page": [1, 2]})
+    hash(freeze_filters({"source": ["a", "b"]}))
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "hnsw"])
+def test_selective_filter_keeps_recall_on_approximate_indexes(tmp_path, index_type):
+    embedding = DeterministicFakeEmbedding(size=32)
+    # 40 sources of 10 chunks: one source is 2.5% of the index
+    documents = [
+        Document(page_content=f"chunk {i}", metadata={"source": f"doc{i % 40}.txt", "chunk_id": f"c{i}"})
+        for i in range(400)
+    ]
+    vectors = np.asarray(embedding.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+
+    flat = VectorStore(embedding_model=embedding, index_path=str(tmp_path / "flat"))
+    flat.build_index_from_vectors(documents, vectors)
+    approximate = VectorStore(
+        embedding_model=embedding, index_path=str(tmp_path / index_type), index_type=index_type,
+        nprobe=1, ef_search=4
+    )
+    approximate.build_index_from_vectors(documents, vectors)
+
+    sources = [f"doc{i}.txt" for i in range(8)]
+    for query in ("chunk 7", "chunk 123", "something else"):
+        # A selective filter is searched exhaustively (IVF) or exactly (HNSW)
+        expected = flat.similarity_search(query, k=5, filters={"source": "doc7.txt"})
+        found = approximate.similarity_search(query, k=5, filters={"source": "doc7.txt"})
+        assert [doc.metadata["chunk_id"] for doc in found] == [doc.metadata["chunk_id"] for doc in expected]
+
+        # A broader one still fills k with matching chunks
+        found = approximate.similarity_search(query, k=5, filters={"source": sources})
+        assert len(found) == 5 and all(doc.metadata["source"] in sources for doc in found)
+
+
+def test_filter_rows_come_from_the_snapshot_searched(tmp_path, monkeypatch):
+    embedding = DeterministicFakeEmbedding(size=16)
+    index_path = str(tmp_path / "index")
+
+    def publish(documents):
+        store = VectorStore(embedding_model=embedding, index_path=index_path)
+        store.build_index(documents)
+        store.save_index()
+
+    publish([
+        Document(page_content=f"old {i}", metadata={"source": source, "chunk_id": f"{source}{i}"})
+        for source in ("a.txt", "b.txt") for i in range(2)
+    ])
+    serving = VectorStore(embedding_model=embedding, index_path=index_path)
+    serving.load_index()
+
+    # A larger version where every chunk matches is published and swapped in
+    # after the search took its snapshot, but before the filter is resolved
+    publish([
+        Document(page_content=f"new {i}", metadata={"source": "b.txt", "chunk_id": f"new{i}"})
+        for i in range(6)
+    ])
+    filtered_rows = VectorStore._filtered_rows
+
+    def swap_first(self, snapshot, filters):
+        self.reload_if_changed()
+        return filtered_rows(self, snapshot, filters)
+
+    monkeypatch.setattr(VectorStore, "_filtered_rows", swap_first)
+    found = serving.similarity_search("old 1", k=4, filters={"source": "b.txt"})
+    assert sorted(doc.metadata["chunk_id"] for doc in found) == ["b.txt0", "b.txt1"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,86 @@
+"""
+Metrics test - nested stage traces and Prometheus rendering
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from metrics import REGISTRY, MetricsRegistry, Trace, count, recorded, replay, stage, tracing
+
+
+def test_trace_records_nested_stages_and_counts():
+    trace = Trace("ask")
+
+    with tracing(trace), stage("ask"):
+        with stage("retrieval"):
+            with stage("faiss_search"):
+                pass
+        count("chunks_retrieved", 3)
+        with stage("llm"):
+            pass
+
+    # Stages outside a trace only feed the histogram
+    with stage("unrelated"):
+        pass
+
+    assert [(s["stage"], s["depth"]) for s in trace.to_dict()["stages"]] == [
+        ("ask", 0), ("retrieval", 1), ("faiss_search", 2), ("llm", 1)
+    ]
+    assert trace.counts == {"chunks_retrieved": 3}
+    assert "  faiss_search" in trace.report()
+
+
+def test_prometheus_rendering():
+    with stage("render_check"):
+        pass
+    count("render_checks", 2)
+
+    text = REGISTRY.render()
+    assert '# TYPE rag_stage_seconds histogram' in text
+    assert 'rag_stage_seconds_bucket{stage="render_check",le="+Inf"} 1' in text
+    assert 'rag_stage_seconds_count{stage="render_check"} 1' in text
+    assert "rag_render_checks_total 2" in text
+
+
+def test_label_values_are_escaped_and_callback_counters_typed():
+    registry = MetricsRegistry()
+    registry.counter("rag_test_total", "Test").inc(source='C:\\docs\\"q"\nnotes.pdf')
+    registry.callback_counter("rag_test_done_total", "Done", lambda: 4)
+    registry.gauge("rag_test_in_flight", "In flight", lambda: 1)
+
+    text = registry.render()
+    assert 'rag_test_total{source="C:\\\\docs\\\\\\"q\\"\\nnotes.pdf"} 1' in text
+    assert "# TYPE rag_test_done_total counter\nrag_test_done_total 4" in text
+    assert "# TYPE rag_test_in_flight gauge\nrag_test_in_flight 1" in text
+
+
+def test_worker_traces_are_replayed_into_the_parent():
+    def work(pages):
+        with stage("replay_check_parse"):
+            count("replay_check_pages", pages)
+        return "parsed"
+
+    # What a pool worker returns
+    result, worker_trace = recorded(work, 3)
+    assert result == "parsed"
+    before = REGISTRY.counter("rag_replay_check_pages_total", "").value()
+
+    parent = Trace("ingest")
+    with tracing(parent), stage("ingest"):
+        replay(worker_trace)
+
+    assert [(s["stage"], s["depth"]) for s in parent.to_dict()["stages"]] == [
+        ("ingest", 0), ("replay_check_parse", 1)
+    ]
+    assert parent.counts == {"replay_check_pages": 3}
+    assert REGISTRY.counter("rag_replay_check_pages_total", "").value() == before + 3
+    # Once when recorded (in a worker, that registry is discarded) and once replayed
+    assert 'rag_stage_seconds_count{stage="replay_check_parse"} 2' in REGISTRY.render()
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
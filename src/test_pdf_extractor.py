@@ -0,0 +1,152 @@
+"""
+PDF extraction test - repeated headers/footers are detected and page text is cached
+"""
+import os
+import pickle
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import data_loader
+import pdf_extractor
+from chunker import ChunkingConfig
+from data_loader import DataLoader
+from pdf_extractor import PageCache, _repeated_margins, extract_pdf_pages, repeated_margins
+
+CHARS = ChunkingConfig(unit="chars", chunk_size=300, chunk_overlap=0)
+
+
+def test_repeated_margins_ignore_body_text():
+    pages = {
+        i: (800.0, [(10, 40, "ACME Handbook"), (100, 300, f"Body of page {i}"), (770, 790, f"Page {i + 1} of 9")])
+        for i in range(9)
+    }
+    pages[9] = (800.0, [])  # image-only page
+
+    assert _repeated_margins(pages) == {"acme handbook", "page # of #"}
+
+    # Too few pages to tell a running header from a title
+    assert _repeated_margins({0: pages[0], 1: pages[1]}) == set()
+
+
+def test_page_cache_serves_complete_ranges_only(tmp_path):
+    cache = PageCache(str(tmp_path))
+    assert cache.page_count("abc") is None
+
+    cache.put("abc", 3, {0: "first", 1: "", 2: "third"})
+    assert cache.page_count("abc") == 3
+    assert cache.get("abc", 0, 3) == {0: "first", 1: "", 2: "third"}
+    assert cache.get("abc", 2, 3) == {2: "third"}
+
+    # Reopening (e.g. in a worker process) sees the same entries
+    assert PageCache(str(tmp_path)).get("abc", 0, 2) == {0: "first", 1: ""}
+    assert PageCache(str(tmp_path)).get("other", 0, 1) is None
+
+    assert cache.get_margins("abc") is None
+    cache.put_margins("abc", frozenset({"acme handbook", "page # of #"}))
+    assert PageCache(str(tmp_path)).get_margins("abc") == {"acme handbook", "page # of #"}
+
+
+def write_handbook(path, pages=7):
+    import fitz
+
+    with fitz.open() as pdf:
+        for i in range(pages):
+            page = pdf.new_page(width=595, height=842)
+            page.insert_text((72, 30), "ACME Handbook")
+            page.insert_text((72, 400), f"Body text of page {i + 1}.")
+            page.insert_text((72, 825), f"Page {i + 1} of {pages}")
+        pdf.save(str(path))
+
+
+def test_page_ranges_extract_like_the_whole_file(tmp_path):
+    path = tmp_path / "handbook.pdf"
+    write_handbook(path)
+
+    total_pages, whole = extract_pdf_pages(path)
+    assert total_pages == 7
+    assert whole == {i: f"Body text of page {i + 1}." for i in range(7)}
+
+    # Parallel ingestion splits files into ranges; a short trailing range
+    # still loses its header and footer
+    ranges = {}
+    for start, stop in ((0, 3), (3, 6), (6, 7)):
+        ranges.update(extract_pdf_pages(path, start, stop)[1])
+    assert ranges == whole
+
+    # The same, with the margins of the whole file found once up front
+    repeated = repeated_margins(path)
+    assert repeated == {"acme handbook", "page # of #"}
+    ranges = {}
+    for start, stop in ((0, 3), (3, 6), (6, 7)):
+        ranges.update(extract_pdf_pages(path, start, stop, repeated=repeated)[1])
+    assert ranges == whole
+
+
+def test_split_pdf_margins_are_scanned_once(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    path = data_dir / "handbook.pdf"
+    write_handbook(path, pages=10)
+
+    scanned = []
+    margin_blocks = pdf_extractor._margin_blocks
+
+    def counting_margin_blocks(page, flags):
+        scanned.append(page.number)
+        return margin_blocks(page, flags)
+
+    monkeypatch.setattr(pdf_extractor, "_margin_blocks", counting_margin_blocks)
+
+    loader = DataLoader(str(data_dir), pages_per_task=3, page_cache_dir=str(tmp_path / "cache"), chunking=CHARS)
+    loader.workers = 2  # plan page ranges even on a single-core machine
+    tasks = loader._plan_tasks([path])
+    assert [pages for _, pages in tasks] == [(0, 3), (3, 6), (6, 9), (9, 10)]
+
+    # Each task carries its file's hash and margins; the loader a worker
+    # gets (pickled once per process) leaves the per-corpus caches behind
+    worker_loader = pickle.loads(pickle.dumps(loader))
+    assert worker_loader._file_hashes == {} and worker_loader._margins == {}
+    payloads = loader._payloads(tasks)
+    assert {(file_hash, repeated) for _, _, file_hash, repeated in payloads} == {
+        (loader._file_hash(path), frozenset({"acme handbook", "page # of #"}))
+    }
+
+    texts = [doc.page_content for payload in payloads for doc in worker_loader._load_task(*payload)]
+    assert texts == [f"Body text of page {i + 1}." for i in range(10)]
+    assert sorted(scanned) == list(range(10))
+
+    # A later plan of the same file takes the margins from the page cache
+    scanned.clear()
+    reopened = DataLoader(str(data_dir), pages_per_task=3, page_cache_dir=str(tmp_path / "cache"), chunking=CHARS)
+    reopened._plan_margins(path)
+    assert scanned == []
+
+
+def test_known_hashes_are_not_recomputed(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    path = data_dir / "handbook.pdf"
+    write_handbook(path, pages=10)
+
+    hashed = []
+    monkeypatch.setattr(data_loader, "file_sha256", lambda file_path: hashed.append(file_path) or "unused")
+
+    loader = DataLoader(str(data_dir), pages_per_task=3, page_cache_dir=str(tmp_path / "cache"), chunking=CHARS)
+    loader.workers = 2
+    # As the ingestion manifest's diff passes them on
+    loader.remember_hashes({path: "a" * 64})
+    payloads = loader._payloads(loader._plan_tasks([path]))
+    assert [file_hash for _, _, file_hash, _ in payloads] == ["a" * 64] * 4
+
+    for payload in payloads:
+        pickle.loads(pickle.dumps(loader))._load_task(*payload)
+    assert hashed == []
+    assert loader.page_cache.page_count("a" * 64) == 10
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
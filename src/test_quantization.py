@@ -0,0 +1,133 @@
+"""
+Quantized storage test - rescoring from the float32 side file restores exact results
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import index_versions
+import vector_store
+from chunker import ChunkingConfig
+from data_loader import DataLoader
+from manifest import IngestionManifest, MANIFEST_FILENAME
+from vector_store import FULL_VECTORS_FILE, VectorStore
+
+
+def make_documents(count: int):
+    return [
+        Document(page_content=f"chunk {i} on topic {i % 7}", metadata={"source": f"doc{i % 3}.txt", "chunk_id": f"c{i}"})
+        for i in range(count)
+    ]
+
+
+def test_binary_index_with_rescoring_matches_flat(tmp_path):
+    embedding = DeterministicFakeEmbedding(size=64)
+    documents = make_documents(60)
+    vectors = np.asarray(embedding.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+
+    flat = VectorStore(embedding_model=embedding, index_path=str(tmp_path / "flat"))
+    flat.build_index_from_vectors(documents, vectors)
+
+    binary = VectorStore(embedding_model=embedding, index_path=str(tmp_path / "binary"), index_type="binary")
+    binary.build_index_from_vectors(documents, vectors)
+    binary.delete_documents(["c0", "c1"])
+    flat.delete_documents(["c0", "c1"])
+    binary.add_documents(make_documents(62)[60:])
+    flat.add_documents(make_documents(62)[60:])
+    binary.save_index()
+
+    directory = index_versions.resolve(str(tmp_path / "binary"))
+    assert np.load(os.path.join(directory, FULL_VECTORS_FILE)).shape == (60, 64)
+
+    # Rescoring every row is exact, whatever the Hamming pre-search returned
+    served = VectorStore(embedding_model=embedding, index_path=str(tmp_path / "binary"), rescore=60)
+    served.load_index()
+    assert isinstance(served.full_vectors, np.memmap)
+
+    for query in ("topic 3", "chunk 42", "chunk 61 on topic 5"):
+        expected = [doc.metadata["chunk_id"] for doc in flat.similarity_search(query, k=5)]
+        assert [doc.metadata["chunk_id"] for doc in served.similarity_search(query, k=5)] == expected
+        filtered = served.similarity_search(query, k=5, filters={"source": "doc1.txt"})
+        assert all(doc.metadata["source"] == "doc1.txt" for doc in filtered) and len(filtered) == 5
+
+
+class ShiftedEmbedding(DeterministicFakeEmbedding):
+    """
+    Fake embeddings, moved far out of the usual range for "Outlier" texts.
+    """
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        vector = super().embed_query(text)
+        return [value + 10.0 for value in vector] if text.startswith("Outlier") else vector
+
+
+def write_file(data_dir, name, sentences=30, prefix="Sentence"):
+    (data_dir / f"{name}.txt").write_text(
+        " ".join(f"{prefix} {j} of {name}." for j in range(sentences)), encoding="utf-8"
+    )
+
+
+@pytest.mark.parametrize("index_type", ["flat_int8", "binary"])
+def test_trained_quantizers_retrain_only_past_drift_or_growth(tmp_path, monkeypatch, index_type):
+    trained = []
+    train_index = vector_store.train_index
+
+    def recording_train_index(index, vectors, **kwargs):
+        trained.append(len(vectors))
+        train_index(index, vectors, **kwargs)
+
+    monkeypatch.setattr(vector_store, "train_index", recording_train_index)
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for i in range(40):
+        write_file(data_dir, f"doc{i}")
+    loader = DataLoader(str(data_dir), chunking=ChunkingConfig(unit="chars", chunk_size=200, chunk_overlap=0))
+    root = str(tmp_path / "index")
+
+    def sync():
+        trained.clear()
+        store.sync_index(loader)
+        return list(trained)
+
+    store = VectorStore(embedding_model=ShiftedEmbedding(size=32), index_path=root, index_type=index_type)
+    # A new index trains once, on the chunks of every file
+    assert sync() == [len(store)]
+    base = len(store)
+
+    # A small file like the rest is encoded with the trained quantizer
+    write_file(data_dir, "extra0")
+    assert sync() == []
+    added = len(store) - base
+    assert store.full_vectors.shape == (len(store), 32)
+    quantizer = IngestionManifest(os.path.join(index_versions.resolve(root), MANIFEST_FILENAME)).quantizer
+    assert quantizer == {"trained_rows": base, "added_rows": added}
+
+    # Rows outside the trained statistics retrain the whole index
+    write_file(data_dir, "outlier", sentences=90, prefix="Outlier")
+    assert sync() == [len(store)]
+    assert len(store) - base < vector_store.RETRAIN_GROWTH * base  # not the growth threshold
+    retrained = len(store)
+
+    # So do rows accumulating past RETRAIN_GROWTH of the rows trained on, across syncs
+    monkeypatch.setattr(vector_store, "RETRAIN_GROWTH", 1.5 * added / retrained)
+    write_file(data_dir, "extra1")
+    assert sync() == []
+    write_file(data_dir, "extra2")
+    # Reopened, the counts come from the published manifest
+    store = VectorStore(embedding_model=ShiftedEmbedding(size=32), index_path=root, index_type=index_type)
+    assert sync() == [len(store)]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
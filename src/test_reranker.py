@@ -0,0 +1,85 @@
+"""
+Reranker test - cross-encoder scores reorder candidates, and the latency budget falls back to retrieval order
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from langchain_core.documents import Document
+
+import reranker
+from reranker import CrossEncoderReranker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubModel:
+    """
+    Scores a pair by the number in its text, taking the given number of
+    milliseconds of (fake) time per batch.
+    """
+
+    def __init__(self, clock, batch_ms):
+        self.clock = clock
+        self.batch_ms = list(batch_ms)
+        self.batches = 0
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.clock.now += self.batch_ms[self.batches] / 1000
+        self.batches += 1
+        return [float(text.split()[-1]) for _, text in pairs]
+
+
+def make_documents(scores):
+    return [Document(page_content=f"chunk scored {score}") for score in scores]
+
+
+def make_reranker(monkeypatch, batch_ms, budget_ms):
+    clock = Clock()
+    monkeypatch.setattr(reranker, "perf_counter", clock)
+    model = StubModel(clock, batch_ms)
+    return CrossEncoderReranker(batch_size=2, budget_ms=budget_ms, model=model), model
+
+
+def test_rerank_orders_by_score(monkeypatch):
+    rerank, model = make_reranker(monkeypatch, batch_ms=[10, 10, 10], budget_ms=300)
+    documents = make_documents([1, 5, 3, 4, 2])
+
+    assert rerank.rerank("q", documents, k=3) == [documents[1], documents[3], documents[2]]
+    assert model.batches == 3
+    assert rerank.stats()["reranked"] == 1
+
+
+def test_budget_exceeded_returns_retrieval_order(monkeypatch):
+    rerank, model = make_reranker(monkeypatch, batch_ms=[100, 100, 100], budget_ms=150)
+    documents = make_documents([1, 5, 3, 4, 2, 6])
+
+    # After one 100 ms batch, a second would end past the budget
+    assert rerank.rerank("q", documents, k=2) == documents[:2]
+    assert model.batches == 1
+    stats = rerank.stats()
+    assert (stats["reranked"], stats["fallbacks"]) == (0, 1)
+    assert stats["avg_ms"] == pytest.approx(100)
+
+
+def test_scores_are_used_when_the_last_batch_runs_over(monkeypatch):
+    rerank, model = make_reranker(monkeypatch, batch_ms=[100, 200], budget_ms=220)
+    documents = make_documents([1, 5, 3, 4])
+
+    # The second batch was expected to fit but took 300 ms in total
+    assert rerank.rerank("q", documents, k=2) == [documents[1], documents[3]]
+    assert model.batches == 2
+    assert rerank.stats()["fallbacks"] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
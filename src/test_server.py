@@ -0,0 +1,92 @@
+"""
+HTTP server test - request round trip, backpressure and timeouts
+"""
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import TimeoutError
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from search import SearchEngine
+from server import PoolFull, RAGHTTPServer, RAGService, WorkerPool
+from test_answer_cache import FakeVectorStore
+
+
+def post(url: str, payload: dict):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, json.loads(response.read())
+
+
+def test_ask_and_search_round_trip():
+    engine = SearchEngine(FakeVectorStore(), llm=FakeListChatModel(responses=["served answer"]))
+    service = RAGService(engine, new_vector_store=None, loader=None, pool=WorkerPool(workers=2, queue_size=2))
+    server = RAGHTTPServer(("127.0.0.1", 0), service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        assert post(f"{url}/ask", {"question": "What is assessed?", "k": 2}) == (200, {"answer": "served answer"})
+
+        status, body = post(f"{url}/search", {"query": "grading", "k": 1})
+        assert status == 200
+        assert body["results"][0]["metadata"]["chunk_id"] == "a"
+
+        for payload in (
+            {"k": 2},
+            {"question": "What is assessed?", "k": "two"},
+            {"question": "", "k": 2},
+            {"question": "What is assessed?", "filters": {"author": "x"}},
+            {"question": "What is assessed?", "filters": {"page": "3"}},
+            {"question": "What is assessed?", "filters": {"page": [1, 2, 3]}},
+            {"question": "What is assessed?", "filters": {"source": 7}},
+            {"question": "What is assessed?", "filters": {"file_type": ["pdf", None]}},
+            {"question": "What is assessed?", "filters": {"ingested_after": "yesterday"}},
+        ):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                post(f"{url}/ask", payload)
+            assert error.value.code == 400
+
+        # A KeyError from inside the pipeline is the server's fault, not the client's
+        def missing_chunk(*args, **kwargs):
+            raise KeyError("chunk-42")
+
+        engine.retrieve = missing_chunk
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(f"{url}/search", {"query": "grading", "k": 1})
+        assert error.value.code == 500
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.pool.shutdown()
+
+
+def test_pool_rejects_when_full_and_times_out():
+    pool = WorkerPool(workers=1, queue_size=0)
+    release = threading.Event()
+
+    with pytest.raises(TimeoutError):
+        pool.run(release.wait, timeout=0.05)
+
+    # The timed-out job still holds the only worker slot
+    with pytest.raises(PoolFull):
+        pool.run(lambda: None)
+
+    release.set()
+    pool.shutdown()
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["timeouts"] == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,107 @@
+"""
+Sharded store test - fan-out search matches a single index over the same files
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from chunker import LEGACY_CHUNKING
+from data_loader import DataLoader
+from sharded_store import ShardedVectorStore, shard_of
+from vector_store import VectorStore
+
+
+def write_documents(data_dir):
+    data_dir.mkdir()
+    for i in range(8):
+        (data_dir / f"doc{i}.txt").write_text(
+            "\n\n".join(f"Document {i} paragraph {j} about topic {(i * j) % 5}." for j in range(6)),
+            encoding="utf-8"
+        )
+
+
+def test_sharded_search_matches_single_index(tmp_path):
+    write_documents(tmp_path / "data")
+    # Character-sized, so the test needs no tokenizer download
+    loader = DataLoader(str(tmp_path / "data"), chunking=LEGACY_CHUNKING)
+    embedding = DeterministicFakeEmbedding(size=32)
+
+    single = VectorStore(embedding_model=embedding, index_path=str(tmp_path / "single"))
+    single.sync_index(loader)
+
+    sharded = ShardedVectorStore(
+        embedding, index_path=str(tmp_path / "sharded"), num_shards=3,
+        ingest_processes=False, embedding_cache_dir=None
+    )
+    stats = sharded.sync_index(loader)
+
+    assert stats["files_modified"] == 8
+    assert len(sharded) == len(single)
+    assert sorted(sharded.sources()) == sorted(single.sources())
+
+    # Every chunk sits in the shard its source hashes to
+    for i, shard in enumerate(sharded.shards):
+        for source in shard.sources():
+            assert shard_of(loader.source_key(loader.data_dir / os.path.basename(source)), 3) == i
+
+    for query in ("topic 3", "Document 5 paragraph 2", "paragraph 4"):
+        expected = [doc.metadata["chunk_id"] for doc in single.similarity_search(query, k=5)]
+        assert [doc.metadata["chunk_id"] for doc in sharded.similarity_search(query, k=5)] == expected
+        assert [doc.metadata["chunk_id"] for doc in sharded.similarity_search_batch([query], k=5)[0]] == expected
+
+    # A fresh store reopens the saved shards without re-ingesting
+    reopened = ShardedVectorStore(
+        embedding, index_path=str(tmp_path / "sharded"), num_shards=3, ingest_processes=False
+    )
+    assert reopened.open_index(loader) is None
+    assert len(reopened) == len(single)
+
+
+class FakePipeline:
+    """
+    Stands in for EmbeddingPipeline in the spawned ingest workers.
+    """
+
+    def __init__(self, size: int, **kwargs):
+        self.embedding_model = DeterministicFakeEmbedding(size=size)
+        self.cache = None
+
+
+def test_process_ingest_embeds_like_the_store(tmp_path):
+    write_documents(tmp_path / "data")
+    loader = DataLoader(str(tmp_path / "data"), chunking=LEGACY_CHUNKING)
+    embedding = DeterministicFakeEmbedding(size=32)
+
+    # Workers can't rebuild an arbitrary embedding model on their own
+    with pytest.raises(ValueError):
+        ShardedVectorStore(embedding, index_path=str(tmp_path / "x"), num_shards=2)
+
+    in_process = ShardedVectorStore(
+        embedding, index_path=str(tmp_path / "threads"), num_shards=2, ingest_processes=False
+    )
+    in_process.sync_index(loader)
+
+    spawned = ShardedVectorStore(
+        embedding, index_path=str(tmp_path / "processes"), num_shards=2, ingest_workers=2,
+        embedder_factory=FakePipeline, embedder_kwargs={"size": 32}
+    )
+    try:
+        stats = spawned.sync_index(loader)
+        assert stats["files_modified"] == 8
+        assert len(spawned) == len(in_process)
+
+        for query in ("topic 3", "Document 5 paragraph 2"):
+            expected = [doc.metadata["chunk_id"] for doc in in_process.similarity_search(query, k=5)]
+            assert [doc.metadata["chunk_id"] for doc in spawned.similarity_search(query, k=5)] == expected
+    finally:
+        spawned.close()
+        in_process.close()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
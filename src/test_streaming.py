@@ -0,0 +1,99 @@
+"""
+Streaming test - ask_stream against a fake local streaming LLM
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from answer_cache import SemanticAnswerCache
+import metrics
+from context_builder import ContextBuilder
+from metrics import Trace
+from search import SearchEngine
+from test_answer_cache import FakeVectorStore
+
+
+class CountingStreamLLM(FakeListChatModel):
+    streams: int = 0
+
+    def stream(self, *args, **kwargs):
+        self.streams += 1
+        return super().stream(*args, **kwargs)
+
+
+def test_tokens_arrive_incrementally_with_metrics(tmp_path):
+    # FakeListChatModel streams one character at a time, `sleep` seconds apart
+    llm = CountingStreamLLM(responses=["streamed answer"], sleep=0.01)
+    cache = SemanticAnswerCache(path=str(tmp_path / "answers.json"), threshold=0.9)
+    engine = SearchEngine(FakeVectorStore(), llm=llm, answer_cache=cache)
+
+    metrics = {}
+    tokens = list(engine.ask_stream("What is this document about?", k=2, metrics=metrics))
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == "streamed answer"
+    assert 0 < metrics["time_to_first_token"] < metrics["total"]
+    assert metrics["cached"] is False
+
+    # The completed answer was cached, so a repeat is served in one piece
+    metrics = {}
+    assert list(engine.ask_stream("What is this document about?", k=2, metrics=metrics)) == ["streamed answer"]
+    assert metrics["cached"] is True
+    assert llm.streams == 1
+
+
+def test_abandoned_stream_is_not_cached(tmp_path):
+    llm = CountingStreamLLM(responses=["partial answer", "full answer"])
+    cache = SemanticAnswerCache(path=str(tmp_path / "answers.json"), threshold=0.9)
+    engine = SearchEngine(FakeVectorStore(), llm=llm, answer_cache=cache)
+
+    stream = engine.ask_stream("What is this document about?", k=2)
+    next(stream)
+    stream.close()
+
+    assert len(cache) == 0
+    assert engine.ask("What is this document about?", k=2) == "full answer"
+
+
+def test_suspended_stream_leaves_the_callers_context_alone():
+    engine = SearchEngine(FakeVectorStore(), llm=CountingStreamLLM(responses=["partial answer"]))
+
+    trace = Trace("ask_stream")
+    stream = engine.ask_stream("What is this document about?", k=2, trace=trace)
+    next(stream)
+    # Between tokens the caller records into its own trace, not the stream's
+    assert metrics._current_trace.get() is None
+    stream.close()
+
+    assert any(name == "ask_stream" for name, _, _ in trace.stages)
+
+
+class WordTokenizer:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def test_stream_without_reported_usage_still_counts_tokens():
+    # FakeListChatModel streams chunks without usage_metadata
+    engine = SearchEngine(
+        FakeVectorStore(), llm=CountingStreamLLM(responses=["two words"]),
+        context_builder=ContextBuilder(max_tokens=500, tokenizer=WordTokenizer())
+    )
+
+    trace = Trace("ask_stream")
+    assert "".join(engine.ask_stream("What is this document about?", k=2, trace=trace)) == "two words"
+    assert trace.counts["prompt_tokens"] > 0
+    assert trace.counts["completion_tokens"] == 2
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
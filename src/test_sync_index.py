@@ -0,0 +1,141 @@
+"""
+Incremental sync test - only added, changed and removed files are (re)embedded; failed files keep their vectors
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+import index_versions
+from chunker import ChunkingConfig
+from data_loader import DataLoader
+from manifest import IngestionManifest, MANIFEST_FILENAME
+from vector_store import VectorStore
+
+
+class CountingEmbedding(Embeddings):
+    def __init__(self):
+        self.model = DeterministicFakeEmbedding(size=16)
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.model.embed_query(text)
+
+
+def write_file(data_dir, name, version=0):
+    (data_dir / name).write_text(
+        " ".join(f"Sentence {j} of {name}, revision {version}." for j in range(20)), encoding="utf-8"
+    )
+
+
+def chunk_sources(store: VectorStore):
+    return sorted({doc.metadata["source"] for _, doc in store._iter_stored_chunks()})
+
+
+def published_manifest(root: str) -> IngestionManifest:
+    return IngestionManifest(os.path.join(index_versions.resolve(root), MANIFEST_FILENAME))
+
+
+def setup(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ("a.txt", "b.txt", "c.txt"):
+        write_file(data_dir, name)
+
+    root = str(tmp_path / "index")
+    embedding = CountingEmbedding()
+    loader = DataLoader(str(data_dir), chunking=ChunkingConfig(unit="chars", chunk_size=200, chunk_overlap=0))
+    store = VectorStore(embedding_model=embedding, index_path=root)
+    stats = store.sync_index(loader)
+    assert stats["files_modified"] == 3 and stats["chunks_added"] == len(store) == len(embedding.embedded)
+    return data_dir, root, embedding, loader, store
+
+
+def test_unchanged_files_are_not_reembedded(tmp_path):
+    data_dir, root, embedding, loader, store = setup(tmp_path)
+    embedding.embedded.clear()
+
+    stats = store.sync_index(loader)
+    assert stats == {
+        "files_modified": 0, "files_failed": 0, "files_removed": 0, "chunks_added": 0, "chunks_deleted": 0
+    }
+    assert embedding.embedded == []
+    assert index_versions.list_versions(root) == ["v000001"]
+
+    # A fresh process picks the manifest up from the published version
+    reopened = VectorStore(embedding_model=embedding, index_path=root)
+    assert reopened.sync_index(loader)["files_modified"] == 0
+    assert embedding.embedded == []
+
+
+def test_modified_added_and_removed_files(tmp_path):
+    data_dir, root, embedding, loader, store = setup(tmp_path)
+    before = published_manifest(root)
+    embedding.embedded.clear()
+
+    write_file(data_dir, "b.txt", version=1)
+    write_file(data_dir, "d.txt")
+    os.remove(data_dir / "c.txt")
+    stats = store.sync_index(loader)
+
+    assert stats["files_modified"] == 2 and stats["files_removed"] == 1 and stats["files_failed"] == 0
+    # Only the new chunks of b.txt and d.txt were embedded
+    assert embedding.embedded and all("b.txt, revision 1" in text or "d.txt" in text for text in embedding.embedded)
+    assert stats["chunks_added"] == len(embedding.embedded)
+    assert stats["chunks_deleted"] == len(before.chunk_ids("b.txt")) + len(before.chunk_ids("c.txt"))
+    assert chunk_sources(store) == [str(data_dir / name) for name in ("a.txt", "b.txt", "d.txt")]
+
+    after = published_manifest(root)
+    assert sorted(after.files) == ["a.txt", "b.txt", "d.txt"]
+    assert after.files["a.txt"] == before.files["a.txt"]
+    assert after.files["b.txt"]["sha256"] != before.files["b.txt"]["sha256"]
+    assert sorted(chunk_id for source in after.files for chunk_id in after.chunk_ids(source)) == sorted(
+        store.vector_store.index_to_docstore_id.values()
+    )
+
+
+def test_failed_file_keeps_its_vectors_and_manifest_entry(tmp_path):
+    data_dir, root, embedding, loader, store = setup(tmp_path)
+    before = published_manifest(root)
+    size = len(store)
+
+    # Not valid UTF-8, so TextLoader fails on it
+    (data_dir / "b.txt").write_bytes(b"\xff\xfe broken \x80")
+    stats = store.sync_index(loader)
+
+    assert stats["files_failed"] == 1 and stats["files_modified"] == 0
+    assert [error.source for error in loader.errors] == ["b.txt"]
+    assert len(store) == size
+    assert str(data_dir / "b.txt") in chunk_sources(store)
+    assert published_manifest(root).files["b.txt"] == before.files["b.txt"]
+
+    # Retried on the next sync once the file is readable again
+    write_file(data_dir, "b.txt", version=1)
+    stats = store.sync_index(loader)
+    assert stats["files_modified"] == 1 and stats["files_failed"] == 0
+    assert published_manifest(root).files["b.txt"]["sha256"] != before.files["b.txt"]["sha256"]
+
+
+def test_touched_file_needs_no_reembedding(tmp_path):
+    data_dir, root, embedding, loader, store = setup(tmp_path)
+    embedding.embedded.clear()
+
+    stat = os.stat(data_dir / "a.txt")
+    os.utime(data_dir / "a.txt", (stat.st_atime, stat.st_mtime + 10))
+    stats = store.sync_index(loader)
+
+    assert stats["files_modified"] == 0 and stats["chunks_added"] == 0 and stats["chunks_deleted"] == 0
+    assert embedding.embedded == []
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,125 @@
+"""
+Incremental sync test - trained index types see the whole changeset, stale chunks are removed in one rebuild,
+and streamed (batched) builds match building from the whole list
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import vector_store
+from chunker import ChunkingConfig
+from data_loader import DataLoader
+from index_factory import reconstruct_all
+from vector_store import VectorStore
+
+CHARS = ChunkingConfig(unit="chars", chunk_size=300, chunk_overlap=0)
+
+
+def write_file(data_dir, i, version=0):
+    (data_dir / f"doc{i}.txt").write_text(
+        " ".join(f"Sentence {j} of document {i}, revision {version}." for j in range(40)), encoding="utf-8"
+    )
+
+
+def test_sync_trains_on_all_files_and_rebuilds_once(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for i in range(5):
+        write_file(data_dir, i)
+
+    trained, rebuilds = [], []
+    train_index = vector_store.train_index
+    rebuild_without = VectorStore._rebuild_without
+
+    def recording_train_index(index, vectors, **kwargs):
+        trained.append(len(vectors))
+        train_index(index, vectors, **kwargs)
+
+    def recording_rebuild_without(self, ids):
+        rebuilds.append(len(ids))
+        rebuild_without(self, ids)
+
+    monkeypatch.setattr(vector_store, "train_index", recording_train_index)
+    monkeypatch.setattr(VectorStore, "_rebuild_without", recording_rebuild_without)
+
+    loader = DataLoader(str(data_dir), chunking=CHARS)
+    store = VectorStore(
+        embedding_model=DeterministicFakeEmbedding(size=16), index_path=str(tmp_path / "index"), index_type="ivf_flat"
+    )
+    stats = store.sync_index(loader)
+
+    assert stats["files_modified"] == 5
+    # One training run, on the chunks of every file
+    assert trained == [stats["chunks_added"]] == [len(store)]
+    assert len(store.sources()) == 5
+
+    write_file(data_dir, 1, version=1)
+    write_file(data_dir, 2, version=1)
+    os.remove(data_dir / "doc3.txt")
+    stats = store.sync_index(loader)
+
+    assert stats["files_modified"] == 2 and stats["files_removed"] == 1
+    assert len(rebuilds) == 1
+    assert len(store.sources()) == 4
+    assert len(store.similarity_search("Sentence 3 of document 2, revision 1.", k=3)) == 3
+
+
+def index_contents(store: VectorStore):
+    index_to_id = store.vector_store.index_to_docstore_id
+    return [index_to_id[row] for row in range(len(index_to_id))], reconstruct_all(store.vector_store.index)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat"])
+def test_batched_build_matches_build_index(tmp_path, index_type):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for i in range(5):
+        write_file(data_dir, i)
+    documents = DataLoader(str(data_dir), chunking=CHARS).load_and_split_documents()
+
+    def new_store(name):
+        return VectorStore(
+            embedding_model=DeterministicFakeEmbedding(size=16), index_path=str(tmp_path / name),
+            index_type=index_type, index_params={"nlist": 4}
+        )
+
+    whole = new_store("whole")
+    whole.build_index(documents)
+    batched = new_store("batched")
+    batches = (documents[i:i + 7] for i in range(0, len(documents), 7))
+    assert batched.build_index_from_batches(batches) == len(documents)
+    # The same chunks through sync_index, which streams file by file
+    synced = new_store("synced")
+    assert synced.sync_index(DataLoader(str(data_dir), chunking=CHARS))["chunks_added"] == len(documents)
+
+    ids, vectors = index_contents(whole)
+    for store in (batched, synced):
+        store_ids, store_vectors = index_contents(store)
+        assert store_ids == ids
+        np.testing.assert_array_equal(store_vectors, vectors)
+
+
+def test_failed_batched_build_stops_the_producer(tmp_path):
+    closed = []
+
+    def batches():
+        try:
+            for _ in range(100):
+                yield [None]  # not a Document: add_documents fails
+        finally:
+            closed.append(True)
+
+    store = VectorStore(embedding_model=DeterministicFakeEmbedding(size=16), index_path=str(tmp_path / "index"))
+    with pytest.raises(AttributeError):
+        store.build_index_from_batches(batches(), prefetch=1)
+    assert closed == [True]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,92 @@
+"""
+VectorStore cache test - query embeddings and results are reused, and results are dropped whenever the index changes
+"""
+import os
+import sys
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from vector_store import VectorStore
+
+
+def make_documents(prefix, n):
+    return [
+        Document(page_content=f"{prefix} chunk {i}", metadata={"source": f"{prefix}.txt", "chunk_id": f"{prefix}{i}"})
+        for i in range(n)
+    ]
+
+
+def chunk_ids(documents):
+    return [doc.metadata["chunk_id"] for doc in documents]
+
+
+def make_store(tmp_path, documents):
+    store = VectorStore(embedding_model=DeterministicFakeEmbedding(size=16), index_path=str(tmp_path / "index"))
+    store.build_index(documents)
+    return store
+
+
+def test_repeated_queries_hit_the_caches(tmp_path):
+    store = make_store(tmp_path, make_documents("a", 5))
+
+    first = store.similarity_search("a chunk 1", k=2)
+    assert chunk_ids(store.similarity_search("a chunk 1", k=2)) == chunk_ids(first)
+    # Another k is another result, but the same query embedding
+    store.similarity_search("a chunk 1", k=3)
+
+    stats = store.cache_stats()
+    assert (stats["results"]["hits"], stats["results"]["misses"]) == (1, 2)
+    assert stats["results"]["hit_rate"] == 1 / 3
+    assert (stats["query_embeddings"]["hits"], stats["query_embeddings"]["misses"]) == (1, 1)
+    assert stats["query_embeddings"]["hit_rate"] == 0.5
+
+
+def test_build_index_invalidates_results(tmp_path):
+    store = make_store(tmp_path, make_documents("a", 5))
+    assert chunk_ids(store.similarity_search("b chunk 0", k=1)) != ["b0"]
+
+    store.build_index(make_documents("b", 5))
+    assert len(store.result_cache) == 0
+    assert chunk_ids(store.similarity_search("b chunk 0", k=1)) == ["b0"]
+
+
+def test_add_documents_invalidates_results(tmp_path):
+    store = make_store(tmp_path, make_documents("a", 5))
+    assert chunk_ids(store.similarity_search("b chunk 0", k=1)) != ["b0"]
+
+    store.add_documents(make_documents("b", 1))
+    assert len(store.result_cache) == 0
+    assert chunk_ids(store.similarity_search("b chunk 0", k=1)) == ["b0"]
+
+
+def test_delete_documents_invalidates_results(tmp_path):
+    store = make_store(tmp_path, make_documents("a", 5))
+    assert chunk_ids(store.similarity_search("a chunk 2", k=1)) == ["a2"]
+
+    store.delete_documents(["a2"])
+    assert len(store.result_cache) == 0
+    assert chunk_ids(store.similarity_search("a chunk 2", k=1)) != ["a2"]
+
+
+def test_swap_invalidates_results_but_keeps_query_embeddings(tmp_path):
+    store = make_store(tmp_path, make_documents("a", 5))
+    store.save_index()
+    assert chunk_ids(store.similarity_search("b chunk 3", k=1)) != ["b3"]
+
+    # Another process publishes a new version of the same index
+    make_store(tmp_path, make_documents("b", 5)).save_index()
+    assert store.reload_if_changed()
+
+    assert len(store.result_cache) == 0
+    assert chunk_ids(store.similarity_search("b chunk 3", k=1)) == ["b3"]
+    assert store.cache_stats()["query_embeddings"]["hits"] == 1
+
+
+if __name__ == "__main__":
+    import pytest
+
+    sys.exit(pytest.main([__file__, "-q"]))
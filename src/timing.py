@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import List, Tuple
+
+
+class StartupTimer:
+    """
+    Records wall-clock durations of named startup phases
+    (imports, model load, index load, first query, ...).
+    """
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+
+    def has(self, name: str) -> bool:
+        return any(phase == name for phase, _ in self.phases)
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Times the enclosed block as a named phase.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start)
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self) -> str:
+        """
+        Formats the recorded phases as a small table.
+        """
+        width = max([len(name) for name, _ in self.phases] + [len("total")])
+        lines = ["Startup timing:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<{width}}  {seconds * 1000:9.1f} ms")
+        lines.append(f"  {'total':<{width}}  {self.total * 1000:9.1f} ms")
+        return "\n".join(lines)
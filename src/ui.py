@@ -1,42 +1,50 @@
 import os
+from time import perf_counter
+
+_IMPORT_START = perf_counter()
+
 import streamlit as st
 from dotenv import load_dotenv
 
-from data_loader import DataLoader
-from embedding import EmbeddingPipeline
-from vector_store import VectorStore
-from search import SearchEngine
+from pipeline import build_pipeline
+from timing import StartupTimer
+from metrics import Trace
+
+_IMPORT_SECONDS = perf_counter() - _IMPORT_START
 
 
 @st.cache_resource
 def initialize_rag():
+    timer = StartupTimer()
+    timer.record("imports", _IMPORT_SECONDS)
+
     load_dotenv()
 
     # Use correct path relative to src folder
     data_path = os.path.join(os.path.dirname(__file__), "..", "data")
     index_path = os.path.join(os.path.dirname(__file__), "..", "faiss_index")
 
-    # Load & chunk documents
-    loader = DataLoader(data_path)
-    documents = loader.load_and_split_documents()
-
-    # Embeddings
-    embedder = EmbeddingPipeline()
+    # Documents are only parsed if the index is missing or a refresh is
+    # requested; index versions published by re-ingestion are hot-swapped in
+    search_engine = build_pipeline(data_path, index_path, timer=timer, watch=True).search_engine
+    return search_engine, timer
 
-    # Vector store
-    vector_store = VectorStore(
-        embedding_model=embedder.embedding_model,
-        index_path=index_path
-    )
 
-    if os.path.exists(index_path):
-        vector_store.load_index()
+def render_message(role: str, content: str, container=st):
+    if role == "user":
+        container.markdown(f"""
+        <div class="user-message">
+            <div class="avatar user-avatar">👤</div>
+            <div class="message-content">{content}</div>
+        </div>
+        """, unsafe_allow_html=True)
     else:
-        vector_store.build_index(documents)
-        vector_store.save_index()
-
-    # Search engine
-    return SearchEngine(vector_store)
+        container.markdown(f"""
+        <div class="assistant-message">
+            <div class="avatar bot-avatar">🤖</div>
+            <div class="message-content">{content}</div>
+        </div>
+        """, unsafe_allow_html=True)
 
 
 def main():
@@ -232,9 +240,55 @@ def main():
 
     # Initialize RAG
     with st.spinner("🚀 Initializing RAG system..."):
-        search_engine = initialize_rag()
+        search_engine, startup_timer = initialize_rag()
         st.session_state.rag_initialized = True
 
+    with st.sidebar:
+        # Dense-only is always available; hybrid needs the BM25 index
+        if search_engine.vector_store.lexical:
+            retrieval_mode = st.radio("Retrieval", ["hybrid", "dense"], horizontal=True)
+        else:
+            retrieval_mode = "dense"
+
+        # Empty selection searches every document
+        selected_sources = st.multiselect(
+            "Documents",
+            search_engine.vector_store.sources(),
+            format_func=os.path.basename
+        )
+        filters = {"source": selected_sources} if selected_sources else None
+
+        last_metrics = st.session_state.get("last_metrics")
+        if last_metrics:
+            st.caption(
+                f"Last answer: first token {last_metrics['time_to_first_token'] * 1000:.0f} ms, "
+                f"total {last_metrics['total'] * 1000:.0f} ms"
+            )
+
+        last_trace = st.session_state.get("last_trace")
+        if last_trace is not None:
+            with st.expander("🔎 Last request stages"):
+                st.code(last_trace.report(), language=None)
+
+        with st.expander("⏱️ Startup timing"):
+            st.code(startup_timer.report(), language=None)
+
+        cache_stats = search_engine.cache_stats()
+        st.caption(
+            f"Retrieval cache: {cache_stats['results']['hits']} hits / "
+            f"{cache_stats['results']['misses']} misses ({cache_stats['results']['hit_rate']:.0%})"
+        )
+        if "answers" in cache_stats:
+            st.caption(
+                f"Answer cache: {cache_stats['answers']['hits']} LLM calls saved "
+                f"({cache_stats['answers']['hit_rate']:.0%})"
+            )
+        if "rerank" in cache_stats:
+            st.caption(
+                f"Reranker: {cache_stats['rerank']['reranked']} reranked, "
+                f"{cache_stats['rerank']['fallbacks']} over budget ({cache_stats['rerank']['avg_ms']:.0f} ms avg)"
+            )
+
     # Main chat area
     if not st.session_state.messages:
         # Welcome screen
@@ -261,20 +315,7 @@ def main():
     
     # Display chat history
     for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f"""
-            <div class="user-message">
-                <div class="avatar user-avatar">👤</div>
-                <div class="message-content">{message["content"]}</div>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="assistant-message">
-                <div class="avatar bot-avatar">🤖</div>
-                <div class="message-content">{message["content"]}</div>
-            </div>
-            """, unsafe_allow_html=True)
+        render_message(message["role"], message["content"])
 
     # Chat input
     st.markdown("---")
@@ -297,16 +338,31 @@ def main():
         # Add user message
         st.session_state.messages.append({"role": "user", "content": user_input})
         
-        # Get AI response
-        with st.spinner("🔍 Searching documents and generating answer..."):
-            try:
-                answer = search_engine.ask(user_input, k=num_chunks)
-                st.session_state.messages.append({"role": "assistant", "content": answer})
-            except Exception as e:
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": f"❌ Error: {str(e)}"
-                })
+        render_message("user", user_input)
+
+        # Stream the AI response into a placeholder as tokens arrive
+        placeholder = st.empty()
+        placeholder.markdown("🔍 Searching documents...")
+        metrics = {}
+        try:
+            answer = ""
+            trace = Trace("ask")
+            st.session_state.last_trace = trace
+            for token in search_engine.ask_stream(
+                user_input, k=num_chunks, mode=retrieval_mode, metrics=metrics, trace=trace, filters=filters
+            ):
+                answer += token
+                render_message("assistant", answer + " ▌", placeholder)
+
+            if not startup_timer.has("first query"):
+                startup_timer.record("first query", metrics["total"])
+            st.session_state.messages.append({"role": "assistant", "content": answer})
+            st.session_state.last_metrics = metrics
+        except Exception as e:
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": f"❌ Error: {str(e)}"
+            })
         
         st.rerun()
 
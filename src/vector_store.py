@@ -1,7 +1,117 @@
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
 from langchain_core.documents import Document
-from typing import List
+from contextlib import closing
+from contextvars import copy_context
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 import os
+import queue
+import threading
+
+import numpy as np
+
+import index_versions
+from chunk_store import CHUNK_STORES, RowIdMap
+from index_factory import (
+    EXACT_SELECTION_FRACTION, INDEX_TYPES, QUANTIZED_TYPES, RETRAIN_DRIFT, RETRAIN_GROWTH,
+    TRAINED_QUANTIZED_TYPES, create_index, index_type_of, quantizer_drift, reconstruct_all, rescore_exact,
+    search_rows_exact, selector_search_params, set_search_params, supports_remove, train_index
+)
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from metadata_index import MetadataIndex, freeze_filters
+from lru_cache import LRUCache
+from manifest import FILE_STATS_FILENAME, IngestionManifest, MANIFEST_FILENAME, saved_chunking
+from metrics import count, profiled, stage
+
+
+STORAGE_FORMATS = ("pickle", "mmap", "sqlite")
+
+# Float32 copy of the vectors of a quantized index, in row order, for rescoring
+FULL_VECTORS_FILE = "vectors.npy"
+
+
+def _prefetch(iterable: Iterable, depth: int) -> Iterator:
+    """
+    Consumes `iterable` on a background thread, keeping at most `depth`
+    items buffered. Producer exceptions are re-raised in the consumer.
+    If the consumer stops early, the producer stops too and `iterable` is
+    closed (shutting down e.g. the process pool behind load_files).
+    """
+    if depth <= 0:
+        yield from iterable
+        return
+
+    source = iter(iterable)
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        # Polls so a full buffer nobody reads anymore can't block forever
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in source:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(e)
+            return
+        put(done)
+
+    # In a copy of the caller's context, so its stages land in the same trace
+    producer = threading.Thread(target=copy_context().run, args=(produce,), daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # The generator can only be closed once the producer left it
+        producer.join()
+        close = getattr(source, "close", None)
+        if close is not None:
+            close()
+
+
+class _Snapshot(NamedTuple):
+    """
+    The parts of the served index a search reads, taken together under the
+    swap lock so a hot swap cannot mix two versions. `metadata_index` is
+    None until it has been built for this version.
+    """
+    store: Optional[FAISS]
+    lexical_index: Optional[BM25Index]
+    full_vectors: Optional[np.ndarray]
+    metadata_index: Optional[MetadataIndex]
+    version: int
+
+
+def refresh_requested() -> bool:
+    """
+    Whether startup should rescan the data directory for changed files
+    instead of just loading the persisted index (RAG_REFRESH_INDEX).
+    """
+    return os.getenv("RAG_REFRESH_INDEX", "false").lower() in ("1", "true", "yes")
+
+
+def _chunk_ids(documents: List[Document]):
+    ids = [doc.metadata.get("chunk_id") for doc in documents]
+    return ids if all(ids) else None
 
 
 class VectorStore:
@@ -9,47 +119,980 @@ class VectorStore:
     Handles vector storage, persistence, and similarity search using FAISS.
     """
 
-    def __init__(self, embedding_model, index_path: str = "faiss_index"):
+    def __init__(self, embedding_model, index_path: str = "faiss_index",
+                 index_type: str = "flat", index_params: Optional[dict] = None,
+                 train_size: int = 50_000, nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None, storage: str = "pickle",
+                 lexical: bool = False, rescore: int = 0,
+                 query_cache_size: int = 1024, result_cache_size: int = 256,
+                 result_cache_ttl: Optional[float] = 600.0, keep_versions: int = 3):
         self.embedding_model = embedding_model
         self.index_path = index_path
         self.vector_store = None
 
+        # Index type used when building (see index_factory.INDEX_TYPES);
+        # loaded indexes keep whatever type they were saved with
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}'. Choose from {', '.join(INDEX_TYPES)}.")
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.train_size = train_size
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+        # Quantized types (index_factory.QUANTIZED_TYPES) keep a float32 copy
+        # of their vectors, saved as vectors.npy and memory-mapped on load.
+        # With rescore > 0, searches fetch rescore * k candidates from the
+        # compressed index and re-rank them by exact distance.
+        self.rescore = rescore
+        self.full_vectors: Optional[np.ndarray] = None
+        self._pending_vectors: List[np.ndarray] = []
+
+        # On-disk format of the chunks: "pickle" (LangChain's index.pkl),
+        # "mmap" (memory-mapped chunk store) or "sqlite" (indexed SQLite
+        # chunk store). Both chunk stores are read lazily, never unpickled.
+        if storage not in STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage '{storage}'. Choose from {', '.join(STORAGE_FORMATS)}.")
+        self.storage = storage
+
+        # Optional BM25 index over the same chunks, for hybrid retrieval
+        self.lexical = lexical
+        self.lexical_index: Optional[BM25Index] = None
+
+        # Query embeddings only depend on the model; (query, k) results are
+        # tied to the index and dropped whenever it changes
+        self.version = 0
+        self.query_cache = LRUCache(maxsize=query_cache_size)
+        self.result_cache = LRUCache(maxsize=result_cache_size, ttl=result_cache_ttl)
+
+        # Each save is published as a new version under index_path; the
+        # watcher swaps newly published versions in (see reload_if_changed)
+        self.keep_versions = keep_versions
+        self.loaded_version: Optional[str] = None
+        self.reload_error: Optional[str] = None
+        self._swap_lock = threading.Lock()
+
+        # Row-aligned metadata for filtered search, valid for one index version
+        self._metadata_index: Optional[MetadataIndex] = None
+        self._metadata_version = -1
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+
+    def _invalidate(self):
+        self.version += 1
+        self.result_cache.clear()
+
+    def cache_stats(self) -> Dict[str, dict]:
+        return {
+            "query_embeddings": self.query_cache.stats(),
+            "results": self.result_cache.stats(),
+        }
+
+    def __len__(self) -> int:
+        return self.vector_store.index.ntotal if self.vector_store is not None else 0
+
+    def sources(self) -> List[str]:
+        """
+        Sources of the indexed chunks, in first-seen order.
+        """
+        return self.metadata_index().sources if self.vector_store is not None else []
+
     def build_index(self, documents: List[Document]):
         """
         Creates a FAISS index from documents and embeddings.
         """
+        if self.index_type != "flat":
+            vectors = self.embedding_model.embed_documents([doc.page_content for doc in documents])
+            self.build_index_from_vectors(documents, vectors)
+            return
+
         self.vector_store = FAISS.from_documents(
             documents=documents,
-            embedding=self.embedding_model
+            embedding=self.embedding_model,
+            ids=_chunk_ids(documents)
+        )
+        self.full_vectors = None
+        self._pending_vectors = []
+        self._rebuild_lexical_index()
+        self._invalidate()
+
+    def build_index_from_vectors(self, documents: List[Document], vectors):
+        """
+        Creates an index of the configured type from precomputed vectors,
+        training IVF/PQ indexes on a sample of up to `train_size` vectors.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+        index = create_index(self.index_type, vectors.shape[1], len(vectors), **self.index_params)
+        train_index(index, vectors, sample_size=self.train_size)
+
+        vector_store = FAISS(
+            embedding_function=self.embedding_model,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={}
+        )
+        vector_store.add_embeddings(
+            zip([doc.page_content for doc in documents], vectors),
+            metadatas=[doc.metadata for doc in documents],
+            ids=_chunk_ids(documents)
+        )
+
+        self.vector_store = vector_store
+        self.full_vectors = vectors if self.index_type in QUANTIZED_TYPES else None
+        self._pending_vectors = []
+        self._apply_search_params()
+        self._rebuild_lexical_index()
+        self._invalidate()
+
+    def _retrain_quantized(self):
+        """
+        Re-trains an int8/binary index on every stored vector and re-encodes
+        it from the float32 copy (nothing is re-embedded), so rows added
+        after it was built are not clipped to, or thresholded on, statistics
+        of the earlier rows. Row order, and with it the docstore mapping, is
+        unchanged.
+        """
+        vectors = np.ascontiguousarray(self._full_vectors(), dtype=np.float32)
+        index = create_index(
+            index_type_of(self.vector_store.index), vectors.shape[1], len(vectors), **self.index_params
+        )
+        train_index(index, vectors, sample_size=self.train_size)
+        index.add(vectors)
+
+        self.vector_store.index = index
+        self._invalidate()
+
+    def _update_quantizer(self, manifest: IngestionManifest, new_vectors: Optional[np.ndarray]):
+        """
+        Keeps the trained statistics of an int8/binary index current after a
+        sync. The new rows were already encoded with the trained quantizer;
+        the whole index is only retrained once the rows added since its
+        training exceed RETRAIN_GROWTH of the rows it was trained on, or the
+        new rows drift past RETRAIN_DRIFT (see quantizer_drift). The counts
+        are kept in the manifest. `new_vectors` is None for a new index.
+        """
+        if self.full_vectors is None or index_type_of(self.vector_store.index) not in TRAINED_QUANTIZED_TYPES:
+            manifest.quantizer = None
+            return
+
+        if new_vectors is None:
+            # Trained on the first `train_size` chunks; the rest were added
+            trained_rows = min(len(self), self.train_size)
+            manifest.quantizer = {"trained_rows": trained_rows, "added_rows": len(self) - trained_rows}
+            return
+        if not len(new_vectors):
+            return
+
+        # Indexes saved before the counts were kept were trained on every earlier row
+        state = manifest.quantizer or {"trained_rows": len(self) - len(new_vectors), "added_rows": 0}
+        added_rows = state["added_rows"] + len(new_vectors)
+
+        if (
+            added_rows > RETRAIN_GROWTH * state["trained_rows"]
+            or quantizer_drift(self.vector_store.index, new_vectors) > RETRAIN_DRIFT
+        ):
+            with stage("retrain_index"):
+                self._retrain_quantized()
+            manifest.quantizer = {"trained_rows": len(self), "added_rows": 0}
+        else:
+            manifest.quantizer = {"trained_rows": state["trained_rows"], "added_rows": added_rows}
+
+    def _full_vectors(self) -> Optional[np.ndarray]:
+        """
+        The float32 copy of the vectors, with rows added since the last
+        call appended (done lazily so ingestion doesn't copy per file).
+        """
+        if self._pending_vectors:
+            self.full_vectors = np.vstack([self.full_vectors, *self._pending_vectors])
+            self._pending_vectors = []
+        return self.full_vectors
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        Sets query-time knobs: IVF `nprobe` and HNSW `efSearch`.
+        """
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self._apply_search_params()
+        self._invalidate()
+
+    def _apply_search_params(self):
+        if self.vector_store is not None:
+            set_search_params(self.vector_store.index, nprobe=self.nprobe, ef_search=self.ef_search)
+
+    def add_documents(self, documents: List[Document]):
+        """
+        Embeds and appends documents to the index, skipping chunk IDs
+        that are already present.
+        """
+        if self.vector_store is None:
+            self.build_index(documents)
+            return
+
+        self._ensure_mutable()
+        documents = [
+            doc for doc in documents
+            if not self._has_chunk(doc.metadata.get("chunk_id"))
+        ]
+        if documents:
+            ids = _chunk_ids(documents)
+            if self.full_vectors is not None:
+                # Embedded here so the float32 copy stays row-aligned
+                texts = [doc.page_content for doc in documents]
+                vectors = np.asarray(self.embedding_model.embed_documents(texts), dtype=np.float32)
+                self.vector_store.add_embeddings(
+                    zip(texts, vectors), metadatas=[doc.metadata for doc in documents], ids=ids
+                )
+                self._pending_vectors.append(vectors)
+            else:
+                self.vector_store.add_documents(documents, ids=ids)
+
+            if self.lexical_index is not None:
+                if ids is None:
+                    self._rebuild_lexical_index()
+                else:
+                    self.lexical_index.add(ids, [doc.page_content for doc in documents])
+            self._invalidate()
+
+    def build_index_from_batches(self, batches: Iterable[List[Document]], prefetch: int = 2) -> int:
+        """
+        Builds the index from a stream of chunk batches; see `add_batches`.
+        Returns the number of chunks indexed.
+        """
+        self.vector_store = None
+        return self.add_batches(batches, prefetch)
+
+    def add_batches(self, batches: Iterable[List[Document]], prefetch: int = 2) -> int:
+        """
+        Embeds and adds a stream of chunk batches, so only a few batches are
+        held in memory at a time. A background thread produces up to
+        `prefetch` batches ahead (e.g. parses the next files) while the
+        current one is being embedded.
+
+        Returns the number of chunks added.
+        """
+        total = 0
+        pending: List[Document] = []
+
+        # Closed explicitly so a failing add_documents stops the producer now
+        with closing(_prefetch(batches, prefetch)) as prefetched:
+            for batch in prefetched:
+                if not batch:
+                    continue
+                if self.vector_store is None and self.index_type != "flat":
+                    # IVF/PQ/HNSW are built (and trained) from the first
+                    # `train_size` chunks, then grow batch by batch
+                    pending.extend(batch)
+                    if len(pending) < self.train_size:
+                        continue
+                    batch, pending = pending, []
+
+                with stage("embed_and_add"):
+                    self.add_documents(batch)
+                total += len(batch)
+
+        if pending:
+            with stage("embed_and_add"):
+                self.add_documents(pending)
+            total += len(pending)
+
+        return total
+
+    def _has_chunk(self, chunk_id: Optional[str]) -> bool:
+        if chunk_id is None:
+            return False
+        return isinstance(self.vector_store.docstore.search(chunk_id), Document)
+
+    def delete_documents(self, ids: List[str]):
+        """
+        Removes the vectors and chunks with the given IDs from the index.
+        """
+        if self.vector_store is None:
+            return
+
+        ids = [i for i in ids if self._has_chunk(i)]
+        if not ids:
+            return
+
+        if self.lexical_index is not None:
+            self.lexical_index.remove(ids)
+
+        self._ensure_mutable()
+        if supports_remove(self.vector_store.index):
+            if self.full_vectors is not None:
+                removed = set(ids)
+                rows = [row for row, doc_id in self.vector_store.index_to_docstore_id.items() if doc_id in removed]
+                self.full_vectors = np.delete(self._full_vectors(), rows, axis=0)
+            self.vector_store.delete(ids)
+            self._invalidate()
+        else:
+            self._rebuild_without(ids)
+
+    def _rebuild_without(self, ids: List[str]):
+        """
+        Removes `ids` from index types that cannot delete in place (IVF,
+        HNSW) by re-adding the remaining stored vectors to the reset index.
+        Training is kept and nothing is re-embedded.
+        """
+        store = self.vector_store
+        removed = set(ids)
+        kept = [
+            (position, doc_id)
+            for position, doc_id in sorted(store.index_to_docstore_id.items())
+            if doc_id not in removed
+        ]
+
+        vectors = reconstruct_all(store.index)[[position for position, _ in kept]]
+        store.index.reset()
+        if kept:
+            store.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+        store.docstore.delete(list(removed))
+        store.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(kept)}
+        self._invalidate()
+
+    def _iter_stored_chunks(self, store: Optional[FAISS] = None) -> Iterator[tuple]:
+        """
+        Yields (chunk_id, document) for every vector, in row order.
+        """
+        store = store if store is not None else self.vector_store
+        for row in range(store.index.ntotal):
+            chunk_id = store.index_to_docstore_id[row]
+            yield chunk_id, store.docstore.search(chunk_id)
+
+    def _rebuild_lexical_index(self):
+        """
+        Re-indexes every stored chunk for BM25 (when lexical=True).
+        """
+        if not self.lexical or self.vector_store is None:
+            return
+        self.lexical_index = self._build_lexical_index(self.vector_store)
+
+    def _build_lexical_index(self, store: FAISS) -> BM25Index:
+        ids, texts = [], []
+        for chunk_id, doc in self._iter_stored_chunks(store):
+            ids.append(chunk_id)
+            texts.append(doc.page_content)
+
+        lexical_index = BM25Index()
+        lexical_index.add(ids, texts)
+        return lexical_index
+
+    def _ensure_mutable(self):
+        """
+        Memory-mapped indexes are read-only; copy the index and chunks into
+        memory before modifying them. Only ingestion pays this cost.
+        """
+        store = self.vector_store
+        if isinstance(store.docstore, InMemoryDocstore):
+            return
+
+        faiss = dependable_faiss_import()
+        chunks = store.docstore
+
+        self.vector_store = FAISS(
+            embedding_function=self.embedding_model,
+            index=faiss.deserialize_index(faiss.serialize_index(store.index)),
+            docstore=InMemoryDocstore(dict(chunks.iter_documents())),
+            index_to_docstore_id={row: chunks.id_at(row) for row in range(len(chunks))}
         )
+        self._apply_search_params()
 
-    def save_index(self):
+    def save_index(self, manifest: Optional[IngestionManifest] = None):
         """
-        Saves FAISS index to disk.
+        Saves the FAISS index (and manifest, if given) as a new version
+        directory, then publishes it by flipping the CURRENT pointer.
         """
         if self.vector_store is None:
             raise ValueError("Vector store is empty. Build index first.")
 
-        self.vector_store.save_local(self.index_path)
+        version, directory = index_versions.new_version(self.index_path)
+
+        if self.lexical_index is not None:
+            self.lexical_index.save(directory)
+        self.metadata_index().save(directory)
+        if self._full_vectors() is not None:
+            np.save(os.path.join(directory, FULL_VECTORS_FILE), self.full_vectors)
+
+        if self.storage == "pickle":
+            self._ensure_mutable()
+            self.vector_store.save_local(directory)
+        else:
+            faiss = dependable_faiss_import()
+
+            # Rows are written in vector order so a row number is all a lookup needs
+            CHUNK_STORES[self.storage].write(directory, self._iter_stored_chunks())
+            faiss.write_index(self.vector_store.index, os.path.join(directory, "index.faiss"))
+
+        if manifest is not None:
+            manifest.save(os.path.join(directory, MANIFEST_FILENAME))
+
+        index_versions.publish(self.index_path, version)
+        self.loaded_version = version
+        index_versions.prune(self.index_path, keep=self.keep_versions)
+
+    def _read_index(self, directory: str):
+        """
+        Reads the index saved in `directory` into new objects, without
+        touching the live ones. Returns (FAISS store, BM25 index or None,
+        metadata index or None, memory-mapped float32 vectors or None).
+        """
+        chunk_store = self._saved_chunk_store(directory)
+        if chunk_store is not None:
+            store = self._load_lazy(chunk_store, directory)
+        else:
+            store = FAISS.load_local(
+                directory,
+                self.embedding_model,
+                allow_dangerous_deserialization=True
+            )
+        set_search_params(store.index, nprobe=self.nprobe, ef_search=self.ef_search)
+
+        lexical_index = None
+        if self.lexical:
+            if BM25Index.exists(directory):
+                lexical_index = BM25Index.load(directory)
+
+            # Missing, or left behind by a save made without lexical=True
+            if lexical_index is None or len(lexical_index) != store.index.ntotal:
+                lexical_index = self._build_lexical_index(store)
+
+        # Indexes saved without metadata.npz get it built on first filtered search
+        metadata_index = None
+        if MetadataIndex.exists(directory):
+            metadata_index = MetadataIndex.load(directory)
+            if len(metadata_index) != store.index.ntotal:
+                metadata_index = None
+
+        full_vectors = None
+        vectors_file = os.path.join(directory, FULL_VECTORS_FILE)
+        if os.path.exists(vectors_file):
+            full_vectors = np.load(vectors_file, mmap_mode="r")
+            if len(full_vectors) != store.index.ntotal:
+                full_vectors = None
+
+        return store, lexical_index, metadata_index, full_vectors
 
     def load_index(self):
         """
-        Loads FAISS index from disk.
+        Loads the published FAISS index version from disk.
         """
         if not os.path.exists(self.index_path):
             raise FileNotFoundError("FAISS index not found on disk.")
 
-        self.vector_store = FAISS.load_local(
-            self.index_path,
-            self.embedding_model,
-            allow_dangerous_deserialization=True
+        version = index_versions.current_version(self.index_path)
+        self._swap(*self._read_index(index_versions.resolve(self.index_path)), version)
+
+    def _swap(self, store: FAISS, lexical_index: Optional[BM25Index],
+              metadata_index: Optional[MetadataIndex], full_vectors: Optional[np.ndarray],
+              version: Optional[str]):
+        with self._swap_lock:
+            self.vector_store = store
+            self.lexical_index = lexical_index
+            self.full_vectors = full_vectors
+            self._pending_vectors = []
+            self.loaded_version = version
+            self._invalidate()
+            self._metadata_index = metadata_index
+            self._metadata_version = self.version
+
+    def metadata_index(self) -> MetadataIndex:
+        """
+        Metadata of the served index in row order; rebuilt from the stored
+        chunks after local changes (saved indexes ship a prebuilt one).
+        """
+        return self._metadata_index_of(self._take_snapshot())
+
+    def _metadata_index_of(self, snapshot: _Snapshot) -> MetadataIndex:
+        """
+        The metadata index of the snapshot's version, built from its store
+        (and cached, unless the index changed meanwhile) if missing.
+        """
+        if snapshot.metadata_index is not None:
+            return snapshot.metadata_index
+        if snapshot.store is None:
+            raise ValueError("Vector store not initialized.")
+
+        with stage("metadata_index_build"):
+            metadata_index = MetadataIndex.from_documents(doc for _, doc in self._iter_stored_chunks(snapshot.store))
+
+        with self._swap_lock:
+            if self.version == snapshot.version:
+                self._metadata_index = metadata_index
+                self._metadata_version = snapshot.version
+        return metadata_index
+
+    def _filtered_rows(self, snapshot: _Snapshot, filters: dict) -> np.ndarray:
+        # Rows of the snapshot's own version, never of one swapped in since
+        with stage("metadata_filter"):
+            return self._metadata_index_of(snapshot).select(filters)
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """
+        Loads the published version if it differs from the one being
+        served and swaps it in. Searches already running finish on the old
+        index; later ones use the new one. Returns whether a swap happened.
+        """
+        with self._reload_lock:
+            version = index_versions.current_version(self.index_path)
+            if not force and (version is None or version == self.loaded_version):
+                return False
+
+            self._swap(*self._read_index(index_versions.resolve(self.index_path)), version)
+            return True
+
+    def start_watching(self, interval: float = 5.0):
+        """
+        Polls the CURRENT pointer every `interval` seconds on a background
+        thread and hot-swaps newly published versions in.
+        """
+        if self._watcher is not None:
+            return
+
+        stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval):
+                try:
+                    self.reload_if_changed()
+                    self.reload_error = None
+                except Exception as e:
+                    # Keep serving the current version; retry on the next poll
+                    self.reload_error = str(e)
+
+        self._watcher = (threading.Thread(target=watch, name="index-watcher", daemon=True), stop)
+        self._watcher[0].start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            thread, stop = self._watcher
+            stop.set()
+            thread.join()
+            self._watcher = None
+
+    def close(self):
+        """
+        Stops the watcher (ShardedVectorStore also stops its thread pool).
+        """
+        self.stop_watching()
+
+    def _saved_chunk_store(self, directory: str):
+        """
+        The chunk store class to load from, preferring the configured
+        storage; None means the pickled docstore (index.pkl).
+        """
+        configured = CHUNK_STORES.get(self.storage)
+        if configured is not None and configured.exists(directory):
+            return configured
+        if os.path.exists(os.path.join(directory, "index.pkl")):
+            return None
+
+        for chunk_store in CHUNK_STORES.values():
+            if chunk_store.exists(directory):
+                return chunk_store
+        return None
+
+    def _load_lazy(self, chunk_store, directory: str) -> FAISS:
+        """
+        Maps the FAISS index and opens the chunk store instead of reading
+        them into private memory: startup is near-instant, chunk text is
+        only fetched for search hits, and N worker processes share the same
+        pages through the OS cache.
+        """
+        faiss = dependable_faiss_import()
+        index_file = os.path.join(directory, "index.faiss")
+
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        try:
+            index = faiss.read_index(index_file, flags)
+        except RuntimeError:
+            # Index types this FAISS build cannot map are read normally
+            index = faiss.read_index(index_file)
+
+        chunks = chunk_store(directory)
+        return FAISS(
+            embedding_function=self.embedding_model,
+            index=index,
+            docstore=chunks,
+            index_to_docstore_id=RowIdMap(chunks)
         )
 
-    def similarity_search(self, query: str, k: int = 3):
+    def open_index(self, loader, refresh: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Lazy startup path: loads a persisted index without parsing any
+        documents. The data directory is only scanned when the index has
+        to be built, was chunked with another config, or when a refresh is
+        requested.
+        """
+        index_dir = index_versions.resolve(self.index_path)
+        if (
+            not refresh
+            and os.path.exists(os.path.join(index_dir, "index.faiss"))
+            and saved_chunking(index_dir) == loader.chunking_config()
+        ):
+            self.load_index()
+            return None
+
+        return self.sync_index(loader)
+
+    def sync_index(self, loader) -> Dict[str, int]:
+        """
+        Runs `_sync_index` as the "ingest" stage, profiled when RAG_PROFILE
+        is set (see metrics.profiled).
+        """
+        with profiled("ingest"), stage("ingest"):
+            stats = self._sync_index(loader)
+
+        count("chunks_added", stats["chunks_added"])
+        count("chunks_deleted", stats["chunks_deleted"])
+        return stats
+
+    def _sync_index(self, loader) -> Dict[str, int]:
+        """
+        Incrementally brings the index in line with the loader's data
+        directory using the ingestion manifest: only added or changed
+        files are parsed and embedded, and vectors of removed files are
+        deleted. Chunks whose content hash is unchanged keep their vectors.
         """
-        Searches for top-k most similar document chunks.
+        index_dir = index_versions.resolve(self.index_path)
+        manifest = IngestionManifest(os.path.join(index_dir, MANIFEST_FILENAME))
+        index_file = os.path.join(index_dir, "index.faiss")
+
+        chunking = loader.chunking_config()
+
+        if manifest.exists() and os.path.exists(index_file) and manifest.chunking == chunking:
+            if self.vector_store is None:
+                self.load_index()
+        else:
+            # No manifest (or no index) means we cannot tell which vectors
+            # belong to which file, and every chunk changes with the chunking
+            # config, so start from scratch.
+            manifest.reset()
+            self.vector_store = None
+        manifest.chunking = chunking
+        stats_path = os.path.join(self.index_path, FILE_STATS_FILENAME)
+        manifest.load_stats(stats_path)
+
+        files = {loader.source_key(path): path for path in loader.list_files()}
+        modified, removed = manifest.diff(files)
+
+        # Stale chunks of the whole sync are deleted in one go at the end, so
+        # IVF/HNSW (which rebuild to delete) are rebuilt once, not per file
+        stale_ids: List[str] = []
+
+        for source in removed:
+            stale_ids.extend(manifest.chunk_ids(source))
+            manifest.remove(source)
+
+        pending = {file_path: (source, file_hash) for source, file_path, file_hash in modified}
+        # diff() already hashed these; the page cache is keyed by the same hash
+        loader.remember_hashes({file_path: file_hash for file_path, (_, file_hash) in pending.items()})
+        ingested: List[str] = []
+        existing = self.vector_store is not None
+
+        def new_chunks() -> Iterator[List[Document]]:
+            # Runs on add_batches' prefetch thread, parsing the next files
+            # while the current one is embedded. Files that fail to load keep
+            # their previous vectors and manifest entry, so they are retried
+            # next sync.
+            for file_path, documents in loader.load_files(list(pending)):
+                source, file_hash = pending[file_path]
+                old_ids = set(manifest.chunk_ids(source))
+                new_ids = [doc.metadata["chunk_id"] for doc in documents]
+
+                stale_ids.extend(old_ids.difference(new_ids))
+                manifest.record(source, file_path, file_hash, new_ids)
+                ingested.append(source)
+                yield [doc for doc in documents if doc.metadata["chunk_id"] not in old_ids]
+
+        # Each file is embedded as soon as it is parsed, so only a few files'
+        # chunks are held at a time. Until the index exists, non-flat types
+        # buffer up to `train_size` new chunks, so they are trained on the
+        # changeset rather than on the first file alone
+        added = self.add_batches(new_chunks())
+        # A cached embedding model persists the new vectors once per sync
+        flush = getattr(self.embedding_model, "flush", None)
+        if flush is not None:
+            flush()
+
+        # Added rows are appended, so they are the last ones until stale rows are deleted
+        new_vectors = None
+        if existing and self.full_vectors is not None:
+            new_vectors = np.asarray(self._full_vectors()[len(self) - added:])
+
+        self.delete_documents(stale_ids)
+        deleted = len(stale_ids)
+
+        if self.vector_store is not None:
+            self._update_quantizer(manifest, new_vectors)
+
+        if self.vector_store is not None and (deleted or added or ingested or removed):
+            with stage("save_index"):
+                self.save_index(manifest=manifest)
+            # The new version's manifest holds every fingerprint
+            if os.path.exists(stats_path):
+                os.remove(stats_path)
+        elif self.vector_store is not None and manifest.touched:
+            # Only stat fingerprints changed; published versions are never
+            # modified, so they are kept next to CURRENT instead
+            manifest.save_stats(stats_path)
+
+        return {
+            "files_modified": len(ingested),
+            "files_failed": len(modified) - len(ingested),
+            "files_removed": len(removed),
+            "chunks_added": added,
+            "chunks_deleted": deleted,
+        }
+
+    def embed_query(self, query: str):
+        """
+        Embeds a query, reusing the vector for repeated questions.
+        """
+        embedding = self.query_cache.get(query)
+        if embedding is None:
+            with stage("embed_query"):
+                embedding = self.embedding_model.embed_query(query)
+            self.query_cache.put(query, embedding)
+        return embedding
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeds several queries in one batch, reusing cached vectors.
+        """
+        vectors: List[Optional[np.ndarray]] = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            texts = [queries[i] for i in missing]
+            for i, vector in zip(missing, self.embedding_model.embed_documents(texts)):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+                self.query_cache.put(queries[i], vectors[i])
+
+        return np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+
+    def _documents_at_rows(self, store: FAISS, rows) -> List[Document]:
+        rows = [int(row) for row in rows if row != -1]
+
+        if hasattr(store.docstore, "documents_at"):
+            return store.docstore.documents_at(rows)
+        return [store.docstore.search(store.index_to_docstore_id[row]) for row in rows]
+
+    def _ids_at_rows(self, store: FAISS, rows) -> List[str]:
+        # Lazy stores answer in one lookup instead of one per row
+        if hasattr(store.docstore, "ids_at"):
+            return store.docstore.ids_at(rows)
+        return [store.index_to_docstore_id[int(row)] for row in rows]
+
+    def similarity_search_batch(self, queries: List[str], k: int = 3) -> List[List[Document]]:
+        """
+        Top-k chunks for several queries with one batched embedding and one
+        FAISS search call (used by the async micro-batcher and ask_many).
         """
         if self.vector_store is None:
             raise ValueError("Vector store not initialized.")
 
-        return self.vector_store.similarity_search(query, k=k)
+        results: List[Optional[List[Document]]] = [self.result_cache.get((query, k, None)) for query in queries]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if missing:
+            version = self.version
+            store, full_vectors = self._snapshot()
+            with stage("embed_query"):
+                embeddings = self.embed_queries([queries[i] for i in missing])
+            with stage("faiss_search"):
+                _, rows = self._index_search(store, full_vectors, embeddings, k)
+
+            # Chunks shared between queries are fetched once
+            unique_rows = sorted({int(row) for row in rows.ravel() if row != -1})
+            by_row = dict(zip(unique_rows, self._documents_at_rows(store, unique_rows)))
+
+            for i, row_ids in zip(missing, rows):
+                results[i] = [by_row[int(row)] for row in row_ids if row != -1]
+                if version == self.version:
+                    self.result_cache.put((queries[i], k, None), results[i])
+
+        return [list(result) for result in results]
+
+    def _take_snapshot(self) -> _Snapshot:
+        with self._swap_lock:
+            return _Snapshot(
+                store=self.vector_store,
+                lexical_index=self.lexical_index,
+                full_vectors=self._full_vectors(),
+                metadata_index=self._metadata_index if self._metadata_version == self.version else None,
+                version=self.version
+            )
+
+    def _snapshot(self) -> Tuple[Optional[FAISS], Optional[np.ndarray]]:
+        # The float32 copy must come from the same version as the index
+        snapshot = self._take_snapshot()
+        return snapshot.store, snapshot.full_vectors
+
+    def _index_search(self, store: FAISS, full_vectors: Optional[np.ndarray], embeddings: np.ndarray,
+                      k: int, rows: Optional[np.ndarray] = None):
+        """
+        store.index.search, restricted to `rows` if given, and rescored from
+        `full_vectors` when rescoring is on. Returns (distances, rows).
+
+        Filters widen IVF/HNSW searches by their selectivity, and a small
+        selection of an HNSW index is scored exactly, so filtering does not
+        cost recall.
+        """
+        params = None
+        if rows is not None:
+            if index_type_of(store.index) == "binary":
+                # IndexLSH takes no search params; score the allowed rows exactly
+                if full_vectors is None:
+                    raise ValueError("Filtered search on a binary index needs its vectors.npy.")
+                return rescore_exact(full_vectors, embeddings, np.tile(rows, (len(embeddings), 1)), k)
+            if index_type_of(store.index) == "hnsw" and len(rows) <= EXACT_SELECTION_FRACTION * store.index.ntotal:
+                return search_rows_exact(store.index, embeddings, rows, k)
+            params = selector_search_params(store.index, rows)
+
+        if full_vectors is None or self.rescore <= 0:
+            return store.index.search(embeddings, k, params=params)
+
+        _, candidates = store.index.search(embeddings, k * self.rescore, params=params)
+        with stage("rescore"):
+            return rescore_exact(full_vectors, embeddings, candidates, k)
+
+    def _search_by_vector(self, embedding, k: int) -> List[Document]:
+        store, full_vectors = self._snapshot()
+
+        with stage("faiss_search"):
+            _, rows = self._index_search(store, full_vectors, np.asarray([embedding], dtype=np.float32), k)
+        # Lazy chunk stores fetch the top-k rows in one batch, without the ID round trip
+        with stage("chunk_fetch"):
+            return self._documents_at_rows(store, rows[0])
+
+    def search_vectors(self, embeddings: np.ndarray, k: int,
+                       filters: Optional[dict] = None) -> Tuple[Optional[FAISS], List[List[Tuple[float, int]]]]:
+        """
+        Raw FAISS search for a matrix of query vectors, without caching.
+        Returns the store searched and, per query, (distance, row) pairs
+        nearest first; rows are resolved with `_documents_at_rows(store, rows)`.
+        """
+        snapshot = self._take_snapshot()
+        store, full_vectors = snapshot.store, snapshot.full_vectors
+        if store is None:
+            return None, [[] for _ in range(len(embeddings))]
+
+        selected = None
+        if filters:
+            selected = self._filtered_rows(snapshot, filters)
+            if not len(selected):
+                return store, [[] for _ in range(len(embeddings))]
+            k = min(k, len(selected))
+
+        distances, rows = self._index_search(store, full_vectors, embeddings, k, rows=selected)
+        return store, [
+            [(float(distance), int(row)) for distance, row in zip(query_distances, query_rows) if row != -1]
+            for query_distances, query_rows in zip(distances, rows)
+        ]
+
+    def hybrid_candidates(self, query: str, embedding, fetch_k: int,
+                          filters: Optional[dict] = None) -> Tuple[FAISS, list, list]:
+        """
+        The two rankings fused by `hybrid_search`: returns the store searched,
+        dense (distance, chunk_id) pairs nearest first and BM25
+        (score, chunk_id) pairs best first.
+        """
+        if self.lexical_index is None:
+            raise ValueError("Lexical index not available. Create the VectorStore with lexical=True.")
+
+        # Both indexes (and the filter rows) must come from the same version if a swap is under way
+        snapshot = self._take_snapshot()
+        store, lexical_index, full_vectors = snapshot.store, snapshot.lexical_index, snapshot.full_vectors
+
+        selected, allowed = None, None
+        if filters:
+            selected = self._filtered_rows(snapshot, filters)
+            if not len(selected):
+                return store, [], []
+            allowed = set(self._ids_at_rows(store, selected))
+
+        with stage("faiss_search"):
+            distances, rows = self._index_search(
+                store, full_vectors, np.asarray([embedding], dtype=np.float32), fetch_k, rows=selected
+            )
+            hits = [(float(distance), row) for distance, row in zip(distances[0], rows[0]) if row != -1]
+            dense = list(zip(
+                [distance for distance, _ in hits], self._ids_at_rows(store, [row for _, row in hits])
+            ))
+        with stage("bm25_search"):
+            lexical = [(score, chunk_id) for chunk_id, score in lexical_index.search(query, fetch_k, allowed=allowed)]
+
+        return store, dense, lexical
+
+    def hybrid_search(self, query: str, k: int = 3, fetch_k: int = 20, rrf_k: int = 60,
+                      filters: Optional[dict] = None) -> List[Document]:
+        """
+        Fuses dense (FAISS) and lexical (BM25) rankings of the top `fetch_k`
+        candidates with reciprocal rank fusion and returns the top-k chunks.
+        `filters` restricts both rankings (see MetadataIndex).
+        """
+        if self.vector_store is None:
+            raise ValueError("Vector store not initialized.")
+
+        key = ("hybrid", query, k, fetch_k, freeze_filters(filters))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        version = self.version
+        store, dense, lexical = self.hybrid_candidates(query, self.embed_query(query), fetch_k, filters)
+
+        fused_ids = reciprocal_rank_fusion(
+            [[chunk_id for _, chunk_id in dense], [chunk_id for _, chunk_id in lexical]], k=rrf_k
+        )[:k]
+        with stage("chunk_fetch"):
+            documents = [store.docstore.search(chunk_id) for chunk_id in fused_ids]
+
+        if version == self.version:
+            self.result_cache.put(key, documents)
+        return list(documents)
+
+    def _filtered_search_by_vector(self, embedding, k: int, filters: dict) -> List[Document]:
+        """
+        Searches only the rows matching `filters`: the FAISS search itself
+        skips other rows through an IDSelector, so no over-fetching is needed
+        (see _index_search for how selective filters keep their recall).
+        """
+        snapshot = self._take_snapshot()
+        store, full_vectors = snapshot.store, snapshot.full_vectors
+        rows = self._filtered_rows(snapshot, filters)
+        if not len(rows):
+            return []
+
+        with stage("faiss_search"):
+            _, hits = self._index_search(
+                store, full_vectors, np.asarray([embedding], dtype=np.float32), min(k, len(rows)), rows=rows
+            )
+        with stage("chunk_fetch"):
+            return self._documents_at_rows(store, hits[0])
+
+    def similarity_search(self, query: str, k: int = 3, filters: Optional[dict] = None):
+        """
+        Searches for top-k most similar document chunks, optionally only
+        among chunks matching metadata `filters` (see MetadataIndex).
+        """
+        if self.vector_store is None:
+            raise ValueError("Vector store not initialized.")
+
+        key = (query, k, freeze_filters(filters))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        version = self.version
+        if filters:
+            documents = self._filtered_search_by_vector(self.embed_query(query), k, filters)
+        else:
+            documents = self._search_by_vector(self.embed_query(query), k)
+
+        # Don't cache results computed against an index that changed meanwhile
+        if version == self.version:
+            self.result_cache.put(key, documents)
+        return list(documents)